@@ -311,8 +311,12 @@ from datetime import datetime
 from pathlib import Path
 from flask import Flask, render_template, request, jsonify, session
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO, emit
+import command_history
+import database
+from database import db
+import file_reconciler
+from workspace_registry import WorkspaceRegistry
 
 # Comentamos el monkey patch para evitar conflictos con OpenAI y otras bibliotecas
 # eventlet.monkey_patch(os=True, select=True, socket=True, thread=True, time=True)
@@ -387,33 +391,30 @@ def get_file_type(filename):
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Configure database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///codestorm.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
 # Set session secret
 app.secret_key = os.environ.get("SESSION_SECRET", os.urandom(24).hex())
 
-# Initialize SQLAlchemy
-db = SQLAlchemy(app)
+# Base de datos compartida: perfil de conexión, tablas y migraciones (ver database.py)
+try:
+    database.init_app(app)
+    logging.info("Database tables created successfully")
+except Exception as e:
+    logging.error(f"Error creating database tables: {str(e)}")
 
-# Import models and create tables
-with app.app_context():
-    try:
-        import models
-        db.create_all()
-        logging.info("Database tables created successfully")
-    except Exception as e:
-        logging.error(f"Error creating database tables: {str(e)}")
+# Historial de comandos: escritura diferida por lotes en la tabla commands
+command_history.init_app(app, db)
 
 # Create user workspaces directory if it doesn't exist
 WORKSPACE_ROOT = Path("./user_workspaces")
 WORKSPACE_ROOT.mkdir(parents=True, exist_ok=True)
 
+# Workspaces registrados en la base de datos, en memoria
+workspace_registry = WorkspaceRegistry(app, db)
+
+# Tabla files sincronizada con el disco (eventos del observador y escaneo periódico)
+if os.environ.get('FILE_RECONCILER', '1') != '0':
+    file_reconciler.init_app(app, db, WORKSPACE_ROOT)
+
 # Get API keys from environment - force reload from .env
 load_dotenv(override=True)
 openai_api_key = os.environ.get("OPENAI_API_KEY", "")
@@ -469,44 +470,11 @@ def get_user_workspace(user_id="default"):
         with open(workspace_path / "README.md", "w") as f:
             f.write("# Workspace\n\nEste es tu espacio de trabajo. Usa los comandos para crear y modificar archivos aquí.")
 
-    # Track workspace in the database if possible
+    # Track workspace in the database if possible (cached; last_accessed is flushed in batches)
     try:
-        from models import User, Workspace
-
-        # Use a default user if no proper authentication is set up
-        default_user = db.session.query(User).filter_by(username="default_user").first()
-        if not default_user:
-            default_user = User(
-                username="default_user",
-                email="default@example.com",
-            )
-            default_user.set_password("default_password")
-            db.session.add(default_user)
-            db.session.commit()
-
-        # Check if workspace exists in database
-        workspace = db.session.query(Workspace).filter_by(
-            user_id=default_user.id,
-            name=user_id
-        ).first()
-
-        if not workspace:
-            # Create a new workspace record
-            workspace = Workspace(
-                name=user_id,
-                path=str(workspace_path),
-                user_id=default_user.id,
-                is_default=True,
-                last_accessed=datetime.utcnow()
-            )
-            db.session.add(workspace)
-            db.session.commit()
-        else:
-            # Update the last accessed time
-            workspace.last_accessed = datetime.utcnow()
-            db.session.commit()
-
+        workspace_registry.touch(user_id, workspace_path)
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error tracking workspace in database: {str(e)}")
 
     return workspace_path
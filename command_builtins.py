@@ -0,0 +1,340 @@
+# Implementación en proceso de los comandos de archivo más frecuentes
+#
+# ls, pwd, cat, mkdir, touch, rm y mv se resuelven sin lanzar un shell cuando el
+# comando se puede interpretar sin ambigüedad (sin tuberías, redirecciones,
+# comodines ni variables, y solo con las opciones soportadas). En cualquier otro
+# caso run_builtin devuelve None y el comando se ejecuta como siempre.
+import os
+import grp
+import pwd
+import stat
+import time
+import shlex
+import shutil
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger('command_builtins')
+
+BUILTINS_ENABLED = os.environ.get('COMMAND_BUILTINS', '1') != '0'
+
+# Caracteres que requieren un shell real para interpretarse
+SHELL_METACHARACTERS = set('|&;<>()$`\\"\'*?[]{}~!#\n')
+
+# Archivos más grandes se leen con `cat` real para que la salida pase por el límite de captura
+MAX_CAT_BYTES = 256 * 1024
+
+_SIX_MONTHS = 182 * 24 * 3600
+
+
+class _Fallback(Exception):
+    """El comando no se puede resolver en proceso con seguridad."""
+
+
+def _parse_flags(args, allowed):
+    """Separa opciones cortas y operandos; lanza _Fallback ante opciones no soportadas."""
+    flags = set()
+    operands = []
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1 and not operands:
+            if arg == '--' or arg.startswith('--'):
+                raise _Fallback()
+            for flag in arg[1:]:
+                if flag not in allowed:
+                    raise _Fallback()
+                flags.add(flag)
+        else:
+            operands.append(arg)
+    return flags, operands
+
+
+class _Context:
+    """Resuelve rutas relativas al directorio actual sin salir del workspace."""
+
+    def __init__(self, cwd, root):
+        self.cwd = os.path.abspath(str(cwd))
+        self.root = os.path.abspath(str(root))
+        self.stdout = []
+        self.stderr = []
+        self.returncode = 0
+
+    def path(self, operand):
+        full_path = os.path.normpath(os.path.join(self.cwd, operand))
+        if full_path != self.root and not full_path.startswith(self.root + os.sep):
+            # Fuera del workspace: se deja al shell (y a sus validaciones)
+            raise _Fallback()
+        return full_path
+
+    def error(self, message, returncode=1):
+        self.stderr.append(message + '\n')
+        self.returncode = returncode
+
+
+@lru_cache(maxsize=256)
+def _owner(uid):
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+@lru_cache(maxsize=256)
+def _group(gid):
+    try:
+        return grp.getgrgid(gid).gr_name
+    except KeyError:
+        return str(gid)
+
+
+def _format_mtime(mtime, now):
+    t = time.localtime(mtime)
+    if now - mtime > _SIX_MONTHS or mtime - now > 3600:
+        return time.strftime('%b ', t) + f"{t.tm_mday:>2}  {t.tm_year}"
+    return time.strftime('%b ', t) + f"{t.tm_mday:>2} " + time.strftime('%H:%M', t)
+
+
+def _long_listing(entries):
+    """Filas de `ls -l` para [(nombre, ruta)] con columnas alineadas, y el total de bloques."""
+    now = time.time()
+    rows = []
+    blocks = 0
+    for name, path in entries:
+        st = os.lstat(path)
+        # Bloques de 1K como los cuenta ls (st_blocks está en unidades de 512 bytes)
+        blocks += (st.st_blocks + 1) // 2
+        if stat.S_ISLNK(st.st_mode):
+            name = f"{name} -> {os.readlink(path)}"
+        rows.append((stat.filemode(st.st_mode), str(st.st_nlink), _owner(st.st_uid),
+                     _group(st.st_gid), str(st.st_size), _format_mtime(st.st_mtime, now), name))
+    if not rows:
+        return [], blocks
+    widths = [max(len(row[i]) for row in rows) for i in range(5)]
+    return [
+        f"{mode} {links:>{widths[1]}} {owner:<{widths[2]}} {group:<{widths[3]}} {size:>{widths[4]}} {mtime} {name}"
+        for mode, links, owner, group, size, mtime, name in rows
+    ], blocks
+
+
+def _ls(ctx, args):
+    flags, operands = _parse_flags(args, 'laA1')
+    long_format = 'l' in flags
+    operands = operands or ['.']
+
+    files = []
+    directories = []
+    for operand in operands:
+        path = ctx.path(operand)
+        if not os.path.lexists(path):
+            ctx.error(f"ls: cannot access '{operand}': No such file or directory", 2)
+        elif os.path.isdir(path) and not (os.path.islink(path) and long_format):
+            directories.append((operand, path))
+        else:
+            files.append((operand, path))
+
+    sections = []
+    if files:
+        files.sort()
+        sections.append(_long_listing(files)[0] if long_format else [name for name, _ in files])
+
+    for operand, path in sorted(directories):
+        names = sorted(os.listdir(path))
+        if 'a' in flags:
+            names = ['.', '..'] + names
+        elif 'A' not in flags:
+            names = [name for name in names if not name.startswith('.')]
+        entries = [(name, os.path.join(path, name)) for name in names]
+        lines = []
+        if len(operands) > 1:
+            lines.append(f"{operand}:")
+        if long_format:
+            rows, blocks = _long_listing(entries)
+            lines.append(f"total {blocks}")
+            lines.extend(rows)
+        else:
+            lines.extend(names)
+        sections.append(lines)
+
+    ctx.stdout.append('\n\n'.join('\n'.join(lines) for lines in sections if lines))
+    if ctx.stdout[-1]:
+        ctx.stdout.append('\n')
+
+
+def _pwd(ctx, args):
+    if args:
+        raise _Fallback()
+    ctx.stdout.append(ctx.cwd + '\n')
+
+
+def _cat(ctx, args):
+    flags, operands = _parse_flags(args, '')
+    if not operands:
+        raise _Fallback()
+    paths = [ctx.path(operand) for operand in operands]
+    if sum(os.path.getsize(p) for p in paths if os.path.isfile(p)) > MAX_CAT_BYTES:
+        raise _Fallback()
+    for operand, path in zip(operands, paths):
+        if os.path.isdir(path):
+            ctx.error(f"cat: {operand}: Is a directory")
+        elif not os.path.exists(path):
+            ctx.error(f"cat: {operand}: No such file or directory")
+        elif not os.path.isfile(path):
+            raise _Fallback()
+        else:
+            with open(path, 'rb') as f:
+                ctx.stdout.append(f.read().decode('utf-8', errors='replace'))
+
+
+# mkdir, touch, rm y mv resuelven y comprueban todos los operandos antes de
+# tocar nada: una vez hecho un cambio ya no se puede volver al shell, que
+# repetiría el comando entero sobre un workspace distinto.
+
+def _mkdir(ctx, args):
+    flags, operands = _parse_flags(args, 'p')
+    if not operands:
+        raise _Fallback()
+    paths = [ctx.path(operand) for operand in operands]
+    for operand, path in zip(operands, paths):
+        try:
+            if 'p' in flags:
+                os.makedirs(path, exist_ok=True)
+            else:
+                os.mkdir(path)
+        except FileExistsError:
+            ctx.error(f"mkdir: cannot create directory ‘{operand}’: File exists")
+        except FileNotFoundError:
+            ctx.error(f"mkdir: cannot create directory ‘{operand}’: No such file or directory")
+        except NotADirectoryError:
+            ctx.error(f"mkdir: cannot create directory ‘{operand}’: Not a directory")
+
+
+def _touch(ctx, args):
+    flags, operands = _parse_flags(args, '')
+    if not operands:
+        raise _Fallback()
+    paths = [ctx.path(operand) for operand in operands]
+    for operand, path in zip(operands, paths):
+        try:
+            with open(path, 'a'):
+                pass
+            os.utime(path, None)
+        except FileNotFoundError:
+            ctx.error(f"touch: cannot touch '{operand}': No such file or directory")
+        except IsADirectoryError:
+            os.utime(path, None)
+
+
+def _rm(ctx, args):
+    flags, operands = _parse_flags(args, 'rRf')
+    recursive = bool(flags & {'r', 'R'})
+    force = 'f' in flags
+    if not operands:
+        if force:
+            return
+        raise _Fallback()
+    paths = [ctx.path(operand) for operand in operands]
+    for operand, path in zip(operands, paths):
+        if path in (ctx.root, ctx.cwd) or os.path.basename(operand.rstrip('/')) in ('.', '..'):
+            raise _Fallback()
+    for operand, path in zip(operands, paths):
+        if not os.path.lexists(path):
+            if not force:
+                ctx.error(f"rm: cannot remove '{operand}': No such file or directory")
+        elif os.path.isdir(path) and not os.path.islink(path):
+            if not recursive:
+                ctx.error(f"rm: cannot remove '{operand}': Is a directory")
+            else:
+                shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def _mv(ctx, args):
+    flags, operands = _parse_flags(args, 'f')
+    if len(operands) < 2:
+        raise _Fallback()
+    *sources, target = operands
+    target_path = ctx.path(target)
+    source_paths = [ctx.path(source) for source in sources]
+    if len(sources) > 1 and not os.path.isdir(target_path):
+        if os.path.lexists(target_path):
+            ctx.error(f"mv: target '{target}': Not a directory")
+        else:
+            ctx.error(f"mv: target '{target}': No such file or directory")
+        return
+
+    moves = []
+    for source, source_path in zip(sources, source_paths):
+        destination = target_path
+        if os.path.isdir(target_path):
+            destination = os.path.join(target_path, os.path.basename(source_path.rstrip(os.sep)))
+        if os.path.isdir(destination) and not os.path.islink(destination) \
+                and os.path.abspath(destination) != os.path.abspath(source_path):
+            # Sobrescribir directorios tiene reglas propias en mv; se deja al shell
+            raise _Fallback()
+        moves.append((source, source_path, destination))
+
+    for source, source_path, destination in moves:
+        if not os.path.lexists(source_path):
+            ctx.error(f"mv: cannot stat '{source}': No such file or directory")
+        elif os.path.abspath(destination) == os.path.abspath(source_path):
+            ctx.error(f"mv: '{source}' and '{target}' are the same file")
+        elif os.path.isdir(destination) and not os.path.islink(destination):
+            # Creado por un movimiento anterior del mismo comando
+            ctx.error(f"mv: cannot overwrite '{destination}': Directory not empty")
+        else:
+            shutil.move(source_path, destination)
+
+
+BUILTINS = {
+    'ls': _ls,
+    'pwd': _pwd,
+    'cat': _cat,
+    'mkdir': _mkdir,
+    'touch': _touch,
+    'rm': _rm,
+    'mv': _mv,
+}
+
+
+def parse_builtin(command):
+    """Devuelve (nombre, argumentos) si el comando es un builtin interpretable, si no None."""
+    if not BUILTINS_ENABLED or not command or SHELL_METACHARACTERS.intersection(command):
+        return None
+    try:
+        parts = shlex.split(command)
+    except ValueError:
+        return None
+    if not parts or parts[0] not in BUILTINS:
+        return None
+    return parts[0], parts[1:]
+
+
+def run_builtin(command, cwd, root=None):
+    """Ejecuta el comando en proceso si es posible.
+
+    Las rutas se resuelven respecto a `cwd` y no pueden salir de `root` (el
+    workspace). Devuelve un resultado con el mismo formato que la ejecución
+    con subproceso, o None si hay que usar el shell.
+    """
+    parsed = parse_builtin(command)
+    if parsed is None:
+        return None
+    name, args = parsed
+    ctx = _Context(cwd, root or cwd)
+    try:
+        BUILTINS[name](ctx, args)
+    except _Fallback:
+        return None
+    except OSError as e:
+        # No se reintenta con el shell: el comando pudo haber hecho cambios parciales
+        logger.debug(f"Error en builtin {name}: {str(e)}")
+        ctx.error(f"{name}: {e.strerror or str(e)}")
+
+    return {
+        'success': ctx.returncode == 0,
+        'stdout': ''.join(ctx.stdout),
+        'stderr': ''.join(ctx.stderr),
+        'returncode': ctx.returncode,
+        'truncated': False,
+        'builtin': True
+    }
@@ -0,0 +1,183 @@
+# Caché de resultados de comandos de solo lectura por workspace
+#
+# `ls -la`, `du -sh`, `git status` o `cat README.md` se repiten constantemente
+# desde las terminales y el explorador. Su salida solo cambia cuando cambia algún
+# archivo del workspace, así que se guarda por (workspace, cwd, comando) y se
+# descarta con cualquier evento del observador de archivos bajo ese workspace.
+# Solo se sirve desde la caché cuando hay un observador activo sobre el
+# workspace; sin él no habría forma de saber que la salida ha caducado.
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from command_policy import tokenize, CommandRejected
+
+logger = logging.getLogger('command_cache')
+
+CACHE_ENABLED = os.environ.get('COMMAND_CACHE', '1') != '0'
+CACHE_TTL = int(os.environ.get('COMMAND_CACHE_TTL', 300))
+MAX_CACHED_COMMANDS = 512
+MAX_CACHED_OUTPUT = 64 * 1024
+
+# Programas de solo lectura y, para git, los subcomandos que no modifican nada
+READ_ONLY_PROGRAMS = {'ls', 'pwd', 'cat', 'head', 'tail', 'wc', 'du', 'tree', 'file', 'stat', 'find', 'git'}
+READ_ONLY_GIT_COMMANDS = {'status', 'log', 'diff', 'show', 'branch', 'ls-files'}
+
+# Eventos del observador que solo indican lecturas (watchdog >= 2.3 los emite en
+# Linux); los propios comandos cacheados los generan y no cambian nada
+READ_EVENT_TYPES = {'opened', 'closed_no_write'}
+GIT_DIR_COMPONENT = os.sep + '.git' + os.sep
+
+# Opciones que hacen que el comando no termine o que escriba
+UNSAFE_OPTIONS = {'-f', '-F', '--follow', '-delete', '-exec', '-execdir', '-ok', '-fprint', '-fls'}
+
+
+def is_cacheable(command):
+    """True si el comando es de solo lectura y su salida depende solo de los archivos."""
+    if not command or '$' in command or '`' in command:
+        return False
+    try:
+        segments, operators = tokenize(command)
+    except CommandRejected:
+        return False
+    if operators or len(segments) != 1:
+        return False
+    words, redirects = segments[0]
+    if redirects or not words or words[0] not in READ_ONLY_PROGRAMS:
+        return False
+    if any(word in UNSAFE_OPTIONS for word in words[1:]):
+        return False
+    # Rutas fuera del workspace: el observador no avisaría de sus cambios
+    for word in words[1:]:
+        if word.startswith(('/', '~')) or '..' in word.split('/'):
+            return False
+    if words[0] == 'git':
+        subcommands = [word for word in words[1:] if not word.startswith('-')]
+        if not subcommands or subcommands[0] not in READ_ONLY_GIT_COMMANDS:
+            return False
+        # `git branch nombre` crea una rama
+        if subcommands[0] == 'branch' and len(subcommands) > 1:
+            return False
+    return True
+
+
+class CommandResultCache:
+    """Resultados de comandos de solo lectura invalidados por eventos del observador."""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=MAX_CACHED_COMMANDS, enabled=CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.entries = OrderedDict()
+        self.watched_roots = set()
+        # Generación por workspace: un resultado solo es válido (y solo se guarda)
+        # si no hubo cambios desde que se empezó a ejecutar el comando
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def watch(self, root):
+        """Registra un directorio vigilado por un observador de archivos."""
+        with self._lock:
+            self.watched_roots.add(os.path.abspath(str(root)))
+
+    def unwatch(self, root):
+        root = os.path.abspath(str(root))
+        with self._lock:
+            self.watched_roots.discard(root)
+            for key in [key for key in self.entries if self._under(key[0], root)]:
+                del self.entries[key]
+
+    @staticmethod
+    def _under(path, root):
+        return path == root or path.startswith(root + os.sep)
+
+    def _is_watched(self, workspace):
+        return any(self._under(workspace, root) for root in self.watched_roots)
+
+    def begin(self, workspace, cwd, command):
+        """Devuelve (clave, generación) si el comando se puede cachear, si no None."""
+        if not self.enabled or not is_cacheable(command):
+            return None
+        workspace = os.path.abspath(str(workspace))
+        with self._lock:
+            if not self._is_watched(workspace):
+                return None
+            generation = self.generations.setdefault(workspace, 0)
+            return (workspace, os.path.abspath(str(cwd)), command.strip()), generation
+
+    def get(self, key):
+        """Copia del resultado guardado o None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry['generation'] != self.generations.get(key[0])
+                                      or time.time() - entry['stored_at'] > self.ttl):
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry['result'])
+
+    def put(self, key, generation, result):
+        if not result.get('success') or result.get('truncated') or result.get('cancelled'):
+            return
+        if len(result.get('stdout', '')) + len(result.get('stderr', '')) > MAX_CACHED_OUTPUT:
+            return
+        with self._lock:
+            if self.generations.get(key[0], 0) != generation:
+                return
+            self.entries[key] = {
+                'result': {name: result[name] for name in ('success', 'stdout', 'stderr', 'returncode')},
+                'generation': generation,
+                'stored_at': time.time()
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate_workspace(self, workspace):
+        """Descarta los resultados de un workspace (tras un comando que puede escribir)."""
+        workspace = os.path.abspath(str(workspace))
+        with self._lock:
+            if workspace in self.generations:
+                self.generations[workspace] += 1
+
+    def invalidate_path(self, path, event_type=None, is_directory=False):
+        """Aplica un evento del observador a los workspaces que contienen `path`.
+
+        Se ignoran las lecturas, los `modified` de directorios (acompañan a un
+        evento del hijo que ya invalida) y los `.lock` temporales de git, que
+        `git status` crea y borra en cada ejecución; si git actualiza de verdad
+        el índice, el lock se renombra a `.git/index` y eso sí invalida.
+
+        Solo se incrementa la generación del workspace; las entradas antiguas se
+        descartan al consultarlas o al salir por LRU, así que una ráfaga de
+        eventos (p. ej. un `npm install`) no recorre la caché en cada evento.
+        """
+        if event_type in READ_EVENT_TYPES or (event_type == 'modified' and is_directory):
+            return
+        path = os.path.abspath(str(path))
+        if path.endswith('.lock') and GIT_DIR_COMPONENT in path:
+            return
+        with self._lock:
+            for workspace in self.generations:
+                if self._under(path, workspace):
+                    self.generations[workspace] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'watched_roots': sorted(self.watched_roots)
+            }
+
+
+command_cache = CommandResultCache()
@@ -0,0 +1,810 @@
+# Ejecución de comandos de terminal con salida incremental
+import os
+import time
+import codecs
+import signal
+import uuid
+import logging
+import selectors
+import threading
+import subprocess
+from collections import deque
+from command_builtins import run_builtin
+from command_cache import command_cache
+from command_history import command_history
+
+logger = logging.getLogger('command_executor')
+
+# Tiempo máximo de ejecución por defecto (segundos), común a todos los puntos de entrada
+DEFAULT_TIMEOUT = int(os.environ.get('COMMAND_TIMEOUT', 10))
+
+# Límites del ejecutor central: procesos simultáneos, por usuario y tamaño de la cola
+MAX_CONCURRENT_COMMANDS = int(os.environ.get('COMMAND_MAX_CONCURRENT', 8))
+MAX_COMMANDS_PER_USER = int(os.environ.get('COMMAND_MAX_PER_USER', 2))
+MAX_QUEUED_COMMANDS = int(os.environ.get('COMMAND_MAX_QUEUED', 100))
+QUEUE_TIMEOUT = int(os.environ.get('COMMAND_QUEUE_TIMEOUT', 60))
+
+# Backend de ejecución: 'thread' (un hilo por comando en marcha) o 'asyncio'
+# (un único bucle de eventos para todos los procesos, ver command_async). Con
+# asyncio un proceso inactivo no ocupa ningún hilo y el límite global es mayor.
+COMMAND_BACKEND = os.environ.get('COMMAND_BACKEND', 'thread')
+ASYNC_MAX_CONCURRENT_COMMANDS = int(os.environ.get('COMMAND_ASYNC_MAX_CONCURRENT', 1024))
+BACKENDS = ('thread', 'asyncio')
+
+# La salida se agrupa durante este intervalo (o hasta este tamaño) antes de emitirse
+COALESCE_INTERVAL = 0.05
+MAX_CHUNK_SIZE = 16 * 1024
+
+# Caracteres de cada flujo que se guardan en memoria y se envían al cliente; el
+# resto se vuelca a disco (en el workspace) y se consulta por páginas
+MAX_CAPTURE_CHARS = int(os.environ.get('COMMAND_MAX_OUTPUT', 256 * 1024))
+SPILL_DIR_NAME = '.command_output'
+OUTPUT_PAGE_SIZE = 64 * 1024
+MAX_OUTPUT_PAGE_SIZE = OUTPUT_PAGE_SIZE * 16
+OUTPUT_RETENTION = int(os.environ.get('COMMAND_OUTPUT_RETENTION', 60 * 60))
+MAX_SPILLED_OUTPUTS = 50
+
+_READ_SIZE = 64 * 1024
+
+
+def _kill_process_group(process):
+    """Termina el proceso y todos sus hijos (se lanzan en su propia sesión)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError:
+        process.kill()
+
+
+class _OutputCoalescer:
+    """Acumula fragmentos de stdout/stderr y los entrega agrupados por intervalo o tamaño."""
+
+    def __init__(self, on_output, interval, max_size):
+        self.on_output = on_output
+        self.interval = interval
+        self.max_size = max_size
+        self.pending = []
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, stream, text):
+        if not text or not self.on_output:
+            return
+        # Fusionar con el fragmento anterior si es del mismo flujo
+        if self.pending and self.pending[-1][0] == stream:
+            self.pending[-1][1].append(text)
+        else:
+            self.pending.append((stream, [text]))
+        self.pending_size += len(text)
+        if self.pending_size >= self.max_size:
+            self.flush()
+
+    def maybe_flush(self):
+        if self.pending and time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending, self.pending_size = self.pending, [], 0
+        self.last_flush = time.monotonic()
+        for stream, parts in pending:
+            try:
+                self.on_output(stream, ''.join(parts))
+            except Exception as e:
+                logger.warning(f"Error al entregar salida del comando: {str(e)}")
+
+
+class _StreamCapture:
+    """Guarda en memoria los primeros `max_chars` caracteres de un flujo.
+
+    Si se supera el límite y hay `spill_path`, el flujo completo se escribe en
+    ese archivo (UTF-8) para poder leerlo después por páginas.
+    """
+
+    def __init__(self, max_chars, spill_path=None):
+        self.max_chars = max_chars
+        self.spill_path = spill_path
+        self.parts = []
+        self.size = 0
+        self.spill_file = None
+        self.truncated = False
+
+    def add(self, text):
+        """Añade texto y devuelve la parte que cabe en memoria (la que se envía al cliente)."""
+        if not text:
+            return ''
+        if self.truncated:
+            if self.spill_file:
+                self.spill_file.write(text.encode('utf-8'))
+            return ''
+        room = self.max_chars - self.size
+        if len(text) <= room:
+            self.parts.append(text)
+            self.size += len(text)
+            return text
+        head = text[:room]
+        self.parts.append(head)
+        self.size += len(head)
+        self.truncated = True
+        if self.spill_path:
+            try:
+                os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+                self.spill_file = open(self.spill_path, 'wb')
+                self.spill_file.write(''.join(self.parts).encode('utf-8'))
+                self.spill_file.write(text[room:].encode('utf-8'))
+            except OSError as e:
+                logger.warning(f"No se pudo volcar la salida a {self.spill_path}: {str(e)}")
+                self.spill_file = None
+        return head
+
+    def value(self):
+        return ''.join(self.parts)
+
+    def close(self):
+        if self.spill_file:
+            self.spill_file.close()
+
+
+def stream_command(command, cwd, on_output=None, timeout=DEFAULT_TIMEOUT,
+                   coalesce_interval=COALESCE_INTERVAL, max_chunk_size=MAX_CHUNK_SIZE,
+                   on_start=None, max_capture=MAX_CAPTURE_CHARS, spill_prefix=None):
+    """Ejecuta un comando leyendo stdout/stderr de forma incremental.
+
+    `on_output(stream, text)` recibe la salida agrupada (stream es 'stdout' o
+    'stderr') mientras el proceso sigue en marcha. `on_start(process)` recibe el
+    proceso recién lanzado. Devuelve el mismo resultado que la ejecución
+    bloqueante: success, stdout, stderr y returncode.
+
+    Solo se guardan (y envían) `max_capture` caracteres por flujo; con
+    `truncated` el resto está en `spill_prefix`.<flujo>.log si se indicó.
+    """
+    try:
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            cwd=str(cwd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+    except Exception as e:
+        return {
+            'success': False,
+            'stdout': '',
+            'stderr': f'Error al ejecutar comando: {str(e)}',
+            'returncode': 1
+        }
+
+    if on_start:
+        on_start(process)
+
+    coalescer = _OutputCoalescer(on_output, coalesce_interval, max_chunk_size)
+    collected = {
+        stream_name: _StreamCapture(max_capture, f"{spill_prefix}.{stream_name}.log" if spill_prefix else None)
+        for stream_name in ('stdout', 'stderr')
+    }
+    decoders = {
+        'stdout': codecs.getincrementaldecoder('utf-8')(errors='replace'),
+        'stderr': codecs.getincrementaldecoder('utf-8')(errors='replace')
+    }
+
+    selector = selectors.DefaultSelector()
+    for stream_name, pipe in (('stdout', process.stdout), ('stderr', process.stderr)):
+        os.set_blocking(pipe.fileno(), False)
+        selector.register(pipe, selectors.EVENT_READ, stream_name)
+
+    deadline = time.monotonic() + timeout if timeout else None
+    timed_out = False
+    try:
+        while selector.get_map():
+            wait = coalesce_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                wait = min(wait, remaining)
+
+            for key, _ in selector.select(wait):
+                stream_name = key.data
+                try:
+                    data = os.read(key.fileobj.fileno(), _READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                text = decoders[stream_name].decode(data)
+                coalescer.add(stream_name, collected[stream_name].add(text))
+
+            coalescer.maybe_flush()
+    finally:
+        selector.close()
+
+    if timed_out:
+        _kill_process_group(process)
+    else:
+        for stream_name, decoder in decoders.items():
+            tail = decoder.decode(b'', final=True)
+            coalescer.add(stream_name, collected[stream_name].add(tail))
+    coalescer.flush()
+    for capture in collected.values():
+        capture.close()
+
+    process.stdout.close()
+    process.stderr.close()
+    try:
+        returncode = process.wait(timeout=1)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(process)
+        returncode = process.wait()
+
+    stdout = collected['stdout'].value()
+    stderr = collected['stderr'].value()
+    truncated = [name for name, capture in collected.items() if capture.truncated]
+
+    if timed_out:
+        result = {
+            'success': False,
+            'stdout': stdout,
+            'stderr': stderr + f'Comando cancelado: tiempo de ejecución excedido ({timeout}s)',
+            'returncode': 124,
+            'timed_out': True
+        }
+    else:
+        result = {
+            'success': returncode == 0,
+            'stdout': stdout,
+            'stderr': stderr,
+            'returncode': returncode
+        }
+    result['truncated'] = bool(truncated)
+    if truncated:
+        result['spilled'] = [name for name in truncated if collected[name].spill_file]
+    return result
+
+
+def read_output_page(path, offset=0, limit=OUTPUT_PAGE_SIZE):
+    """Lee `limit` bytes de un archivo de salida sin cortar caracteres UTF-8.
+
+    `limit` se ajusta a [4, MAX_OUTPUT_PAGE_SIZE]: con al menos 4 bytes cabe
+    cualquier carácter y cada página avanza.
+    """
+    limit = max(4, min(limit, MAX_OUTPUT_PAGE_SIZE))
+    total_size = os.path.getsize(path)
+    offset = max(0, min(offset, total_size))
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(limit)
+    # No empezar ni terminar en mitad de un carácter multibyte
+    start = 0
+    while start < len(data) and start < 4 and (data[start] & 0xC0) == 0x80:
+        start += 1
+    end = len(data)
+    if offset + end < total_size:
+        back = 0
+        while back < min(4, end) and (data[end - back - 1] & 0xC0) == 0x80:
+            back += 1
+        if back < end and data[end - back - 1] >= 0xC0:
+            lead = data[end - back - 1]
+            expected = 4 if lead >= 0xF0 else 3 if lead >= 0xE0 else 2
+            # Solo se recorta si el último carácter está incompleto
+            if back + 1 < expected:
+                end -= back + 1
+    next_offset = offset + end
+    return {
+        'offset': offset + start,
+        'next_offset': next_offset,
+        'total_size': total_size,
+        'eof': next_offset >= total_size,
+        'data': data[start:end].decode('utf-8', errors='replace')
+    }
+
+
+class ExecutorBusy(Exception):
+    """El comando no se pudo encolar o esperó demasiado en la cola."""
+
+
+def _emit_result(result, on_output):
+    """Envía a on_output la salida de un resultado que no se generó en streaming."""
+    if on_output:
+        for stream_name in ('stdout', 'stderr'):
+            if result[stream_name]:
+                on_output(stream_name, result[stream_name])
+
+
+def _busy_result(message, job_id=None):
+    return {
+        'success': False,
+        'stdout': '',
+        'stderr': message,
+        'returncode': 1,
+        'busy': True,
+        'truncated': False,
+        'job_id': job_id
+    }
+
+
+def _deliver(on_done, result):
+    try:
+        on_done(result)
+    except Exception as e:
+        logger.warning(f"Error al entregar el resultado del comando: {str(e)}")
+
+
+def _record_history(command, user_id, result, started, instruction=None, model=None):
+    if not command_history.enabled:
+        return
+    command_history.record(command, instruction=instruction, returncode=result.get('returncode'), model=model,
+                           duration=time.time() - started, user_id=user_id,
+                           output=result.get('stdout', '') + result.get('stderr', ''))
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+class _Job:
+    """Un comando enviado al ejecutor: en cola, en ejecución o cancelado."""
+
+    __slots__ = ('job_id', 'user_id', 'command', 'started', 'cancelled', 'process', 'created_at',
+                 'launch', 'on_done', 'on_queued', 'reported_position')
+
+    def __init__(self, job_id, user_id, command):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.command = command
+        self.started = False
+        self.cancelled = False
+        self.process = None
+        self.created_at = time.time()
+        # Solo en comandos enviados con submit() al backend asyncio: nadie espera
+        # en la cola, así que el despacho los arranca y les notifica la posición
+        self.launch = None
+        self.on_done = None
+        self.on_queued = None
+        self.reported_position = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'user_id': self.user_id,
+            'command': self.command,
+            'status': 'running' if self.started else 'queued',
+            'created_at': self.created_at
+        }
+
+
+class CommandExecutor:
+    """Ejecutor central de comandos con concurrencia limitada.
+
+    Como mucho `max_concurrent` procesos a la vez y `per_user` por usuario. Los
+    comandos que no caben esperan en una cola FIFO; un usuario que ya alcanzó
+    su límite no bloquea a los que tiene detrás de otros usuarios. Cada comando
+    tiene un job_id con el que se puede cancelar mientras espera o se ejecuta.
+
+    `run` bloquea hasta que el comando termina; `submit` vuelve enseguida y
+    entrega el resultado a un callback. Con el backend 'asyncio' los procesos
+    se gestionan desde el bucle de command_async en lugar de un hilo cada uno.
+    """
+
+    def __init__(self, max_concurrent=None, per_user=MAX_COMMANDS_PER_USER,
+                 max_queued=MAX_QUEUED_COMMANDS, queue_timeout=QUEUE_TIMEOUT, timeout=DEFAULT_TIMEOUT,
+                 backend=COMMAND_BACKEND):
+        self._default_limit = max_concurrent is None
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.running = 0
+        self.running_per_user = {}
+        self.queue = deque()
+        self.jobs = {}
+        self.outputs = {}
+        self._cond = threading.Condition()
+        self._loop = None
+        self.backend = None
+        self.set_backend(backend)
+
+    def set_backend(self, backend, async_mode=None):
+        """Selecciona el backend ('thread' o 'asyncio').
+
+        `async_mode` es el del servidor Socket.IO: con eventlet o gevent el hilo
+        del bucle asyncio sería un hilo verde que bloquearía al resto, así que
+        se mantiene el backend de hilos.
+        """
+        if backend not in BACKENDS:
+            logger.warning(f"Backend de comandos desconocido '{backend}', se usa 'thread'")
+            backend = 'thread'
+        if backend == 'asyncio' and async_mode in ('eventlet', 'gevent'):
+            logger.warning(f"El backend asyncio no es compatible con async_mode='{async_mode}', se usa 'thread'")
+            backend = 'thread'
+        self.backend = backend
+        if self._default_limit:
+            self.max_concurrent = (ASYNC_MAX_CONCURRENT_COMMANDS if backend == 'asyncio'
+                                   else MAX_CONCURRENT_COMMANDS)
+        if backend == 'asyncio':
+            from command_async import command_loop, stream_command_async
+            self._loop = command_loop
+            self._stream_command_async = stream_command_async
+        logger.info(f"Backend de comandos: {backend} (máximo {self.max_concurrent} simultáneos)")
+
+    def _dispatch(self):
+        """Asigna los huecos libres a los comandos en cola, en orden de llegada."""
+        for job in list(self.queue):
+            if self.running >= self.max_concurrent:
+                break
+            if self.running_per_user.get(job.user_id, 0) >= self.per_user:
+                continue
+            self.queue.remove(job)
+            job.started = True
+            self.running += 1
+            self.running_per_user[job.user_id] = self.running_per_user.get(job.user_id, 0) + 1
+            if job.launch is not None:
+                self._loop.submit(job.launch())
+        self._cond.notify_all()
+        # Los comandos de submit() no esperan en _acquire: se les avisa desde el bucle
+        for position, job in enumerate(self.queue, 1):
+            if job.on_queued is not None and job.reported_position != position:
+                job.reported_position = position
+                self._loop.call_soon(self._notify_queued, job, position)
+
+    @staticmethod
+    def _notify_queued(job, position):
+        try:
+            job.on_queued(position)
+        except Exception as e:
+            logger.warning(f"Error al notificar la posición en cola: {str(e)}")
+
+    def _position(self, job):
+        for position, queued in enumerate(self.queue, 1):
+            if queued is job:
+                return position
+        return 0
+
+    def _acquire(self, job_id, user_id, command, on_queued):
+        with self._cond:
+            if len(self.queue) >= self.max_queued:
+                raise ExecutorBusy('Demasiados comandos en cola, inténtalo de nuevo en unos segundos')
+            if not job_id or job_id in self.jobs:
+                job_id = new_job_id()
+            job = _Job(job_id, user_id, command)
+            self.jobs[job_id] = job
+            self.queue.append(job)
+            self._dispatch()
+            deadline = time.monotonic() + self.queue_timeout
+            reported = None
+            while not job.started and not job.cancelled:
+                position = self._position(job)
+                if on_queued and position != reported:
+                    reported = position
+                    self._cond.release()
+                    try:
+                        on_queued(position)
+                    except Exception as e:
+                        logger.warning(f"Error al notificar la posición en cola: {str(e)}")
+                    finally:
+                        self._cond.acquire()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.queue.remove(job)
+                    self.jobs.pop(job_id, None)
+                    raise ExecutorBusy(f'El comando esperó más de {self.queue_timeout}s en la cola')
+                self._cond.wait(remaining)
+            return job
+
+    def _release(self, job):
+        with self._cond:
+            self.jobs.pop(job.job_id, None)
+            job.process = None
+            if not job.started:
+                return
+            self.running -= 1
+            count = self.running_per_user.get(job.user_id, 1) - 1
+            if count:
+                self.running_per_user[job.user_id] = count
+            else:
+                self.running_per_user.pop(job.user_id, None)
+            self._dispatch()
+
+    def _attach_process(self, job, process):
+        with self._cond:
+            job.process = process
+            cancelled = job.cancelled
+        # Cancelado entre la salida de la cola y el arranque del proceso
+        if cancelled:
+            _kill_process_group(process)
+
+    def run(self, command, cwd, user_id='default', on_output=None, on_queued=None,
+            timeout=None, job_id=None, spill_dir=None, instruction=None, model=None):
+        """Ejecuta un comando respetando los límites; bloquea hasta que termina.
+
+        `on_queued(position)` se llama cuando el comando tiene que esperar y cada
+        vez que cambia su posición en la cola. `job_id` permite al cliente fijar
+        el identificador con el que después puede cancelarlo (si no se indica o
+        ya está en uso se genera uno). El resultado incluye siempre `job_id`.
+        La salida que no cabe en memoria se vuelca en `spill_dir` (por defecto
+        `cwd`) y se consulta con `output_page`. Lanza ExecutorBusy si la cola
+        está llena o si la espera supera `queue_timeout`.
+
+        Los comandos de solo lectura (`ls -la`, `git status`...) se sirven
+        desde command_cache mientras el observador no notifique cambios en el
+        workspace (`spill_dir`, por defecto `cwd`); el resultado lleva `cached`.
+
+        Cada comando ejecutado se añade a command_history con `instruction` (la
+        orden en lenguaje natural, si la hubo) y `model` (quién la tradujo).
+        """
+        if self.backend == 'asyncio':
+            return self._run_on_loop(command, cwd, user_id, on_output, on_queued, timeout, job_id, spill_dir,
+                                     instruction, model)
+
+        started = time.time()
+        workspace = spill_dir or cwd
+        cache_entry, result = self._from_cache(command, cwd, workspace, on_output, job_id)
+        if result is None:
+            result = self._run(command, cwd, workspace, user_id, on_output, on_queued, timeout, job_id)
+            self._store_result(cache_entry, workspace, result)
+        _record_history(command, user_id, result, started, instruction, model)
+        return result
+
+    def submit(self, command, cwd, on_done, user_id='default', on_output=None, on_queued=None,
+               timeout=None, job_id=None, spill_dir=None, instruction=None, model=None):
+        """Como run, pero sin bloquear: `on_done(result)` recibe el resultado.
+
+        Con el backend 'asyncio' el comando espera en la cola sin ocupar ningún
+        hilo y los callbacks (`on_output`, `on_queued`, `on_done`) se llaman
+        desde el hilo del bucle, así que no deben bloquear (un socketio.emit es
+        suficiente). Con 'thread' se ejecuta run en un hilo propio. Si la cola
+        está llena o la espera se agota, el resultado lleva `busy`.
+        """
+        if self.backend != 'asyncio':
+            def worker():
+                try:
+                    result = self.run(command, cwd, user_id=user_id, on_output=on_output, on_queued=on_queued,
+                                      timeout=timeout, job_id=job_id, spill_dir=spill_dir,
+                                      instruction=instruction, model=model)
+                except ExecutorBusy as e:
+                    result = _busy_result(str(e), job_id)
+                except Exception as e:
+                    logger.error(f"Error al ejecutar comando '{command}': {str(e)}")
+                    result = {'success': False, 'stdout': '', 'stderr': f'Error al ejecutar comando: {str(e)}',
+                              'returncode': 1, 'truncated': False, 'job_id': job_id}
+                _deliver(on_done, result)
+            threading.Thread(target=worker, name='command-submit', daemon=True).start()
+            return
+
+        started = time.time()
+        workspace = spill_dir or cwd
+        cache_entry, result = self._from_cache(command, cwd, workspace, on_output, job_id)
+        if result is not None:
+            _record_history(command, user_id, result, started, instruction, model)
+            _deliver(on_done, result)
+            return
+        result = run_builtin(command, cwd, workspace)
+        if result is not None:
+            _emit_result(result, on_output)
+            result['job_id'] = job_id or new_job_id()
+            self._store_result(cache_entry, workspace, result)
+            _record_history(command, user_id, result, started, instruction, model)
+            _deliver(on_done, result)
+            return
+
+        def finish(result):
+            if not result.get('busy'):
+                self._store_result(cache_entry, workspace, result)
+                _record_history(command, user_id, result, started, instruction, model)
+            _deliver(on_done, result)
+
+        with self._cond:
+            if len(self.queue) >= self.max_queued:
+                job = None
+            else:
+                if not job_id or job_id in self.jobs:
+                    job_id = new_job_id()
+                job = _Job(job_id, user_id, command)
+                job.on_done = finish
+                job.on_queued = on_queued
+                job.launch = lambda: self._run_async(job, command, cwd, workspace, on_output, timeout)
+                self.jobs[job_id] = job
+                self.queue.append(job)
+                self._dispatch()
+                queued = not job.started
+        if job is None:
+            _deliver(on_done, _busy_result('Demasiados comandos en cola, inténtalo de nuevo en unos segundos', job_id))
+        elif queued:
+            self._loop.call_later(self.queue_timeout, self._expire, job)
+
+    def _run_on_loop(self, command, cwd, user_id, on_output, on_queued, timeout, job_id, spill_dir,
+                     instruction, model):
+        """run() con el backend asyncio: el hilo que llama solo espera el resultado."""
+        if self._loop.in_loop_thread():
+            raise RuntimeError('run() bloquearía el bucle de comandos; usa submit()')
+        done = threading.Event()
+        results = []
+
+        def on_done(result):
+            results.append(result)
+            done.set()
+
+        self.submit(command, cwd, on_done, user_id=user_id, on_output=on_output, on_queued=on_queued,
+                    timeout=timeout, job_id=job_id, spill_dir=spill_dir, instruction=instruction, model=model)
+        done.wait()
+        result = results[0]
+        if result.get('busy'):
+            raise ExecutorBusy(result['stderr'])
+        return result
+
+    def _from_cache(self, command, cwd, workspace, on_output, job_id):
+        """(entrada de caché, resultado en caché o None)."""
+        cache_entry = command_cache.begin(workspace, cwd, command)
+        if cache_entry is None:
+            return None, None
+        result = command_cache.get(cache_entry[0])
+        if result is not None:
+            _emit_result(result, on_output)
+            result.update({'truncated': False, 'cached': True, 'job_id': job_id or new_job_id()})
+        return cache_entry, result
+
+    @staticmethod
+    def _store_result(cache_entry, workspace, result):
+        if cache_entry is not None:
+            command_cache.put(cache_entry[0], cache_entry[1], result)
+        else:
+            # Cualquier otro comando puede haber escrito: no esperar al observador
+            command_cache.invalidate_workspace(workspace)
+
+    def _run(self, command, cwd, workspace, user_id, on_output, on_queued, timeout, job_id):
+        # ls, pwd, cat, mkdir, touch, rm y mv simples se resuelven sin subproceso
+        # (ni hueco en el ejecutor); el resto pasa por la cola
+        result = run_builtin(command, cwd, workspace)
+        if result is not None:
+            _emit_result(result, on_output)
+            result['job_id'] = job_id or new_job_id()
+            return result
+
+        job = self._acquire(job_id, user_id, command, on_queued)
+        try:
+            if job.cancelled:
+                result = {'success': False, 'stdout': '', 'stderr': '', 'returncode': 130}
+            else:
+                spill_prefix = os.path.join(str(workspace), SPILL_DIR_NAME, job.job_id)
+                result = stream_command(command, cwd, on_output=on_output,
+                                        timeout=timeout or self.timeout,
+                                        on_start=lambda process: self._attach_process(job, process),
+                                        spill_prefix=spill_prefix)
+                if result.get('spilled'):
+                    self._register_output(job, spill_prefix, result['spilled'])
+        finally:
+            self._release(job)
+        return self._finish_job(job, result)
+
+    async def _run_async(self, job, command, cwd, workspace, on_output, timeout):
+        try:
+            if job.cancelled:
+                result = {'success': False, 'stdout': '', 'stderr': '', 'returncode': 130}
+            else:
+                spill_prefix = os.path.join(str(workspace), SPILL_DIR_NAME, job.job_id)
+                result = await self._stream_command_async(command, cwd, on_output=on_output,
+                                                          timeout=timeout or self.timeout,
+                                                          on_start=lambda process: self._attach_process(job, process),
+                                                          spill_prefix=spill_prefix)
+                if result.get('spilled'):
+                    self._register_output(job, spill_prefix, result['spilled'])
+        except Exception as e:
+            logger.error(f"Error al ejecutar comando '{command}': {str(e)}")
+            result = {'success': False, 'stdout': '', 'stderr': f'Error al ejecutar comando: {str(e)}',
+                      'returncode': 1}
+        finally:
+            self._release(job)
+        job.on_done(self._finish_job(job, result))
+
+    def _expire(self, job):
+        """Saca de la cola un comando de submit() que esperó más de queue_timeout."""
+        with self._cond:
+            if job.started or job.cancelled or self.jobs.get(job.job_id) is not job:
+                return
+            self.queue.remove(job)
+            self.jobs.pop(job.job_id, None)
+            self._dispatch()
+        job.on_done(_busy_result(f'El comando esperó más de {self.queue_timeout}s en la cola', job.job_id))
+
+    @staticmethod
+    def _finish_job(job, result):
+        if job.cancelled:
+            result.update({
+                'success': False,
+                'stderr': result['stderr'] + 'Comando cancelado por el usuario',
+                'returncode': 130,
+                'cancelled': True
+            })
+        result.setdefault('truncated', False)
+        result['job_id'] = job.job_id
+        return result
+
+    def cancel(self, job_id, user_id=None):
+        """Cancela un comando en cola o en ejecución (mata su grupo de procesos).
+
+        Si se indica `user_id` solo se cancela si el comando es de ese usuario.
+        Devuelve True si el comando existía y se canceló.
+        """
+        finish = None
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or (user_id is not None and job.user_id != user_id):
+                return False
+            job.cancelled = True
+            process = job.process
+            if not job.started:
+                self.queue.remove(job)
+                if job.launch is not None:
+                    # Nadie espera a los comandos de submit(): se les entrega el resultado
+                    self.jobs.pop(job_id, None)
+                    finish = job.on_done
+                self._dispatch()
+        if process is not None:
+            _kill_process_group(process)
+        if finish is not None:
+            result = {'success': False, 'stdout': '', 'stderr': '', 'returncode': 130}
+            self._loop.call_soon(finish, self._finish_job(job, result))
+        logger.info(f"Comando cancelado: {job.command} ({job_id})")
+        return True
+
+    def _register_output(self, job, spill_prefix, streams):
+        with self._cond:
+            self.outputs[job.job_id] = {
+                'user_id': job.user_id,
+                'files': {name: f"{spill_prefix}.{name}.log" for name in streams},
+                'created_at': time.time()
+            }
+            expired = [job_id for job_id, output in self.outputs.items()
+                       if time.time() - output['created_at'] > OUTPUT_RETENTION]
+            excess = len(self.outputs) - len(expired) - MAX_SPILLED_OUTPUTS
+            if excess > 0:
+                # Los más antiguos primero (el diccionario conserva el orden de inserción)
+                expired += [job_id for job_id in self.outputs if job_id not in expired][:excess]
+            removed = [self.outputs.pop(job_id) for job_id in expired]
+        for output in removed:
+            for path in output['files'].values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def output_page(self, job_id, stream='stdout', offset=0, limit=OUTPUT_PAGE_SIZE, user_id=None):
+        """Página de la salida completa de un comando truncado, o None si no existe."""
+        with self._cond:
+            output = self.outputs.get(job_id)
+            if output is None or (user_id is not None and output['user_id'] != user_id):
+                return None
+            path = output['files'].get(stream)
+        if path is None:
+            return None
+        try:
+            page = read_output_page(path, offset, limit)
+        except OSError:
+            return None
+        page.update({'job_id': job_id, 'stream': stream})
+        return page
+
+    def list_jobs(self, user_id=None):
+        """Comandos en cola o en ejecución (opcionalmente de un usuario)."""
+        with self._cond:
+            return [job.to_dict() for job in self.jobs.values()
+                    if user_id is None or job.user_id == user_id]
+
+    def stats(self):
+        with self._cond:
+            return {
+                'backend': self.backend,
+                'running': self.running,
+                'queued': len(self.queue),
+                'max_concurrent': self.max_concurrent,
+                'per_user': self.per_user
+            }
+
+
+# Instancia global del ejecutor
+command_executor = CommandExecutor()
@@ -0,0 +1,225 @@
+# Historial de comandos ejecutados (modelo models.Command)
+#
+# Guardar cada comando al terminar añadiría una escritura en la base de datos a
+# cada orden de la terminal. El registrador los acumula en memoria y un hilo de
+# fondo los inserta por lotes: cada FLUSH_INTERVAL segundos o en cuanto hay
+# FLUSH_BATCH_SIZE pendientes. Mientras no se configure una base de datos con
+# init_app, record() no hace nada.
+import os
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+
+logger = logging.getLogger('command_history')
+
+FLUSH_INTERVAL = float(os.environ.get('COMMAND_HISTORY_FLUSH_INTERVAL', 2))
+FLUSH_BATCH_SIZE = 100
+# Si la base de datos no responde se descartan los más antiguos
+MAX_BUFFERED = 10000
+MAX_HISTORY_OUTPUT = 4000
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_USERNAME = 'default_user'
+
+history_bp = Blueprint('command_history', __name__)
+
+
+class HistoryRecorder:
+    """Buffer de escritura diferida para el historial de comandos."""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH_SIZE, max_buffered=MAX_BUFFERED):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self.buffer = []
+        self.flushed = 0
+        self.dropped = 0
+        self._sink = None
+        self._lock = threading.Lock()
+        # Solo un volcado a la vez; el orden de inserción es el de ejecución
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self._sink is not None
+
+    def configure(self, sink):
+        """Activa el registro; `sink(rows)` inserta una lista de dicts en una transacción."""
+        self._sink = sink
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='command-history', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def record(self, command, instruction=None, returncode=None, model=None, duration=None,
+               user_id='default', output=None):
+        """Añade un comando ejecutado al buffer (no bloquea ni toca la base de datos)."""
+        if self._sink is None:
+            return
+        row = {
+            'workspace': user_id or 'default',
+            'instruction': instruction or command,
+            'generated_command': command,
+            'output': output[:MAX_HISTORY_OUTPUT] if output else output,
+            'status': returncode,
+            'model_used': model,
+            'duration': duration,
+            'executed_at': datetime.utcnow()
+        }
+        with self._lock:
+            if len(self.buffer) >= self.max_buffered:
+                del self.buffer[0]
+                self.dropped += 1
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Inserta lo pendiente; devuelve el número de filas guardadas."""
+        if self._sink is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                rows, self.buffer = self.buffer, []
+            if not rows:
+                return 0
+            try:
+                self._sink(rows)
+            except Exception as e:
+                logger.error(f"No se pudo guardar el historial de comandos ({len(rows)} filas): {str(e)}")
+                # Se reintentan en el siguiente volcado, delante de los nuevos
+                with self._lock:
+                    self.buffer[:0] = rows
+                    overflow = len(self.buffer) - self.max_buffered
+                    if overflow > 0:
+                        del self.buffer[:overflow]
+                        self.dropped += overflow
+                return 0
+            self.flushed += len(rows)
+            return len(rows)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'buffered': len(self.buffer),
+                'flushed': self.flushed,
+                'dropped': self.dropped
+            }
+
+
+command_history = HistoryRecorder()
+
+
+def init_app(app, db):
+    """Guarda el historial con el modelo Command y registra /api/history."""
+    from sqlalchemy import insert
+    from models import User, Command
+
+    user_ids = {}
+
+    def resolve_users(usernames):
+        """id del usuario propietario de cada workspace (el usuario por defecto si no tiene cuenta).
+
+        Solo rellena la clave foránea: el historial se consulta por la columna
+        workspace, así que los workspaces sin cuenta no comparten historial.
+        """
+        missing = [name for name in usernames if name not in user_ids]
+        if missing:
+            for user in db.session.query(User.id, User.username).filter(
+                    User.username.in_(missing + [DEFAULT_USERNAME])):
+                user_ids[user.username] = user.id
+            if DEFAULT_USERNAME not in user_ids:
+                default_user = User(username=DEFAULT_USERNAME, email='default@example.com')
+                default_user.set_password('default_password')
+                db.session.add(default_user)
+                db.session.flush()
+                user_ids[DEFAULT_USERNAME] = default_user.id
+            for name in missing:
+                user_ids.setdefault(name, user_ids[DEFAULT_USERNAME])
+        return {name: user_ids[name] for name in usernames}
+
+    def sink(rows):
+        with app.app_context():
+            try:
+                ids = resolve_users(list({row['workspace'] for row in rows}))
+                db.session.execute(insert(Command), [dict(row, user_id=ids[row['workspace']]) for row in rows])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    app.extensions['command_history'] = db
+    app.register_blueprint(history_bp)
+    command_history.configure(sink)
+
+
+@history_bp.route('/api/history', methods=['GET'])
+def history_api():
+    """Historial de comandos de un workspace, del más reciente al más antiguo.
+
+    Paginación por clave: `cursor` es el `next_cursor` de la página anterior
+    ("<executed_at ISO>,<id>"), de modo que cada página es una consulta por
+    índice sin OFFSET.
+    """
+    from flask import current_app
+    from sqlalchemy import tuple_
+    from models import Command
+
+    db = current_app.extensions.get('command_history')
+    if db is None:
+        return jsonify({'success': False, 'error': 'Historial no disponible'}), 503
+
+    user_id = request.args.get('user_id', 'default')
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit debe ser un número'}), 400
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            executed_at, command_id = cursor.rsplit(',', 1)
+            cursor = (datetime.fromisoformat(executed_at), int(command_id))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'cursor no válido'}), 400
+
+    # Lo que sigue en el buffer también forma parte del historial
+    command_history.flush()
+
+    query = db.session.query(Command).filter(Command.workspace == user_id)
+    if cursor:
+        query = query.filter(tuple_(Command.executed_at, Command.id) < cursor)
+    rows = query.order_by(Command.executed_at.desc(), Command.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].executed_at.isoformat()},{rows[-1].id}"
+
+    return jsonify({
+        'success': True,
+        'commands': [{
+            'id': row.id,
+            'instruction': row.instruction,
+            'command': row.generated_command,
+            'output': row.output,
+            'status': row.status,
+            'model': row.model_used,
+            'duration': row.duration,
+            'executed_at': row.executed_at.isoformat()
+        } for row in rows],
+        'next_cursor': next_cursor
+    })
@@ -0,0 +1,483 @@
+# Validación de seguridad de comandos compartida por todas las terminales
+#
+# El comando se recorre una sola vez con un analizador léxico al estilo de shlex
+# (comillas, escapes, heredocs, redirecciones y operadores) y el resultado se
+# contrasta con una política precompilada. Así `echo "a; b"` no se confunde con
+# dos comandos y `cat resumen.txt` no se rechaza por contener "su".
+#
+# El análisis completo cuesta más que las comprobaciones por subcadenas que
+# sustituye. Los comandos planos de programas sin reglas propias (ls, cat,
+# mkdir...) se deciden sin tokenizar, y los veredictos se recuerdan por
+# política; benchmark_command_policy.py mide los tres casos.
+import os
+import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger('command_policy')
+
+# Programas que nunca se permiten (se compara el nombre base, en minúsculas)
+BLOCKED_PROGRAMS = {'sudo', 'su', 'doas', 'wget', 'curl', 'dd', 'mkfs', 'fdisk', 'shutdown', 'reboot'}
+BLOCKED_PREFIXES = ('mkfs.',)
+
+# Programas que ejecutan a otro: se valida el programa al que envuelven. Para
+# cada uno, las opciones que llevan su valor en la palabra siguiente (nice -n 5,
+# xargs -I {}) y cuántos argumentos posicionales van antes del comando
+WRAPPER_OPTIONS = {
+    'env': {'-u', '--unset', '-C', '--chdir'},
+    'nohup': set(),
+    'nice': {'-n', '--adjustment'},
+    'time': {'-f', '--format', '-o', '--output'},
+    'timeout': {'-s', '--signal', '-k', '--kill-after'},
+    'xargs': {'-n', '-I', '-P', '-L', '-s', '-d', '-E', '-a', '--max-args', '--replace', '--max-procs',
+              '--max-lines', '--max-chars', '--delimiter', '--eof', '--arg-file', '--process-slot-var'},
+    'exec': {'-a'},
+    'command': set(),
+    'builtin': set(),
+    'stdbuf': {'-i', '-o', '-e', '--input', '--output', '--error'},
+    'watch': {'-n', '--interval'},
+    'setsid': set(),
+    'ionice': {'-c', '-n', '-p', '-P', '-u', '--class', '--classdata'},
+    'taskset': set(),
+}
+WRAPPER_POSITIONALS = {'timeout': 1, 'taskset': 1}
+WRAPPER_PROGRAMS = frozenset(WRAPPER_OPTIONS)
+
+# Intérpretes cuyo argumento -c (o eval) es otro comando a validar
+SHELL_PROGRAMS = {'sh', 'bash', 'zsh', 'dash', 'ksh'}
+
+# find ejecuta lo que va tras estas acciones hasta ';' o '+'
+FIND_EXEC_ACTIONS = {'-exec', '-execdir', '-ok', '-okdir'}
+
+# Intérpretes con código en línea (python -c, node -e...): no se puede validar
+INLINE_CODE_OPTIONS = {
+    'python': ('-c',), 'node': ('-e', '-p', '--eval', '--print'), 'nodejs': ('-e', '-p', '--eval', '--print'),
+    'perl': ('-e', '-E'), 'ruby': ('-e',), 'php': ('-r',),
+}
+_PYTHON_RE = re.compile(r'^python[\d.]*$')
+
+AWK_PROGRAMS = {'awk', 'gawk', 'mawk', 'nawk'}
+# system(), tuberías de awk hacia o desde comandos
+AWK_EXEC_RE = re.compile(r'system\s*\(|\|\s*getline|\|&|\bprintf?\b[^;}]*\|')
+
+# git -c con valores que git ejecuta como comandos
+GIT_UNSAFE_CONFIG_RE = re.compile(
+    r'^(alias\.[^=]*=\s*!|core\.(pager|editor|sshcommand|fsmonitor|hookspath|askpass)='
+    r'|[^=]*\.(command|cmd|clean|smudge|process|external|helper|program)=)', re.IGNORECASE)
+GIT_UNSAFE_OPTIONS = ('--upload-pack', '--receive-pack', '--exec', '--config-env')
+
+# Programas cuyos argumentos son datos (texto, rutas, patrones): no se buscan en
+# ellos nombres de programas prohibidos
+DATA_PROGRAMS = {'echo', 'printf', 'grep', 'egrep', 'fgrep', 'cat', 'ls', 'touch', 'mkdir',
+                 'head', 'tail', 'wc', 'sort', 'uniq', 'cp', 'mv', 'rm', 'git'}
+
+# Programas sin reglas propias sobre sus argumentos: un comando plano (sin
+# comillas, operadores ni redirecciones) con uno de ellos se decide con una sola
+# expresión regular, sin tokenizar
+FAST_PATH_PROGRAMS = (DATA_PROGRAMS - {'rm', 'git'}) | {
+    'pwd', 'date', 'whoami', 'du', 'df', 'free', 'uname', 'cal', 'clear', 'ps', 'tree', 'stat', 'file', 'which'
+}
+
+# Veredictos recordados por política (los comandos de una terminal se repiten mucho)
+VERDICT_CACHE_SIZE = 4096
+
+# Programas que se pueden encadenar con tuberías
+PIPE_PROGRAMS = {'ls', 'cat', 'grep', 'sed', 'awk', 'head', 'tail', 'wc', 'sort', 'uniq'}
+
+# rm recursivo sobre la raíz, el home, el workspace completo o comodines globales
+DANGEROUS_RM_TARGET = r'^(/.*|~.*|\*|\.\*|\.{1,2}/?|\./\*|.*(^|/)\.\.(/.*)?)$'
+DANGEROUS_CHMOD_MODE = r'^(0?777|a\+rwx|ugo\+rwx)$'
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>[ \t\r]+|\\\n)
+  | (?P<nl>\n)
+  | (?P<comment>(?<![^\s;&|()])\#[^\n]*)
+  | (?P<heredoc><<-?(?!<))
+  | (?P<redirect>&>>?|\d*(?:>>|>&|>\||<&|<>|<<<|>|<))
+  | (?P<op>\|\||&&|;;|[;&|()])
+  | (?P<word>(?:[^\s;&|()<>'"`\\$]|\\.|'[^']*'|"(?:[^"\\`$]|\\.|\$(?!\())*"|\$(?!\())+)
+""", re.VERBOSE | re.DOTALL)
+
+# Sin ninguno de estos caracteres (comillas, operadores, redirecciones ni
+# comentarios) el comando se divide con split()
+_SHELL_SYNTAX_RE = re.compile(r'[\'"`\\$;&|()<>#\n]')
+
+_UNQUOTE_RE = re.compile(r"""'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)""", re.DOTALL)
+_ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+
+
+def _unquote(word):
+    if "'" not in word and '"' not in word and '\\' not in word:
+        return word
+
+    def replace(match):
+        if match.group(1) is not None:
+            return match.group(1)
+        if match.group(2) is not None:
+            return re.sub(r'\\(.)', r'\1', match.group(2))
+        return match.group(3)
+    return _UNQUOTE_RE.sub(replace, word)
+
+
+class CommandRejected(Exception):
+    pass
+
+
+def tokenize(command):
+    """Divide el comando en comandos simples en una sola pasada.
+
+    Devuelve (comandos, operadores): cada comando es (palabras, redirecciones)
+    con las palabras ya sin comillas y las redirecciones como (operador,
+    destino); operadores es el conjunto de operadores de control y tuberías
+    usados (un salto de línea entre comandos cuenta como ';'). Lanza
+    CommandRejected ante sustituciones de comandos, subshells o comillas sin
+    cerrar.
+    """
+    if not _SHELL_SYNTAX_RE.search(command):
+        words = command.split()
+        return ([(words, [])] if words else []), set()
+
+    segments = []
+    operators = set()
+    words = []
+    redirects = []
+    pending_redirect = None
+    newline_pending = False
+    heredocs = []
+    pos = 0
+    length = len(command)
+
+    while pos < length:
+        match = _TOKEN_RE.match(command, pos)
+        if match is None:
+            rest = command[pos:]
+            if '`' in rest or '$(' in rest:
+                raise CommandRejected('Sustitución de comandos no permitida')
+            raise CommandRejected('Comillas sin cerrar o sintaxis no soportada')
+        kind = match.lastgroup
+        value = match.group(kind)
+        pos = match.end()
+
+        if kind in ('ws', 'comment'):
+            continue
+        if newline_pending and kind in ('word', 'redirect', 'heredoc'):
+            # Un salto de línea entre dos comandos equivale a ';'
+            operators.add(';')
+            newline_pending = False
+
+        if pending_redirect is not None:
+            if kind != 'word':
+                raise CommandRejected('Redirección sin destino')
+            target = _unquote(value)
+            if pending_redirect.startswith('<<') and pending_redirect != '<<<':
+                # El cuerpo de un heredoc solo se expande si el delimitador no va entre comillas
+                heredocs.append((target, value == target))
+            redirects.append((pending_redirect, target))
+            pending_redirect = None
+        elif kind in ('redirect', 'heredoc'):
+            pending_redirect = value
+        elif kind == 'word':
+            words.append(_unquote(value))
+        elif kind == 'nl':
+            if words or redirects:
+                segments.append((words, redirects))
+                words, redirects = [], []
+                newline_pending = True
+            if heredocs:
+                pos = _skip_heredocs(command, pos, heredocs)
+                heredocs = []
+        else:
+            if value in ('(', ')'):
+                raise CommandRejected('Subshells no permitidos')
+            if not (words or redirects):
+                raise CommandRejected(f"Operador '{value}' sin comando")
+            segments.append((words, redirects))
+            words, redirects = [], []
+            operators.add(value)
+
+    if pending_redirect is not None:
+        raise CommandRejected('Redirección sin destino')
+    if words or redirects:
+        segments.append((words, redirects))
+    elif operators & {'|', '||', '&&'}:
+        raise CommandRejected('Operador sin comando')
+    return segments, operators
+
+
+def _skip_heredocs(command, pos, heredocs):
+    """Salta los cuerpos de los heredocs pendientes y devuelve la nueva posición."""
+    for delimiter, expands in heredocs:
+        start = pos
+        while pos < len(command):
+            newline = command.find('\n', pos)
+            line_end = len(command) if newline == -1 else newline
+            line = command[pos:line_end]
+            pos = line_end + 1
+            if line.strip() == delimiter:
+                break
+        body = command[start:pos]
+        if expands and ('$(' in body or '`' in body):
+            raise CommandRejected('Sustitución de comandos no permitida')
+    return pos
+
+
+class CommandPolicy:
+    """Política de seguridad precompilada.
+
+    - blocked_programs / blocked_prefixes: programas prohibidos.
+    - allowed_programs: si se indica, solo estos programas (lista blanca).
+    - pipe_programs: programas que pueden formar parte de una tubería.
+    - allow_control_operators: permite ;, &&, || y & entre comandos.
+    - operand_pattern: si se indica, los operandos deben cumplirlo (salvo en
+      los programas de free_operand_programs).
+    """
+
+    def __init__(self, blocked_programs=BLOCKED_PROGRAMS, blocked_prefixes=BLOCKED_PREFIXES,
+                 allowed_programs=None, pipe_programs=PIPE_PROGRAMS, allow_control_operators=False,
+                 operand_pattern=None, free_operand_programs=('echo',), fast_path=True):
+        self.blocked_programs = frozenset(blocked_programs)
+        self.blocked_prefixes = tuple(blocked_prefixes)
+        self.allowed_programs = frozenset(allowed_programs) if allowed_programs else None
+        self.pipe_programs = frozenset(pipe_programs)
+        self.allow_control_operators = allow_control_operators
+        self.operand_re = re.compile(operand_pattern) if operand_pattern else None
+        self.free_operand_programs = frozenset(free_operand_programs)
+        self.rm_target_re = re.compile(DANGEROUS_RM_TARGET)
+        self.chmod_mode_re = re.compile(DANGEROUS_CHMOD_MODE)
+        # Red de seguridad: un programa prohibido en cualquier parte de los
+        # argumentos (awk, sed, make... pueden ejecutar comandos de mil formas)
+        names = [re.escape(name) for name in sorted(self.blocked_programs)]
+        names += [re.escape(prefix) + r'[\w.]*' for prefix in self.blocked_prefixes]
+        separators = r'\s;&|()\'"`{}=!:,'
+        self.blocked_word_re = re.compile(
+            rf'(?:^|[{separators}])(?:[^{separators}]*/)?({"|".join(names)})(?=[{separators}]|$)'
+        ) if names else None
+        # Camino rápido: programa de FAST_PATH_PROGRAMS y argumentos sin sintaxis de shell
+        fast = {program for program in FAST_PATH_PROGRAMS
+                if program not in self.blocked_programs and not program.startswith(self.blocked_prefixes)}
+        if self.allowed_programs is not None:
+            fast &= self.allowed_programs
+        self.fast_programs = frozenset(fast) if fast_path else frozenset()
+        self._verdicts = lru_cache(maxsize=VERDICT_CACHE_SIZE)(self._check)
+
+    def check(self, command):
+        """Devuelve (permitido, motivo)."""
+        return self._verdicts(command)
+
+    def _check(self, command, _depth=0):
+        if not command:
+            return False, 'Comando vacío'
+        if not _SHELL_SYNTAX_RE.search(command):
+            words = command.split()
+            if not words:
+                return False, 'Comando vacío'
+            if words[0] in self.fast_programs:
+                return self._check_plain(words[0], words[1:])
+        elif not command.strip():
+            return False, 'Comando vacío'
+        try:
+            tokenized = tokenize(command)
+        except CommandRejected as e:
+            return False, str(e)
+
+        segments, operators = tokenized
+        if operators - {'|'} and not self.allow_control_operators:
+            return False, 'Operadores de control (;, &&, ||, &) no permitidos'
+        in_pipeline = '|' in operators
+        for words, redirects in segments:
+            reason = self._check_redirects(redirects)
+            if reason:
+                return False, reason
+            reason = self._check_simple_command(words, in_pipeline, _depth)
+            if reason:
+                return False, reason
+        return True, None
+
+    def _check_plain(self, program, args):
+        """Veredicto de un comando plano de FAST_PATH_PROGRAMS (el mismo que el análisis completo)."""
+        if args and program not in DATA_PROGRAMS and self.blocked_word_re is not None:
+            # Los espacios separan igual que en la búsqueda por argumento: una sola pasada
+            match = self.blocked_word_re.search(' '.join(args).lower())
+            if match:
+                return False, f"Comando '{match.group(1)}' no permitido por razones de seguridad"
+        if self.operand_re is not None and program not in self.free_operand_programs:
+            for operand in args:
+                if not operand.startswith('-') and not self.operand_re.match(operand):
+                    return False, f"Argumento no permitido: {operand}"
+        return True, None
+
+    def _check_redirects(self, redirects):
+        for operator, target in redirects:
+            if operator.startswith('<<') and operator != '<<<':
+                continue
+            if operator.endswith('&') and (target.isdigit() or target == '-'):
+                continue
+            if operator == '<<<' or target == '/dev/null':
+                continue
+            if os.path.isabs(target) or target.startswith('~') or '..' in target.split('/'):
+                return 'Redirección fuera del directorio de trabajo no permitida'
+        return None
+
+    def _check_simple_command(self, words, in_pipeline, depth):
+        # Saltar asignaciones de variables (VAR=valor comando)
+        index = 0
+        while index < len(words) and _ASSIGNMENT_RE.match(words[index]):
+            index += 1
+        if index == len(words):
+            return None
+
+        program = os.path.basename(words[index]).lower()
+        args = words[index + 1:]
+
+        # Programas envoltorio: validar el programa que ejecutan
+        while program in WRAPPER_PROGRAMS:
+            if program == 'watch':
+                # watch pasa sus argumentos a sh -c
+                script = ' '.join(_skip_wrapper_options(program, args))
+                return self._check_script(script, depth) if script else None
+            rest = _skip_wrapper_options(program, args)
+            if not rest:
+                break
+            program = os.path.basename(rest[0]).lower()
+            args = rest[1:]
+
+        if program in self.blocked_programs or program.startswith(self.blocked_prefixes):
+            return f"Comando '{program}' no permitido por razones de seguridad"
+        if self.allowed_programs is not None and program not in self.allowed_programs:
+            return f"Comando '{program}' no permitido"
+        if in_pipeline and program not in self.pipe_programs:
+            return f"Comando '{program}' no permitido en tuberías"
+        if not args:
+            return None
+
+        if program == 'rm' or program == 'chmod' or self.operand_re is not None:
+            operands = [arg for arg in args if not arg.startswith('-')]
+            if program == 'rm':
+                flags = ''.join(arg[1:] for arg in args if arg.startswith('-') and not arg.startswith('--'))
+                if 'r' in flags or 'R' in flags or '--recursive' in args:
+                    if any(self.rm_target_re.match(operand) for operand in operands):
+                        return 'Borrado recursivo fuera del workspace no permitido'
+            if program == 'chmod' and any(self.chmod_mode_re.match(operand) for operand in operands):
+                return 'Permisos 777 no permitidos'
+
+        if program in SHELL_PROGRAMS or program == 'eval':
+            script = None
+            if program == 'eval':
+                script = ' '.join(args)
+            elif '-c' in args and args.index('-c') + 1 < len(args):
+                script = args[args.index('-c') + 1]
+            if script is not None:
+                reason = self._check_script(script, depth)
+                if reason:
+                    return reason
+
+        reason = self._check_embedded_commands(program, args, depth)
+        if reason:
+            return reason
+
+        if self.operand_re is not None and program not in self.free_operand_programs:
+            for operand in operands:
+                if not self.operand_re.match(operand):
+                    return f"Argumento no permitido: {operand}"
+        return None
+
+    def _check_script(self, script, depth):
+        """Valida un comando anidado (bash -c, watch, find -exec...)."""
+        if depth >= 3:
+            return 'Demasiados intérpretes anidados'
+        allowed, reason = self._check(script, depth + 1)
+        return None if allowed else reason
+
+    def _check_embedded_commands(self, program, args, depth):
+        """Comandos escondidos en los argumentos de programas que no son envoltorios."""
+        if program == 'find':
+            for position, arg in enumerate(args):
+                if arg in FIND_EXEC_ACTIONS:
+                    payload = []
+                    for word in args[position + 1:]:
+                        if word in (';', '+'):
+                            break
+                        payload.append(word)
+                    if depth >= 3:
+                        return 'Demasiados intérpretes anidados'
+                    reason = self._check_simple_command(payload, False, depth + 1)
+                    if reason:
+                        return reason
+        elif program in AWK_PROGRAMS:
+            if any(AWK_EXEC_RE.search(arg) for arg in args):
+                return 'Ejecución de comandos desde awk no permitida'
+        elif program == 'git':
+            for position, arg in enumerate(args):
+                if arg.startswith(GIT_UNSAFE_OPTIONS):
+                    return f"Opción de git '{arg.split('=')[0]}' no permitida"
+                if arg == '-c' and position + 1 < len(args) and GIT_UNSAFE_CONFIG_RE.match(args[position + 1]):
+                    return 'Configuración de git que ejecuta comandos no permitida'
+        else:
+            options = INLINE_CODE_OPTIONS.get('python' if _PYTHON_RE.match(program) else program)
+            if options and any(arg in options or (len(option) == 2 and arg.startswith(option))
+                               for arg in args for option in options):
+                return f"Código en línea de '{program}' no permitido"
+
+        if self.blocked_word_re is not None and program not in DATA_PROGRAMS:
+            for arg in args:
+                match = self.blocked_word_re.search(arg.lower())
+                if match:
+                    return f"Comando '{match.group(1)}' no permitido por razones de seguridad"
+        return None
+
+    def is_allowed(self, command):
+        return self.check(command)[0]
+
+
+def _skip_wrapper_options(program, args):
+    """Argumentos a partir del comando que ejecuta el programa envoltorio."""
+    options = WRAPPER_OPTIONS[program]
+    positionals = WRAPPER_POSITIONALS.get(program, 0)
+    options_done = False
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if not options_done and arg == '--':
+            options_done = True
+        elif not options_done and arg.startswith('-') and len(arg) > 1:
+            if program == 'env' and (arg == '-S' or arg.startswith(('-S', '--split-string'))):
+                # env -S 'cmd args': la cadena se divide en palabras y se ejecuta
+                if arg in ('-S', '--split-string'):
+                    value = args[index + 1] if index + 1 < len(args) else ''
+                    index += 1
+                else:
+                    value = arg.split('=', 1)[1] if arg.startswith('--') else arg[2:]
+                return value.split() + args[index + 1:]
+            if arg in options:
+                index += 1
+        elif program == 'env' and _ASSIGNMENT_RE.match(arg):
+            pass
+        elif positionals:
+            positionals -= 1
+        else:
+            break
+        index += 1
+    return args[index:]
+
+
+# Política de las terminales (xterm, terminal inteligente, API)
+TERMINAL_POLICY = CommandPolicy()
+
+# Política restringida del procesador de comandos: solo operaciones de archivos
+RESTRICTED_POLICY = CommandPolicy(
+    allowed_programs={'mkdir', 'ls', 'echo', 'cat', 'touch', 'rm', 'cp', 'mv'},
+    operand_pattern=r'^[\w\-./]+$'
+)
+
+
+def check_command(command, policy=TERMINAL_POLICY):
+    """(permitido, motivo) según la política indicada."""
+    allowed, reason = policy.check(command)
+    if not allowed:
+        logger.debug(f"Comando rechazado: '{command}' ({reason})")
+    return allowed, reason
+
+
+def is_command_allowed(command, policy=TERMINAL_POLICY):
+    """True si el comando cumple la política indicada."""
+    return check_command(command, policy)[0]
@@ -2,14 +2,18 @@ from flask import Flask, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-import subprocess
 import os
 import logging
 import re
 import json
+import shlex
 import time
 import threading
 from dotenv import load_dotenv
+from command_policy import check_command, RESTRICTED_POLICY
+from nl_translator import translate
+from translation_cache import translation_cache
+from command_executor import command_executor
 
 # Load environment variables
 load_dotenv(override=True)
@@ -31,31 +35,18 @@ socketio = SocketIO(app,
                     ping_timeout=60,
                     ping_interval=25)
 
-# Security: List of allowed commands with regex patterns - MEJORADO PARA PERMITIR REDIRECCIONES
-ALLOWED_COMMANDS = {
-    'mkdir': r'^mkdir [\w\-\.\/]+$',
-    'ls': r'^ls( -[alh]+)?( [\w\/\-\.]+)?$',
-    'echo': r'^echo .*$',  # Patrón más permisivo para echo y redirecciones
-    'cat': r'^cat( [\w\/\-\.]+)+$|^cat [\w\/\-\.]+ << \'EOF\'.*EOF$',  # Permitir heredocs
-    'touch': r'^touch [\w\/\-\.]+$',
-    'rm': r'^rm( -[rf]+)? [\w\/\-\.]+$',
-    'cp': r'^cp( -[r]+)? [\w\/\-\.]+ [\w\/\-\.]+$',
-    'mv': r'^mv [\w\/\-\.]+ [\w\/\-\.]+$',
-}
-
 # NLP command conversion function
 def nl_to_bash(natural_command):
     """
     Convert natural language to bash command
-    In production, this would use OpenAI or similar API
+    Uses the shared phrase translator and falls back to OpenAI only on a miss
     """
-    # Lowercase the command for better matching
-    natural_command = natural_command.lower()
+    lowered = natural_command.lower()
 
     # Detectar comandos específicos para crear archivos con contenido
-    if re.search(r'cre[ae]r? (un )?archivo (\w+) con (un )?mensaje', natural_command):
+    if re.search(r'cre[ae]r? (un )?archivo (\w+) con (un )?mensaje', lowered):
         # Extraer el nombre del archivo
-        match = re.search(r'archivo (\w+)', natural_command)
+        match = re.search(r'archivo (\w+)', lowered)
         if match:
             filename = match.group(1)
             # Si no tiene extensión, agregar .html por defecto
@@ -63,59 +54,23 @@ def nl_to_bash(natural_command):
                 filename = f"{filename}.html"
             return f"echo '<!DOCTYPE html><html><head><title>Bienvenida</title></head><body><h1>Mensaje de Bienvenida</h1></body></html>' > {filename}"
 
-    # Verificar si es un comando para crear archivo con contenido
-    if 'crear archivo con contenido' in natural_command:
-        try:
-            # Extraer la parte después de "crear archivo con contenido"
-            remaining_text = natural_command.split('crear archivo con contenido', 1)[1].strip()
-
-            # Buscar la separación entre el nombre del archivo y el contenido
-            if 'con contenido' in remaining_text:
-                # El formato es "crear archivo con contenido nombre_archivo con contenido contenido_archivo"
-                filename, content = remaining_text.split('con contenido', 1)
-                filename = filename.strip()
-                content = content.strip()
-
-                # Escapar comillas en el contenido si es necesario
-                content = content.replace('"', '\\"')
-
-                # Generar el comando echo
-                return f'echo "{content}" > {filename}'
-            else:
-                # Si no hay "con contenido" después del nombre del archivo
-                return f'touch {remaining_text}'
-        except Exception as e:
-            return "echo 'Error al procesar el comando de crear archivo con contenido'"
-
-    # Procesar otros comandos
-    command_map = {
-        'crear carpeta': 'mkdir',
-        'crear directorio': 'mkdir',
-        'listar': 'ls',
-        'mostrar archivos': 'ls',
-        'mostrar contenido de': 'cat',
-        'leer archivo': 'cat',
-        'crear archivo': 'touch',
-        'eliminar': 'rm',
-        'borrar': 'rm -f',
-        'borrar carpeta': 'rm -rf',
-        'copiar': 'cp',
-        'mover': 'mv',
-        'crear archivo con contenido': 'echo'  # Nuevo comando
-    }
+    translation = translate(natural_command)
+    if translation and translation['command']:
+        return translation['command']
+    if translation and translation['missing']:
+        return f"echo {shlex.quote(translation['missing'])}"
 
-    # Procesar otros comandos
-    for pattern, bash_prefix in command_map.items():
-        if pattern in natural_command:
-            # Extract arguments after the pattern
-            args = natural_command.split(pattern, 1)[1].strip()
+    # Este camino ejecuta el comando sin confirmación: solo traducciones
+    # exactas, nunca las adaptadas de una instrucción parecida
+    cached = translation_cache.get(natural_command, similar=False)
+    if cached:
+        return cached['command']
 
-            # Manejo especial para echo con redirección
-            if bash_prefix == 'echo' and '>' not in args:
-                return f"{bash_prefix} \"{args}\" > archivo.txt"
+    return openai_nl_to_bash(natural_command)
 
-            return f"{bash_prefix} {args}"
 
+def openai_nl_to_bash(natural_command):
+    """Convert natural language to bash with OpenAI (used when no phrase matches)"""
     # Llamada a la API de OpenAI para conversión de lenguaje natural a comandos
     if os.environ.get('OPENAI_API_KEY'):
         import openai
@@ -163,7 +118,9 @@ def nl_to_bash(natural_command):
                 temperature=0.1,
                 max_tokens=500  # Aumentado para permitir comandos más complejos
             )
-            return response.choices[0].message.content.strip()
+            command = response.choices[0].message.content.strip()
+            translation_cache.put(natural_command, command, provider='openai')
+            return command
         except Exception as e:
             logging.error(f"Error with OpenAI API: {str(e)}")
             return "echo 'Error al procesar el comando. Por favor intente de nuevo.'"
@@ -172,77 +129,25 @@ def nl_to_bash(natural_command):
     return "echo 'Para usar esta función, configure la API de OpenAI.'"
 
 
-def validate_command(command):
-    """Validate if command is allowed based on regexes"""
-    # Tratar comandos con redirección especialmente
-    if '>' in command:
-        cmd_parts = command.split('>', 1)
-        base_command = cmd_parts[0].strip()
-
-        # Validar solo la parte del comando antes de la redirección
-        command_parts = base_command.split()
-        if not command_parts:
-            return False
-
-        base_cmd = command_parts[0]
-
-        # Para echo con redirección, permitimos el patrón completo
-        if base_cmd == 'echo':
-            return True
-    else:
-        command_parts = command.split()
-        if not command_parts:
-            return False
-
-        base_cmd = command_parts[0]
-
-    if base_cmd in ALLOWED_COMMANDS:
-        pattern = ALLOWED_COMMANDS[base_cmd]
-        match_result = re.match(pattern, command)
-
-        # Log para depuración
-        logging.debug(f"Command: {command}, Pattern: {pattern}, Match: {match_result is not None}")
-
-        return match_result is not None
-
-    return False
-
-def execute_command(command):
-    """Execute command and return result"""
+def execute_command(command, user_id='default'):
+    """Execute command through the shared executor and return result"""
     try:
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            capture_output=True, 
-            text=True,
-            timeout=5  # Safety: timeout after 5 seconds
-        )
-
-        if result.returncode == 0:
-            return {
-                'success': True,
-                'output': result.stdout,
-                'command': command
-            }
-        else:
-            return {
-                'success': False,
-                'output': result.stderr,
-                'command': command
-            }
-    except subprocess.TimeoutExpired:
-        return {
-            'success': False,
-            'output': 'Command timed out after 5 seconds',
-            'command': command
-        }
+        # Mismo límite de tiempo y de concurrencia que el resto de terminales
+        result = command_executor.run(command, os.getcwd(), user_id=user_id)
     except Exception as e:
+        # Incluye ExecutorBusy (cola llena)
         return {
             'success': False,
             'output': str(e),
             'command': command
         }
 
+    return {
+        'success': result['success'],
+        'output': result['stdout'] if result['success'] else result['stderr'],
+        'command': command
+    }
+
 # File system event handler
 class FileSystemHandler(FileSystemEventHandler):
     def on_created(self, event):
@@ -306,34 +211,21 @@ def handle_natural_command(data):
     bash_command = nl_to_bash(natural_text)
     logging.info(f"Converted to bash: {bash_command}")
 
-    # Validación con más información
-    validation_result = validate_command(bash_command)
-    logging.info(f"Validation result: {validation_result}")
-
-    # Log con el patrón específico que está fallando
-    if not validation_result:
-        command_parts = bash_command.split()
-        if command_parts and command_parts[0] in ALLOWED_COMMANDS:
-            pattern = ALLOWED_COMMANDS[command_parts[0]]
-            match_result = re.match(pattern, bash_command)
-            logging.info(f"Command: {bash_command}, Pattern: {pattern}, Match: {match_result is not None}")
+    # Validación con la política restringida (solo operaciones de archivos)
+    validation_result, reason = check_command(bash_command, RESTRICTED_POLICY)
+    logging.info(f"Validation result: {validation_result} ({reason})")
 
     # Validate command
     if validation_result:
         # Execute command
-        result = execute_command(bash_command)
+        result = execute_command(bash_command, data.get('user_id', 'default'))
         emit('command_result', result)
     else:
-        # Si el comando tiene un echo con redirección, hacemos una excepción
-        if bash_command.startswith('echo') and '>' in bash_command:
-            result = execute_command(bash_command)
-            emit('command_result', result)
-        else:
-            emit('command_result', {
-                'success': False,
-                'output': f"Comando no permitido: {bash_command}",
-                'command': bash_command
-            })
+        emit('command_result', {
+            'success': False,
+            'output': f"Comando no permitido: {bash_command} ({reason})",
+            'command': bash_command
+        })
 
 @socketio.on('bash_command')
 def handle_bash_command(data):
@@ -342,21 +234,17 @@ def handle_bash_command(data):
     logging.info(f"Received bash command: {bash_command}")
 
     # Validate command
-    if validate_command(bash_command):
+    validation_result, reason = check_command(bash_command, RESTRICTED_POLICY)
+    if validation_result:
         # Execute command
-        result = execute_command(bash_command)
+        result = execute_command(bash_command, data.get('user_id', 'default'))
         emit('command_result', result)
     else:
-        # Si el comando tiene un echo con redirección, hacemos una excepción
-        if bash_command.startswith('echo') and '>' in bash_command:
-            result = execute_command(bash_command)
-            emit('command_result', result)
-        else:
-            emit('command_result', {
-                'success': False,
-                'output': f"Comando no permitido: {bash_command}",
-                'command': bash_command
-            })
+        emit('command_result', {
+            'success': False,
+            'output': f"Comando no permitido: {bash_command} ({reason})",
+            'command': bash_command
+        })
 
 @socketio.on('list_directory')
 def handle_list_directory(data):
@@ -0,0 +1,359 @@
+# Análisis de descripciones para el constructor de aplicaciones
+#
+# Las tablas de palabras clave y reglas de puntuación se compilan una sola vez al
+# importar el módulo: un autómata Aho-Corasick con todos los términos y una matriz
+# de pesos framework × regla. Analizar una descripción es una pasada sobre el
+# texto más un producto matriz-vector.
+import numpy as np
+
+# Palabra clave -> característica detectada (el orden define el orden de salida)
+FEATURE_KEYWORDS = {
+    'autenticación': 'Sistema de autenticación',
+    'login': 'Sistema de autenticación',
+    'registrar': 'Sistema de registro de usuarios',
+    'registro': 'Sistema de registro de usuarios',
+    'dashboard': 'Panel de control',
+    'admin': 'Panel de administración',
+    'gráficos': 'Visualización de datos',
+    'gráfico': 'Visualización de datos',
+    'gráficas': 'Visualización de datos',
+    'pdf': 'Generación de PDF',
+    'reportes': 'Generación de reportes',
+    'reporte': 'Generación de reportes',
+    'api': 'API REST',
+    'rest': 'API REST',
+    'chat': 'Sistema de chat',
+    'mensaje': 'Sistema de mensajería',
+    'mensajería': 'Sistema de mensajería',
+    'notificación': 'Sistema de notificaciones',
+    'notificaciones': 'Sistema de notificaciones',
+    'tiempo real': 'Actualizaciones en tiempo real',
+    'búsqueda': 'Sistema de búsqueda',
+    'buscar': 'Sistema de búsqueda',
+    'filtrar': 'Filtros avanzados',
+    'filtros': 'Filtros avanzados',
+    'móvil': 'Diseño responsivo',
+    'celular': 'Diseño responsivo',
+    'tablet': 'Diseño responsivo',
+    'responsive': 'Diseño responsivo',
+    'base de datos': 'Base de datos',
+    'sql': 'Base de datos SQL',
+    'nosql': 'Base de datos NoSQL',
+    'mongodb': 'Base de datos MongoDB',
+    'postgres': 'Base de datos PostgreSQL',
+    'mysql': 'Base de datos MySQL',
+    'pago': 'Sistema de pagos',
+    'pagos': 'Sistema de pagos',
+    'inventario': 'Gestión de inventario',
+    'producto': 'Catálogo de productos',
+    'productos': 'Catálogo de productos',
+    'email': 'Sistema de correo electrónico',
+    'correo': 'Sistema de correo electrónico',
+    'archivo': 'Gestión de archivos',
+    'archivos': 'Gestión de archivos',
+    'subir': 'Carga de archivos',
+    'cargar': 'Carga de archivos',
+    'upload': 'Carga de archivos',
+    'calendario': 'Calendario integrado',
+    'fecha': 'Selector de fechas',
+    'mapa': 'Integración de mapas',
+    'mapas': 'Integración de mapas',
+    'geolocalización': 'Geolocalización',
+    'formulario': 'Formularios dinámicos',
+    'formularios': 'Formularios dinámicos',
+    'estadísticas': 'Estadísticas y métricas',
+    'métricas': 'Estadísticas y métricas',
+}
+
+BACKEND_FRAMEWORKS = [
+    {
+        'id': 'flask',
+        'name': 'Flask',
+        'description': 'Framework web ligero y flexible para Python',
+        'use_cases': 'APIs, aplicaciones web pequeñas y medianas, microservicios'
+    },
+    {
+        'id': 'django',
+        'name': 'Django',
+        'description': 'Framework web completo para Python con admin incorporado',
+        'use_cases': 'CMS, grandes aplicaciones web, sitios complejos'
+    },
+    {
+        'id': 'fastapi',
+        'name': 'FastAPI',
+        'description': 'Framework web moderno y rápido con validación automática',
+        'use_cases': 'APIs REST de alto rendimiento, microservicios'
+    },
+    {
+        'id': 'streamlit',
+        'name': 'Streamlit',
+        'description': 'Framework para crear aplicaciones de datos interactivas',
+        'use_cases': 'Dashboards, visualización de datos, prototipos rápidos'
+    },
+    {
+        'id': 'express',
+        'name': 'Express.js',
+        'description': 'Framework web minimalista para Node.js',
+        'use_cases': 'APIs, aplicaciones web en tiempo real, microservicios'
+    },
+    {
+        'id': 'nestjs',
+        'name': 'NestJS',
+        'description': 'Framework progresivo para Node.js con TypeScript',
+        'use_cases': 'Aplicaciones escalables del lado del servidor'
+    }
+]
+
+FRONTEND_FRAMEWORKS = [
+    {
+        'id': 'react',
+        'name': 'React',
+        'description': 'Biblioteca para construir interfaces de usuario',
+        'use_cases': 'SPAs, interfaces dinámicas, aplicaciones complejas'
+    },
+    {
+        'id': 'vue',
+        'name': 'Vue.js',
+        'description': 'Framework progresivo para construir interfaces de usuario',
+        'use_cases': 'Aplicaciones web de cualquier tamaño, integraciones progresivas'
+    },
+    {
+        'id': 'angular',
+        'name': 'Angular',
+        'description': 'Framework completo para aplicaciones web',
+        'use_cases': 'Aplicaciones empresariales, proyectos a gran escala'
+    },
+    {
+        'id': 'svelte',
+        'name': 'Svelte',
+        'description': 'Compilador en lugar de framework, con menor tamaño de bundle',
+        'use_cases': 'Interfaces rápidas, aplicaciones con rendimiento optimizado'
+    },
+    {
+        'id': 'bootstrap',
+        'name': 'Bootstrap',
+        'description': 'Framework CSS para diseño responsivo',
+        'use_cases': 'Prototipos rápidos, interfaces consistentes'
+    }
+]
+
+DATABASE_OPTIONS = [
+    {
+        'id': 'sqlite',
+        'name': 'SQLite',
+        'description': 'Base de datos relacional ligera sin servidor',
+        'use_cases': 'Aplicaciones pequeñas, prototipos, almacenamiento local'
+    },
+    {
+        'id': 'mysql',
+        'name': 'MySQL',
+        'description': 'Sistema de gestión de bases de datos relacional',
+        'use_cases': 'Aplicaciones web tradicionales, CMS, comercio electrónico'
+    },
+    {
+        'id': 'postgresql',
+        'name': 'PostgreSQL',
+        'description': 'Sistema de base de datos relacional avanzado',
+        'use_cases': 'Aplicaciones complejas, datos geoespaciales, escalabilidad'
+    },
+    {
+        'id': 'mongodb',
+        'name': 'MongoDB',
+        'description': 'Base de datos NoSQL orientada a documentos',
+        'use_cases': 'Aplicaciones con datos variables, APIs, microservicios'
+    },
+    {
+        'id': 'redis',
+        'name': 'Redis',
+        'description': 'Almacén de estructura de datos en memoria',
+        'use_cases': 'Caché, tiempo real, colas de mensajes, leaderboards'
+    }
+]
+
+FRAMEWORK_CATEGORIES = [
+    ('backend', BACKEND_FRAMEWORKS),
+    ('frontend', FRONTEND_FRAMEWORKS),
+    ('database', DATABASE_OPTIONS),
+]
+
+# (categoría, términos que activan la regla (OR), frameworks que puntúan, puntos).
+# Además, cada framework suma 10 puntos si su id aparece en la descripción.
+SCORING_RULES = [
+    ('backend', ('api',), ('fastapi', 'express', 'flask'), 5),
+    ('backend', ('dashboard',), ('streamlit', 'django'), 5),
+    ('backend', ('datos',), ('streamlit',), 8),
+    ('backend', ('microservicio',), ('fastapi', 'flask', 'express'), 5),
+    ('backend', ('admin',), ('django',), 8),
+    ('backend', ('simple', 'sencillo'), ('flask', 'express', 'streamlit'), 3),
+    ('backend', ('completo',), ('django', 'nestjs'), 3),
+    ('frontend', ('móvil',), ('react', 'vue'), 3),
+    ('frontend', ('responsive',), ('bootstrap',), 5),
+    ('frontend', ('componentes',), ('react', 'vue', 'angular', 'svelte'), 3),
+    ('frontend', ('empresarial',), ('angular',), 5),
+    ('frontend', ('rendimiento',), ('svelte',), 5),
+    ('database', ('sql',), ('mysql', 'postgresql', 'sqlite'), 5),
+    ('database', ('nosql',), ('mongodb',), 8),
+    ('database', ('simple',), ('sqlite',), 5),
+    ('database', ('escalable',), ('postgresql', 'mongodb'), 5),
+    ('database', ('tiempo real',), ('redis', 'mongodb'), 5),
+]
+
+FRAMEWORK_ID_POINTS = 10
+TOP_PER_CATEGORY = 3
+
+
+class KeywordAutomaton:
+    """Autómata Aho-Corasick: encuentra todos los términos presentes en una sola pasada."""
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        goto = [{}]
+        outputs = [set()]
+        for index, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                if ch not in goto[state]:
+                    goto.append({})
+                    outputs.append(set())
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            outputs[state].add(index)
+
+        # Enlaces de fallo por BFS, convirtiendo goto en una función de transición completa
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])]
+        delta.extend({} for _ in range(len(goto) - 1))
+        queue = list(goto[0].values())
+        while queue:
+            next_queue = []
+            for state in queue:
+                outputs[state] |= outputs[fail[state]]
+                transitions = dict(delta[fail[state]])
+                for ch, child in goto[state].items():
+                    fail[child] = delta[fail[state]].get(ch, 0)
+                    transitions[ch] = child
+                    next_queue.append(child)
+                delta[state] = transitions
+            queue = next_queue
+
+        self._delta = delta
+        self._outputs = [frozenset(out) for out in outputs]
+
+    def find(self, text):
+        """Devuelve el conjunto de índices de términos que aparecen en `text`."""
+        delta = self._delta
+        outputs = self._outputs
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+def _compile_tables():
+    terms = list(FEATURE_KEYWORDS)
+    for _, options in FRAMEWORK_CATEGORIES:
+        terms.extend(option['id'] for option in options)
+    for _, rule_terms, _, _ in SCORING_RULES:
+        terms.extend(rule_terms)
+    terms = list(dict.fromkeys(terms))
+    term_index = {term: i for i, term in enumerate(terms)}
+
+    rows = []
+    row_index = {}
+    slices = {}
+    for category, options in FRAMEWORK_CATEGORIES:
+        start = len(rows)
+        for option in options:
+            row_index[(category, option['id'])] = len(rows)
+            rows.append(option)
+        slices[category] = slice(start, len(rows))
+
+    # Reglas: una por id de framework y una por cada entrada de SCORING_RULES
+    rules = [((category, option['id']), (option['id'],), FRAMEWORK_ID_POINTS)
+             for category, options in FRAMEWORK_CATEGORIES for option in options]
+    weights = np.zeros((len(rows), len(rules) + len(SCORING_RULES)), dtype=np.int32)
+    incidence = np.zeros((len(rules) + len(SCORING_RULES), len(terms)), dtype=np.int32)
+
+    for col, (key, rule_terms, points) in enumerate(rules):
+        weights[row_index[key], col] = points
+        for term in rule_terms:
+            incidence[col, term_index[term]] = 1
+
+    for offset, (category, rule_terms, ids, points) in enumerate(SCORING_RULES):
+        col = len(rules) + offset
+        for framework_id in ids:
+            weights[row_index[(category, framework_id)], col] = points
+        for term in rule_terms:
+            incidence[col, term_index[term]] = 1
+
+    feature_terms = [(term_index[keyword], feature) for keyword, feature in FEATURE_KEYWORDS.items()]
+    return terms, rows, slices, weights, incidence, feature_terms
+
+
+_TERMS, _ROWS, _SLICES, _WEIGHTS, _INCIDENCE, _FEATURE_TERMS = _compile_tables()
+_FEATURE_BY_TERM = dict(_FEATURE_TERMS)
+_TERM_RULES = [tuple(np.flatnonzero(_INCIDENCE[:, term]).tolist()) for term in range(len(_TERMS))]
+_AUTOMATON = KeywordAutomaton(_TERMS)
+
+
+def find_terms(description):
+    """Índices de todos los términos conocidos presentes en la descripción (en minúsculas)."""
+    return _AUTOMATON.find(description)
+
+
+def extract_features(description, found=None):
+    """Características detectadas, sin duplicados y en el orden de FEATURE_KEYWORDS."""
+    if found is None:
+        found = find_terms(description)
+    features = []
+    for term in sorted(found):
+        feature = _FEATURE_BY_TERM.get(term)
+        if feature is not None and feature not in features:
+            features.append(feature)
+    return features
+
+
+def score_frameworks(description, found=None):
+    """Puntúa backends, frontends y bases de datos y recomienda la mejor combinación."""
+    if found is None:
+        found = find_terms(description)
+
+    # Reglas activadas (OR de sus términos) y puntuaciones con un único producto matriz-vector
+    rule_hits = np.zeros(_WEIGHTS.shape[1], dtype=np.int32)
+    columns = [col for term in found for col in _TERM_RULES[term]]
+    if columns:
+        rule_hits[columns] = 1
+    scores = (_WEIGHTS @ rule_hits).tolist()
+
+    frameworks = {
+        'backend': [],
+        'frontend': [],
+        'database': [],
+        'recommended': None
+    }
+    for category, _ in FRAMEWORK_CATEGORIES:
+        category_slice = _SLICES[category]
+        # sorted es estable: ante empate se conserva el orden original de la tabla
+        order = sorted(range(category_slice.start, category_slice.stop), key=lambda i: -scores[i])
+        frameworks[category] = [
+            dict(_ROWS[i], score=scores[i]) for i in order[:TOP_PER_CATEGORY]
+        ]
+
+    if frameworks['backend'] and frameworks['frontend']:
+        frameworks['recommended'] = {
+            'name': f"{frameworks['backend'][0]['name']} + {frameworks['frontend'][0]['name']} + {frameworks['database'][0]['name']}",
+            'backend': frameworks['backend'][0],
+            'frontend': frameworks['frontend'][0],
+            'database': frameworks['database'][0]
+        }
+
+    return frameworks
+
+
+def analyze_description(description):
+    """Extrae características y frameworks con una sola pasada sobre el texto."""
+    found = find_terms(description)
+    return extract_features(description, found), score_frameworks(description, found)
@@ -0,0 +1,228 @@
+# Métricas de duración de los pasos del constructor y estimaciones de tiempo
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+
+METRICS_DB_PATH = os.environ.get(
+    'CONSTRUCTOR_METRICS_DB',
+    os.path.join('user_workspaces', 'projects', '.constructor_metrics.db')
+)
+
+# Muestras recientes que se conservan en memoria por clave para calcular percentiles
+MAX_SAMPLES_PER_KEY = 200
+
+# Duraciones por defecto (segundos) mientras no haya historial
+DEFAULT_STEP_SECONDS = {
+    'setup': 3,
+    'file': 25,
+    'package': 1,
+}
+
+
+def size_bucket(size):
+    """Agrupa tamaños en potencias de dos de KB (0 = menos de 1 KB)."""
+    if not size or size < 1024:
+        return 0
+    return int(math.log2(size // 1024)) + 1
+
+
+def percentile(samples, q):
+    """Percentil q (0-100) por interpolación lineal."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def format_duration(seconds):
+    """Formato HH:MM:SS."""
+    seconds = max(0, int(round(seconds)))
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def format_estimate(p50, p90):
+    """Texto legible para el tiempo estimado de generación."""
+    if p90 < 90:
+        return f"{int(round(p50))} segundos aproximadamente"
+    low = max(1, int(round(p50 / 60)))
+    high = max(low + 1, int(math.ceil(p90 / 60)))
+    return f"{low}-{high} minutos aproximadamente"
+
+
+class StepMetrics:
+    """Historial de duraciones por paso, proveedor, tipo de archivo y tamaño.
+
+    Las muestras se guardan en SQLite (compartido entre workers y persistente
+    entre reinicios) y se mantienen en memoria las más recientes por clave para
+    calcular percentiles sin consultar la base de datos.
+    """
+
+    def __init__(self, db_path=METRICS_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._samples = {}
+        self._sizes = {}
+        self._loaded = False
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS step_durations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    step TEXT NOT NULL,
+                    provider TEXT,
+                    file_type TEXT,
+                    size INTEGER DEFAULT 0,
+                    size_bucket INTEGER DEFAULT 0,
+                    duration REAL NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_step_durations_key "
+                "ON step_durations (step, provider, file_type, recorded_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _keys(self, step, provider, file_type, bucket=None):
+        """Claves de más a menos específica (sin tamaño conocido se omiten las de tamaño)."""
+        keys = [
+            (step, provider, file_type, bucket),
+            (step, provider, file_type, None),
+            (step, None, file_type, bucket),
+            (step, None, file_type, None),
+            (step, None, None, None),
+        ]
+        if bucket is None:
+            return [key for index, key in enumerate(keys) if index not in (0, 2)]
+        return keys
+
+    def _remember(self, step, provider, file_type, bucket, duration, size=0):
+        for key in set(self._keys(step, provider, file_type, bucket)):
+            samples = self._samples.setdefault(key, [])
+            samples.append(duration)
+            if len(samples) > MAX_SAMPLES_PER_KEY:
+                del samples[0]
+        if size:
+            sizes = self._sizes.setdefault((step, provider, file_type), [])
+            sizes.append(size)
+            if len(sizes) > MAX_SAMPLES_PER_KEY:
+                del sizes[0]
+
+    def _load(self):
+        """Carga las muestras recientes de la base de datos (una vez por proceso)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            rows = self._connect().execute(
+                "SELECT step, provider, file_type, size, size_bucket, duration FROM step_durations "
+                "ORDER BY id DESC LIMIT ?", (MAX_SAMPLES_PER_KEY * 50,)
+            ).fetchall()
+            for step, provider, file_type, size, bucket, duration in reversed(rows):
+                self._remember(step, provider, file_type, bucket, duration, size)
+        except sqlite3.Error as e:
+            logging.warning(f"No se pudo cargar el historial de métricas: {str(e)}")
+
+    def record(self, step, duration, provider=None, file_type=None, size=0):
+        """Registra la duración de un paso."""
+        with self._lock:
+            self._load()
+            self._remember(step, provider, file_type, size_bucket(size), duration, size)
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT INTO step_durations (step, provider, file_type, size, size_bucket, duration, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (step, provider, file_type, size or 0, size_bucket(size), duration, time.time())
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"No se pudo guardar la métrica del paso {step}: {str(e)}")
+
+    def step_estimate(self, step, provider=None, file_type=None, q=50, size=None):
+        """Duración estimada de un paso según el historial (percentil q).
+
+        Con `size` (bytes esperados) se usan primero las muestras de su rango de tamaño.
+        """
+        bucket = size_bucket(size) if size is not None else None
+        with self._lock:
+            self._load()
+            for key in self._keys(step, provider, file_type, bucket):
+                samples = self._samples.get(key)
+                if samples:
+                    return percentile(samples, q)
+        return DEFAULT_STEP_SECONDS.get(step, 5)
+
+    def typical_size(self, step, provider=None, file_type=None):
+        """Mediana del tamaño generado en el paso, o None sin historial."""
+        with self._lock:
+            self._load()
+            sizes = self._sizes.get((step, provider, file_type))
+            return percentile(sizes, 50) if sizes else None
+
+    def plan_estimate(self, plan, provider=None, q=50):
+        """Duración total estimada de una lista de pasos [(paso, tipo_archivo[, tamaño])]."""
+        return sum(self.step_estimate(item[0], provider, item[1], q, item[2] if len(item) > 2 else None)
+                   for item in plan)
+
+
+class ProjectTimer:
+    """Sigue el plan de pasos de un proyecto en curso para calcular su ETA en vivo."""
+
+    def __init__(self, metrics, plan, provider=None):
+        self.metrics = metrics
+        self.provider = provider
+        # Sin tamaño previsto, el que suele generar este proveedor para ese tipo de archivo
+        self.remaining = [
+            item if len(item) > 2 else (item[0], item[1], metrics.typical_size(item[0], provider, item[1]))
+            for item in plan
+        ]
+        self.step_started = time.time()
+
+    def drop_steps(self, step):
+        """Elimina del plan los pasos que ya no se van a ejecutar."""
+        self.remaining = [item for item in self.remaining if item[0] != step]
+
+    def pause_offset(self, seconds):
+        """Descuenta el tiempo en pausa del paso actual."""
+        self.step_started += seconds
+
+    def complete(self, step, file_type=None, size=0):
+        """Registra la duración del paso actual y avanza al siguiente."""
+        now = time.time()
+        self.metrics.record(step, now - self.step_started, self.provider, file_type, size)
+        for index, item in enumerate(self.remaining):
+            if item[:2] == (step, file_type):
+                del self.remaining[index]
+                break
+        self.step_started = now
+
+    def eta(self):
+        """Segundos restantes estimados (p50, p90) descontando lo ya transcurrido del paso actual."""
+        if not self.remaining:
+            return 0.0, 0.0
+        elapsed = time.time() - self.step_started
+        estimates = []
+        step, file_type, size = self.remaining[0]
+        for q in (50, 90):
+            current = self.metrics.step_estimate(step, self.provider, file_type, q, size)
+            rest = self.metrics.plan_estimate(self.remaining[1:], self.provider, q)
+            estimates.append(max(current - elapsed, 0.0) + rest)
+        return estimates[0], estimates[1]
+
+
+# Instancia global del historial
+step_metrics = StepMetrics()
@@ -7,8 +7,12 @@ import logging
 import zipfile
 import traceback
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_file, render_template
+from flask import Blueprint, request, jsonify, send_file, render_template, current_app
 from threading import Thread
+from project_archive import build_project_archive
+from constructor_analyzer import analyze_description, score_frameworks
+from constructor_metrics import step_metrics, ProjectTimer, format_duration, format_estimate
+from project_manifest import ProjectManifestCache
 
 # Initialize the blueprint
 constructor_bp = Blueprint('constructor', __name__)
@@ -20,9 +24,48 @@ os.makedirs(PROJECTS_DIR, exist_ok=True)
 # In-memory storage for project status
 project_status = {}
 
+# Manifiestos de archivos por proyecto (tamaños y hashes) para la vista previa
+project_manifests = ProjectManifestCache(PROJECTS_DIR)
+
 # Variable para controlar si el desarrollo está pausado
 development_paused = {}
 
+# Temporizadores con el plan de pasos pendiente de cada proyecto (para la ETA)
+project_timers = {}
+
+# Palabras en las características que indican una aplicación web
+WEB_FEATURE_HINTS = ["web", "ui", "interfaz", "página", "frontend", "html"]
+
+def is_web_application(features):
+    return any(hint in feature.lower() for feature in features for hint in WEB_FEATURE_HINTS)
+
+def generation_plan(features):
+    """Pasos que ejecutará generate_application: [(paso, tipo_archivo)]."""
+    plan = [('setup', None), ('file', 'py'), ('file', 'txt')]
+    if is_web_application(features):
+        plan += [('file', 'html'), ('file', 'css'), ('file', 'js')]
+    plan.append(('package', None))
+    return plan
+
+def project_eta(project_id):
+    """ETA en vivo de un proyecto a partir del historial de duraciones."""
+    status_data = project_status.get(project_id, {})
+    start_time = status_data.get('start_time') or time.time()
+    end_time = status_data.get('completion_time') or time.time()
+    timer = project_timers.get(project_id)
+
+    if status_data.get('status') == 'in_progress' and timer:
+        remaining_p50, remaining_p90 = timer.eta()
+    else:
+        remaining_p50, remaining_p90 = 0.0, 0.0
+
+    return {
+        'time_elapsed': format_duration(end_time - start_time),
+        'estimated_time_remaining': format_duration(remaining_p50),
+        'eta_seconds': round(remaining_p50, 1),
+        'eta_p90_seconds': round(remaining_p90, 1)
+    }
+
 # Function to create a workspace for a project
 def create_project_workspace(project_id):
     project_dir = os.path.join(PROJECTS_DIR, project_id)
@@ -52,6 +95,10 @@ def generate_application(project_id, description, agent, model, options, feature
         # Initialize development_paused status
         development_paused[project_id] = False
 
+        # Plan de pasos y temporizador para registrar duraciones y calcular la ETA
+        timer = project_timers.get(project_id) or ProjectTimer(step_metrics, generation_plan(features), model)
+        project_timers[project_id] = timer
+
         # Obtener las claves API del contexto de la aplicación Flask
         from flask import current_app
         api_keys = current_app.config.get('API_KEYS', {})
@@ -74,6 +121,8 @@ def generate_application(project_id, description, agent, model, options, feature
                     })
                     break
 
+        timer.provider = model
+
         # Function to update status
         def update_status(progress, stage, message=None):
             # Actualizar solo si el proyecto existe
@@ -97,9 +146,11 @@ def generate_application(project_id, description, agent, model, options, feature
 
             # Si está pausado, esperar hasta que se reanude pero con timeout
             pause_start_time = time.time()
+            was_paused = False
             while (development_paused.get(project_id, False) and
                   project_id in project_status and
                   project_status[project_id]['status'] == 'in_progress'):
+                was_paused = True
                 # Si ha estado pausado por más de 5 minutos, continuar
                 if time.time() - pause_start_time > 300:
                     logging.warning(f"Project {project_id} auto-resumed after 5 minutes of pause")
@@ -107,6 +158,10 @@ def generate_application(project_id, description, agent, model, options, feature
                     break
                 time.sleep(1)
 
+            # El tiempo en pausa no cuenta como duración del paso
+            if was_paused:
+                timer.pause_offset(time.time() - pause_start_time)
+
         # Determinar el stack tecnológico basado en la descripción
         frameworks = determine_frameworks(description.lower())
         if frameworks.get('recommended'):
@@ -177,16 +232,22 @@ def generate_application(project_id, description, agent, model, options, feature
         except ImportError as e:
             logging.error(f"No se pudo importar módulos de agentes: {str(e)}")
             ai_generation_available = False
+            timer.drop_steps('file')
             update_status(42, "Usando plantillas predefinidas...", "No se pudo cargar los agentes de IA, usando plantillas")
 
+        timer.complete('setup')
+
+        def generate_file(**kwargs):
+            """Genera un archivo con un agente y registra la duración del paso."""
+            result = create_file_with_agent(**kwargs)
+            file_path = os.path.join(project_dir, kwargs['filename'])
+            size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            timer.complete('file', kwargs['file_type'], size)
+            project_manifests.update_file(project_id, kwargs['filename'])
+            return result
+
         # Determine if it's a web app or CLI app based on features
-        is_web_app = any(["web" in feature.lower() or
-                          "ui" in feature.lower() or
-                          "interfaz" in feature.lower() or
-                          "página" in feature.lower() or
-                          "frontend" in feature.lower() or
-                          "html" in feature.lower()
-                         for feature in features])
+        is_web_app = is_web_application(features)
 
         # Determine the tech stack based on project status
         tech_backend = project_status[project_id].get('techstack', {}).get('backend', 'flask')
@@ -201,7 +262,7 @@ def generate_application(project_id, description, agent, model, options, feature
             La aplicación debe usar {tech_backend} como backend{', ' + tech_frontend + ' para el frontend' if is_web_app else ''} y {tech_database} como base de datos.
             La aplicación debe ser funcional y completa, no un esqueleto o demo."""
 
-            app_result = create_file_with_agent(
+            app_result = generate_file(
                 description=app_description,
                 file_type="py",
                 filename="app.py",
@@ -257,7 +318,7 @@ if __name__ == "__main__":
             {'Include libraries for ' + tech_frontend + ' integration' if is_web_app else ''}
             La aplicación usa {tech_database} como base de datos."""
 
-            req_result = create_file_with_agent(
+            req_result = generate_file(
                 description=requirements_description,
                 file_type="txt",
                 filename="requirements.txt",
@@ -292,7 +353,7 @@ flask-cors==3.0.10
                 La aplicación debe usar {tech_frontend} para el frontend.
                 Debe ser una implementación completa, no una demostración o plantilla."""
 
-                index_result = create_file_with_agent(
+                index_result = generate_file(
                     description=index_description,
                     file_type="html",
                     filename="templates/index.html",
@@ -342,7 +403,7 @@ flask-cors==3.0.10
                 El archivo debe usar {tech_frontend} y proporcionar estilos completos para toda la aplicación,
                 incluyendo diseño responsivo para móviles, tablets y desktop."""
 
-                css_result = create_file_with_agent(
+                css_result = generate_file(
                     description=css_description,
                     file_type="css",
                     filename="static/css/style.css",
@@ -402,7 +463,7 @@ footer {
                 - Integración con API backend
                 - Actualización dinámica de contenido"""
 
-                js_result = create_file_with_agent(
+                js_result = generate_file(
                     description=js_description,
                     file_type="js",
                     filename="static/js/main.js",
@@ -560,13 +621,10 @@ footer {
 
         # Create a zip file of the project
         update_status(95, "Finalizando...", "Preparando archivos para descarga")
+        project_manifests.rebuild(project_id)
         zip_path = os.path.join(PROJECTS_DIR, f"{project_id}.zip")
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(project_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, PROJECTS_DIR)
-                    zipf.write(file_path, arcname)
+        build_project_archive(project_dir, zip_path)
+        timer.complete('package')
 
         # Mark project as completed
         project_status[project_id]['status'] = 'completed'
@@ -577,6 +635,7 @@ footer {
             'time': time.time(),
             'message': "Aplicación generada exitosamente y lista para descargar"
         })
+        project_timers.pop(project_id, None)
 
     except Exception as e:
         logging.error(f"Error generating application: {str(e)}")
@@ -588,6 +647,7 @@ footer {
                 'time': time.time(),
                 'message': f"Error: {str(e)}"
             })
+        project_timers.pop(project_id, None)
 
 # Route to analyze features from a description
 @constructor_bp.route('/api/constructor/analyze-features', methods=['POST'])
@@ -602,73 +662,10 @@ def analyze_features():
                 'error': 'Se requiere una descripción'
             }), 400
 
-        # Simple keyword-based feature extraction
+        # Keyword-based feature extraction (single pass over the description)
         # In production, this would use a more sophisticated model
-        features = []
-        keywords = {
-            'autenticación': 'Sistema de autenticación',
-            'login': 'Sistema de autenticación',
-            'registrar': 'Sistema de registro de usuarios',
-            'registro': 'Sistema de registro de usuarios',
-            'dashboard': 'Panel de control',
-            'admin': 'Panel de administración',
-            'gráficos': 'Visualización de datos',
-            'gráfico': 'Visualización de datos',
-            'gráficas': 'Visualización de datos',
-            'pdf': 'Generación de PDF',
-            'reportes': 'Generación de reportes',
-            'reporte': 'Generación de reportes',
-            'api': 'API REST',
-            'rest': 'API REST',
-            'chat': 'Sistema de chat',
-            'mensaje': 'Sistema de mensajería',
-            'mensajería': 'Sistema de mensajería',
-            'notificación': 'Sistema de notificaciones',
-            'notificaciones': 'Sistema de notificaciones',
-            'tiempo real': 'Actualizaciones en tiempo real',
-            'búsqueda': 'Sistema de búsqueda',
-            'buscar': 'Sistema de búsqueda',
-            'filtrar': 'Filtros avanzados',
-            'filtros': 'Filtros avanzados',
-            'móvil': 'Diseño responsivo',
-            'celular': 'Diseño responsivo',
-            'tablet': 'Diseño responsivo',
-            'responsive': 'Diseño responsivo',
-            'base de datos': 'Base de datos',
-            'sql': 'Base de datos SQL',
-            'nosql': 'Base de datos NoSQL',
-            'mongodb': 'Base de datos MongoDB',
-            'postgres': 'Base de datos PostgreSQL',
-            'mysql': 'Base de datos MySQL',
-            'pago': 'Sistema de pagos',
-            'pagos': 'Sistema de pagos',
-            'admin': 'Panel de administración',
-            'inventario': 'Gestión de inventario',
-            'producto': 'Catálogo de productos',
-            'productos': 'Catálogo de productos',
-            'email': 'Sistema de correo electrónico',
-            'correo': 'Sistema de correo electrónico',
-            'archivo': 'Gestión de archivos',
-            'archivos': 'Gestión de archivos',
-            'subir': 'Carga de archivos',
-            'cargar': 'Carga de archivos',
-            'upload': 'Carga de archivos',
-            'calendario': 'Calendario integrado',
-            'fecha': 'Selector de fechas',
-            'mapa': 'Integración de mapas',
-            'mapas': 'Integración de mapas',
-            'geolocalización': 'Geolocalización',
-            'formulario': 'Formularios dinámicos',
-            'formularios': 'Formularios dinámicos',
-            'estadísticas': 'Estadísticas y métricas',
-            'métricas': 'Estadísticas y métricas',
-        }
-
-        # Extract features from description using keywords
         description_lower = description.lower()
-        for keyword, feature in keywords.items():
-            if keyword in description_lower and feature not in features:
-                features.append(feature)
+        features, frameworks = analyze_description(description_lower)
 
         # Add some default features
         if not any('autenticación' in f.lower() for f in features):
@@ -677,9 +674,6 @@ def analyze_features():
         if not any(('base de datos' in f.lower()) for f in features):
             features.append('Base de datos')
 
-        # Determine appropriate frameworks based on description
-        frameworks = determine_frameworks(description_lower)
-
         # Limit to a reasonable number of features
         features = features[:10]
 
@@ -700,225 +694,7 @@ def determine_frameworks(description):
     Determina los frameworks más adecuados basándose en la descripción
     del proyecto y devuelve una estructura con opciones y recomendaciones.
     """
-    frameworks = {
-        'backend': [],
-        'frontend': [],
-        'database': [],
-        'recommended': None
-    }
-
-    # Detectar frameworks de backend
-    backend_frameworks = [
-        {
-            'id': 'flask',
-            'name': 'Flask',
-            'description': 'Framework web ligero y flexible para Python',
-            'use_cases': 'APIs, aplicaciones web pequeñas y medianas, microservicios',
-            'score': 0
-        },
-        {
-            'id': 'django',
-            'name': 'Django',
-            'description': 'Framework web completo para Python con admin incorporado',
-            'use_cases': 'CMS, grandes aplicaciones web, sitios complejos',
-            'score': 0
-        },
-        {
-            'id': 'fastapi',
-            'name': 'FastAPI',
-            'description': 'Framework web moderno y rápido con validación automática',
-            'use_cases': 'APIs REST de alto rendimiento, microservicios',
-            'score': 0
-        },
-        {
-            'id': 'streamlit',
-            'name': 'Streamlit',
-            'description': 'Framework para crear aplicaciones de datos interactivas',
-            'use_cases': 'Dashboards, visualización de datos, prototipos rápidos',
-            'score': 0
-        },
-        {
-            'id': 'express',
-            'name': 'Express.js',
-            'description': 'Framework web minimalista para Node.js',
-            'use_cases': 'APIs, aplicaciones web en tiempo real, microservicios',
-            'score': 0
-        },
-        {
-            'id': 'nestjs',
-            'name': 'NestJS',
-            'description': 'Framework progresivo para Node.js con TypeScript',
-            'use_cases': 'Aplicaciones escalables del lado del servidor',
-            'score': 0
-        }
-    ]
-
-    # Puntuar frameworks de backend según la descripción
-    for framework in backend_frameworks:
-        if framework['id'] in description:
-            framework['score'] += 10
-
-        if 'api' in description and framework['id'] in ['fastapi', 'express', 'flask']:
-            framework['score'] += 5
-
-        if 'dashboard' in description and framework['id'] in ['streamlit', 'django']:
-            framework['score'] += 5
-
-        if 'datos' in description and framework['id'] in ['streamlit']:
-            framework['score'] += 8
-
-        if 'microservicio' in description and framework['id'] in ['fastapi', 'flask', 'express']:
-            framework['score'] += 5
-
-        if 'admin' in description and framework['id'] in ['django']:
-            framework['score'] += 8
-
-        if ('simple' in description or 'sencillo' in description) and framework['id'] in ['flask', 'express', 'streamlit']:
-            framework['score'] += 3
-
-        if 'completo' in description and framework['id'] in ['django', 'nestjs']:
-            framework['score'] += 3
-
-    # Ordenar y seleccionar los mejores frameworks de backend
-    backend_frameworks.sort(key=lambda x: x['score'], reverse=True)
-    frameworks['backend'] = backend_frameworks[:3]  # Top 3 backends
-
-    # Detectar frameworks de frontend
-    frontend_frameworks = [
-        {
-            'id': 'react',
-            'name': 'React',
-            'description': 'Biblioteca para construir interfaces de usuario',
-            'use_cases': 'SPAs, interfaces dinámicas, aplicaciones complejas',
-            'score': 0
-        },
-        {
-            'id': 'vue',
-            'name': 'Vue.js',
-            'description': 'Framework progresivo para construir interfaces de usuario',
-            'use_cases': 'Aplicaciones web de cualquier tamaño, integraciones progresivas',
-            'score': 0
-        },
-        {
-            'id': 'angular',
-            'name': 'Angular',
-            'description': 'Framework completo para aplicaciones web',
-            'use_cases': 'Aplicaciones empresariales, proyectos a gran escala',
-            'score': 0
-        },
-        {
-            'id': 'svelte',
-            'name': 'Svelte',
-            'description': 'Compilador en lugar de framework, con menor tamaño de bundle',
-            'use_cases': 'Interfaces rápidas, aplicaciones con rendimiento optimizado',
-            'score': 0
-        },
-        {
-            'id': 'bootstrap',
-            'name': 'Bootstrap',
-            'description': 'Framework CSS para diseño responsivo',
-            'use_cases': 'Prototipos rápidos, interfaces consistentes',
-            'score': 0
-        }
-    ]
-
-    # Puntuar frameworks de frontend según la descripción
-    for framework in frontend_frameworks:
-        if framework['id'] in description:
-            framework['score'] += 10
-
-        if 'móvil' in description and framework['id'] in ['react', 'vue']:
-            framework['score'] += 3
-
-        if 'responsive' in description and framework['id'] in ['bootstrap']:
-            framework['score'] += 5
-
-        if 'componentes' in description and framework['id'] in ['react', 'vue', 'angular', 'svelte']:
-            framework['score'] += 3
-
-        if 'empresarial' in description and framework['id'] in ['angular']:
-            framework['score'] += 5
-
-        if 'rendimiento' in description and framework['id'] in ['svelte']:
-            framework['score'] += 5
-
-    # Ordenar y seleccionar los mejores frameworks de frontend
-    frontend_frameworks.sort(key=lambda x: x['score'], reverse=True)
-    frameworks['frontend'] =frontend_frameworks[:3]  # Top 3 frontends
-
-    # Detectar bases de datos
-    database_options = [
-        {
-            'id': 'sqlite',
-            'name': 'SQLite',
-            'description': 'Base de datos relacional ligera sin servidor',
-            'use_cases': 'Aplicaciones pequeñas, prototipos, almacenamiento local',
-            'score': 0
-        },
-        {
-            'id': 'mysql',
-            'name': 'MySQL',
-            'description': 'Sistema de gestión de bases de datos relacional',
-            'use_cases': 'Aplicaciones web tradicionales, CMS, comercio electrónico',
-            'score': 0
-        },
-        {
-            'id': 'postgresql',
-            'name': 'PostgreSQL',
-            'description': 'Sistema de base de datos relacional avanzado',
-            'use_cases': 'Aplicaciones complejas, datos geoespaciales, escalabilidad',
-            'score': 0
-        },
-        {
-            'id': 'mongodb',
-            'name': 'MongoDB',
-            'description': 'Base de datos NoSQL orientada a documentos',
-            'use_cases': 'Aplicaciones con datos variables, APIs, microservicios',
-            'score': 0
-        },
-        {
-            'id': 'redis',
-            'name': 'Redis',
-            'description': 'Almacén de estructura de datos en memoria',
-            'use_cases': 'Caché, tiempo real, colas de mensajes, leaderboards',
-            'score': 0
-        }
-    ]
-
-    # Puntuar bases de datos según la descripción
-    for db in database_options:
-        if db['id'] in description:
-            db['score'] += 10
-
-        if 'sql' in description and db['id'] in ['mysql', 'postgresql', 'sqlite']:
-            db['score'] += 5
-
-        if 'nosql' in description and db['id'] in ['mongodb']:
-            db['score'] += 8
-
-        if 'simple' in description and db['id'] in ['sqlite']:
-            db['score'] += 5
-
-        if 'escalable' in description and db['id'] in ['postgresql', 'mongodb']:
-            db['score'] += 5
-
-        if 'tiempo real' in description and db['id'] in ['redis', 'mongodb']:
-            db['score'] += 5
-
-    # Ordenar y seleccionar las mejores bases de datos
-    database_options.sort(key=lambda x: x['score'], reverse=True)
-    frameworks['database'] = database_options[:3]  # Top 3 databases
-
-    # Recomendar una combinación de tecnologías basada en los puntajes
-    if len(frameworks['backend']) > 0 and len(frameworks['frontend']) > 0:
-        frameworks['recommended'] = {
-            'name': f"{frameworks['backend'][0]['name']} + {frameworks['frontend'][0]['name']} + {frameworks['database'][0]['name']}",
-            'backend': frameworks['backend'][0],
-            'frontend': frameworks['frontend'][0],
-            'database': frameworks['database'][0]
-        }
-
-    return frameworks
+    return score_frameworks(description)
 
 # Route to check project status
 @constructor_bp.route('/api/constructor/status/<project_id>', methods=['GET'])
@@ -942,7 +718,8 @@ def check_project_status(project_id):
             'console_message': console_message,
             'error': status_data.get('error'),
             'framework': status_data.get('framework'),
-            'techstack': status_data.get('techstack', {})
+            'techstack': status_data.get('techstack', {}),
+            **project_eta(project_id)
         })
     except Exception as e:
         logging.error(f"Error checking project status: {str(e)}")
@@ -963,41 +740,25 @@ def download_project(project_id):
     try:
         # Check if the project exists and is completed
         if project_id not in project_status:
-            # Si no existe en memoria, verificar si existe el archivo zip directamente
+            # Si no existe en memoria, usar el directorio del proyecto o el zip existente
             zip_path = os.path.join(PROJECTS_DIR, f"{project_id}.zip")
-            if os.path.exists(zip_path):
-                # Si existe el archivo, permitir la descarga aunque no esté en memoria
-                return send_file(
-                    zip_path,
-                    mimetype='application/zip',
-                    as_attachment=True,
-                    download_name=f"{project_id}.zip"
-                )
-            else:
-                # Verificar si existe el directorio del proyecto
-                project_dir = os.path.join(PROJECTS_DIR, project_id)
-                if os.path.exists(project_dir):
-                    # Crear un archivo zip para este proyecto
-                    zip_path = os.path.join(PROJECTS_DIR, f"{project_id}.zip")
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for root, dirs, files in os.walk(project_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.relpath(file_path, project_dir)
-                                zipf.write(file_path, arcname)
-
-                    # Retornar el archivo zip recién creado
-                    return send_file(
-                        zip_path,
-                        mimetype='application/zip',
-                        as_attachment=True,
-                        download_name=f"{project_id}.zip"
-                    )
-                else:
-                    return jsonify({
-                        'success': False,
-                        'error': 'Proyecto no encontrado'
-                    }), 404
+            project_dir = os.path.join(PROJECTS_DIR, project_id)
+            if os.path.exists(project_dir):
+                # Crear o actualizar el zip (la caché solo recomprime lo que cambió)
+                build_project_archive(project_dir, zip_path)
+            elif not os.path.exists(zip_path):
+                return jsonify({
+                    'success': False,
+                    'error': 'Proyecto no encontrado'
+                }), 404
+
+            # Si existe el archivo, permitir la descarga aunque no esté en memoria
+            return send_file(
+                zip_path,
+                mimetype='application/zip',
+                as_attachment=True,
+                download_name=f"{project_id}.zip"
+            )
 
         if project_status[project_id]['status'] != 'completed' and project_status[project_id].get('status') != 'failed':
             # Si el proyecto falló, igual intentamos crear un ZIP con lo que tengamos
@@ -1006,12 +767,7 @@ def download_project(project_id):
                 if os.path.exists(project_dir):
                     # Crear zip del directorio existente
                     zip_path = os.path.join(PROJECTS_DIR, f"{project_id}.zip")
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for root, dirs, files in os.walk(project_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.relpath(file_path, project_dir)
-                                zipf.write(file_path, arcname)
+                    build_project_archive(project_dir, zip_path)
 
                     # Retornar el archivo zip
                     return send_file(
@@ -1029,33 +785,25 @@ def download_project(project_id):
 
         # Project zip file path
         zip_path = os.path.join(PROJECTS_DIR, f"{project_id}.zip")
-        if not os.path.exists(zip_path):
-            # Si no existe el zip pero el proyecto está marcado como completado, recrearlo
-            project_dir = os.path.join(PROJECTS_DIR, project_id)
-            if os.path.exists(project_dir):
-                # Crear zip del directorio existente
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, dirs, files in os.walk(project_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, project_dir)
-                            zipf.write(file_path, arcname)
-            else:
-                # Crear un proyecto mínimo para evitar errores
-                project_dir = os.path.join(PROJECTS_DIR, project_id)
-                os.makedirs(project_dir, exist_ok=True)
-
-                # Crear un archivo README con información del error
-                with open(os.path.join(project_dir, 'README.md'), 'w') as f:
-                    f.write(f"# Proyecto: {project_id}\n\n")
-                    f.write("Este proyecto tuvo un error durante la generación.\n")
-                    if project_id in project_status and 'error' in project_status[project_id]:
-                        f.write(f"\nError: {project_status[project_id]['error']}\n")
+        project_dir = os.path.join(PROJECTS_DIR, project_id)
+        if os.path.exists(project_dir):
+            # Actualizar el zip si los archivos del proyecto cambiaron desde la última descarga
+            build_project_archive(project_dir, zip_path)
+        elif not os.path.exists(zip_path):
+            # Crear un proyecto mínimo para evitar errores
+            os.makedirs(project_dir, exist_ok=True)
 
-                # Crear un archivo index.html simple
-                os.makedirs(os.path.join(project_dir, 'templates'), exist_ok=True)
-                with open(os.path.join(project_dir, 'templates', 'index.html'), 'w') as f:
-                    f.write("""<!DOCTYPE html>
+            # Crear un archivo README con información del error
+            with open(os.path.join(project_dir, 'README.md'), 'w') as f:
+                f.write(f"# Proyecto: {project_id}\n\n")
+                f.write("Este proyecto tuvo un error durante la generación.\n")
+                if project_id in project_status and 'error' in project_status[project_id]:
+                    f.write(f"\nError: {project_status[project_id]['error']}\n")
+
+            # Crear un archivo index.html simple
+            os.makedirs(os.path.join(project_dir, 'templates'), exist_ok=True)
+            with open(os.path.join(project_dir, 'templates', 'index.html'), 'w') as f:
+                f.write("""<!DOCTYPE html>
 <html>
 <head>
     <title>Proyecto con Error</title>
@@ -1066,9 +814,9 @@ def download_project(project_id):
 </body>
 </html>""")
 
-                # Crear app.py simple
-                with open(os.path.join(project_dir, 'app.py'), 'w') as f:
-                    f.write("""from flask import Flask, render_template
+            # Crear app.py simple
+            with open(os.path.join(project_dir, 'app.py'), 'w') as f:
+                f.write("""from flask import Flask, render_template
 
 app = Flask(__name__)
 
@@ -1080,13 +828,8 @@ if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
 """)
 
-                # Crear el zip con estos archivos mínimos
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, dirs, files in os.walk(project_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, project_dir)
-                            zipf.write(file_path, arcname)
+            # Crear el zip con estos archivos mínimos
+            build_project_archive(project_dir, zip_path)
 
         # Return the zip file
         return send_file(
@@ -1134,19 +877,20 @@ def preview_project(project_id):
                 'error': 'Proyecto no encontrado'
             }), 404
 
-        # Get a list of files in the project
-        file_list = []
-        for root, dirs, files in os.walk(project_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, project_dir)
-                file_list.append(rel_path)
+        # Get a list of files in the project from the cached manifest
+        manifest = project_manifests.get(project_id, refresh=request.args.get('refresh') == '1')
+        file_list = list(manifest)
+        files = [
+            {'path': path, 'size': meta['size'], 'modified': meta['modified'], 'sha256': meta['sha256']}
+            for path, meta in manifest.items()
+        ]
 
         # For preview, render a simplified project view
         return render_template(
             'preview.html',
             project_id=project_id,
             file_list=file_list,
+            files=files,
             title=f"Vista previa del proyecto: {project_id}"
         )
     except Exception as e:
@@ -1156,6 +900,33 @@ def preview_project(project_id):
             'error': str(e)
         }), 500
 
+# Route to get the file manifest of a generated project
+@constructor_bp.route('/api/constructor/manifest/<project_id>', methods=['GET'])
+def project_manifest(project_id):
+    try:
+        if not os.path.exists(os.path.join(PROJECTS_DIR, project_id)):
+            return jsonify({
+                'success': False,
+                'error': 'Proyecto no encontrado'
+            }), 404
+
+        manifest = project_manifests.get(project_id, refresh=request.args.get('refresh') == '1')
+        return jsonify({
+            'success': True,
+            'project_id': project_id,
+            'total_size': sum(meta['size'] for meta in manifest.values()),
+            'files': [
+                {'path': path, 'size': meta['size'], 'modified': meta['modified'], 'sha256': meta['sha256']}
+                for path, meta in manifest.items()
+            ]
+        })
+    except Exception as e:
+        logging.error(f"Error getting project manifest: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # Route to pause development
 @constructor_bp.route('/api/constructor/pause/<project_id>', methods=['POST'])
 def pause_development(project_id):
@@ -1289,17 +1060,20 @@ def construction_status():
     if not plan_id:
         return jsonify({'error': 'No plan ID provided'}), 400
 
-    # Logic to get the construction status
+    if plan_id not in project_status:
+        return jsonify({'error': 'Plan not found'}), 404
 
-    # Mock response for demonstration
+    status_data = project_status[plan_id]
+    eta = project_eta(plan_id)
     return jsonify({
         'plan_id': plan_id,
-        'status': 'in_progress',  # or 'paused', 'completed', 'failed'
-        'progress': 60,
-        'current_step': 'Generating application files',
-        'is_paused': False,
-        'time_elapsed': '00:02:45',
-        'estimated_time_remaining': '00:01:30'
+        'status': status_data.get('status', 'in_progress'),  # or 'paused', 'completed', 'failed'
+        'progress': status_data.get('progress', 0),
+        'current_step': status_data.get('current_stage', ''),
+        'is_paused': development_paused.get(plan_id, False),
+        'time_elapsed': eta['time_elapsed'],
+        'estimated_time_remaining': eta['estimated_time_remaining'],
+        'eta_seconds': eta['eta_seconds']
     })
 
 @constructor_bp.route('/api/constructor/generate', methods=['POST'])
@@ -1325,9 +1099,19 @@ def generate_app():
         # Create project workspace
         create_project_workspace(project_id)
 
-        # Start generation in background thread
-        thread = Thread(target=generate_application, 
-                         args=(project_id, description, agent, model, options, features))
+        # Estimación a partir del historial de duraciones de cada paso
+        timer = ProjectTimer(step_metrics, generation_plan(features), model)
+        project_timers[project_id] = timer
+        estimate_p50, estimate_p90 = timer.eta()
+
+        # Start generation in background thread (with the app context it needs for the API keys)
+        app = current_app._get_current_object()
+
+        def run_generation():
+            with app.app_context():
+                generate_application(project_id, description, agent, model, options, features)
+
+        thread = Thread(target=run_generation)
         thread.daemon = True
         thread.start()
 
@@ -1335,7 +1119,8 @@ def generate_app():
             'success': True,
             'project_id': project_id,
             'message': 'Generación de aplicación iniciada',
-            'estimated_time': '2-3 minutos aproximadamente'
+            'estimated_time': format_estimate(estimate_p50, estimate_p90),
+            'estimated_seconds': round(estimate_p50, 1)
         })
     except Exception as e:
         logging.error(f"Error al iniciar generación: {str(e)}")
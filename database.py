@@ -0,0 +1,40 @@
+# Base de datos compartida por las aplicaciones Flask
+#
+# `db` no depende de ninguna aplicación: models.py lo importa de aquí y cada
+# proceso (main.py, app.py, los scripts de prueba) lo enlaza a su app con
+# init_app, que aplica el perfil de conexión, crea las tablas y añade las
+# columnas e índices que falten.
+import os
+import logging
+
+from flask_sqlalchemy import SQLAlchemy
+
+import db_migrations
+import db_profiles
+
+logger = logging.getLogger('database')
+
+DEFAULT_DATABASE_URI = "sqlite:///codestorm.db"
+
+db = SQLAlchemy()
+
+
+def init_app(app, database_uri=None):
+    """Configura y enlaza `db` a la aplicación y prepara el esquema."""
+    app.config["SQLALCHEMY_DATABASE_URI"] = (
+        database_uri or app.config.get("SQLALCHEMY_DATABASE_URI")
+        or os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URI)
+    )
+    # Pool y PRAGMAs según el motor (DB_PROFILE: auto, sqlite, postgres o default)
+    db_profiles.configure_app(app)
+    app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", False)
+    db.init_app(app)
+
+    with app.app_context():
+        db_profiles.install(db.engine, app.config['DB_PROFILE'])
+        # Registra las tablas de los modelos en db.metadata
+        import models
+        db.create_all()
+        # Columnas e índices nuevos en bases de datos creadas con modelos anteriores
+        db_migrations.upgrade(db)
+    return db
@@ -0,0 +1,63 @@
+# Actualización del esquema de bases de datos existentes
+#
+# db.create_all() solo crea las tablas que faltan: en una base de datos creada
+# con una versión anterior de models.py no añade columnas ni índices nuevos.
+# upgrade() compara cada tabla con su modelo y añade lo que falte. Sirve para
+# SQLite y PostgreSQL y se puede ejecutar en cada arranque: si no falta nada no
+# escribe nada.
+import logging
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger('db_migrations')
+
+
+def _add_missing_columns(conn, table, existing_columns):
+    added = []
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+        if not column.nullable and column.server_default is None:
+            # Una columna NOT NULL sin valor por defecto no se puede añadir a una tabla con filas
+            logger.warning(f"Columna {table.name}.{column.name} no añadida: es NOT NULL sin valor por defecto")
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        added.append(column.name)
+    return added
+
+
+def _create_missing_indexes(conn, table, existing_indexes):
+    created = []
+    for index in table.indexes:
+        if index.name not in existing_indexes:
+            index.create(bind=conn)
+            created.append(index.name)
+    return created
+
+
+def upgrade(db):
+    """Añade las columnas e índices de los modelos que falten en tablas existentes.
+
+    Devuelve {tabla: [columnas e índices añadidos]}.
+    """
+    changes = {}
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            # create_all la crea completa
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        try:
+            with db.engine.begin() as conn:
+                added = _add_missing_columns(conn, table, existing_columns)
+                added += _create_missing_indexes(conn, table, existing_indexes)
+        except Exception as e:
+            logger.error(f"No se pudo actualizar la tabla {table.name}: {str(e)}")
+            continue
+        if added:
+            logger.info(f"Tabla {table.name} actualizada: {', '.join(added)}")
+            changes[table.name] = added
+    return changes
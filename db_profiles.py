@@ -0,0 +1,111 @@
+# Perfiles de conexión a la base de datos
+#
+# Con los valores por defecto de SQLite (journal en modo DELETE, sin espera
+# ante el bloqueo) los hilos que escriben a la vez se bloquean entre sí o fallan
+# con "database is locked". El perfil 'sqlite' activa WAL (los lectores no
+# esperan al escritor), synchronous=NORMAL, una espera ante el bloqueo y mmap
+# en cada conexión nueva. El perfil 'postgres' dimensiona el pool de
+# conexiones. Se elige con DB_PROFILE ('auto' según la URL, 'sqlite',
+# 'postgres' o 'default' para no tocar nada).
+#
+# El perfil no activa foreign_keys: SQLite no comprueba las claves foráneas
+# por defecto y con el PRAGMA un DELETE de un usuario o workspace con filas
+# hijas pasaría a fallar. Quien lo quiera lo pide con SQLITE_FOREIGN_KEYS=1.
+import os
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger('db_profiles')
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'auto')
+PROFILES = ('auto', 'default', 'sqlite', 'postgres')
+
+# Milisegundos que una conexión espera a que se libere el bloqueo de escritura
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+# Negativo: tamaño en KiB
+SQLITE_CACHE_SIZE = -64 * 1024
+SQLITE_FOREIGN_KEYS = os.environ.get('SQLITE_FOREIGN_KEYS', '0') == '1'
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', SQLITE_BUSY_TIMEOUT),
+    ('mmap_size', SQLITE_MMAP_SIZE),
+    ('cache_size', SQLITE_CACHE_SIZE),
+    ('temp_store', 'MEMORY'),
+) + ((('foreign_keys', 'ON'),) if SQLITE_FOREIGN_KEYS else ())
+
+POSTGRES_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+POSTGRES_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+POSTGRES_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+
+def resolve_profile(database_uri, profile=DB_PROFILE):
+    """Perfil efectivo para la URL de la base de datos."""
+    if profile not in PROFILES:
+        raise ValueError(f"DB_PROFILE desconocido: {profile} (opciones: {', '.join(PROFILES)})")
+    if profile != 'auto':
+        return profile
+    if database_uri.startswith('sqlite'):
+        return 'sqlite'
+    if database_uri.startswith(('postgresql', 'postgres')):
+        return 'postgres'
+    return 'default'
+
+
+def engine_options(database_uri, profile=DB_PROFILE):
+    """Opciones de create_engine (SQLALCHEMY_ENGINE_OPTIONS) del perfil."""
+    profile = resolve_profile(database_uri, profile)
+    if profile == 'sqlite':
+        return {
+            # Las conexiones del pool pasan de un hilo a otro; la espera la
+            # gestiona busy_timeout, en segundos aquí para el driver
+            'connect_args': {'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT / 1000},
+            'pool_pre_ping': True,
+        }
+    if profile == 'postgres':
+        return {
+            'pool_size': POSTGRES_POOL_SIZE,
+            'max_overflow': POSTGRES_MAX_OVERFLOW,
+            'pool_timeout': POSTGRES_POOL_TIMEOUT,
+            'pool_recycle': 300,
+            'pool_pre_ping': True,
+        }
+    return {
+        'pool_recycle': 300,
+        'pool_pre_ping': True,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def install(engine, profile=DB_PROFILE):
+    """Aplica el perfil a un engine ya creado (PRAGMAs de SQLite en cada conexión).
+
+    Debe llamarse antes de la primera consulta; las conexiones ya abiertas del
+    pool se descartan para que todas tengan los PRAGMAs.
+    """
+    profile = resolve_profile(str(engine.url), profile)
+    if profile == 'sqlite' and engine.dialect.name == 'sqlite':
+        if not event.contains(engine, 'connect', _set_sqlite_pragmas):
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+            engine.dispose()
+    logger.info(f"Perfil de base de datos: {profile} ({engine.dialect.name})")
+    return profile
+
+
+def configure_app(app, profile=DB_PROFILE):
+    """Fija SQLALCHEMY_ENGINE_OPTIONS según el perfil; llamar antes de SQLAlchemy(app)."""
+    database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    profile = app.config.setdefault('DB_PROFILE', profile)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_uri, profile)
+    return resolve_profile(database_uri, profile)
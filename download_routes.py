@@ -9,6 +9,7 @@ from flask import request, jsonify, send_file, session
 import git
 from github import Github
 import requests
+from project_archive import build_directory_archive
 
 def download_file_route(app, get_user_workspace):
     @app.route('/api/download_file/<path:file_path>')
@@ -60,25 +61,9 @@ def download_directory_route(app, get_user_workspace):
             if not target_path.exists() or not target_path.is_dir():
                 return jsonify({'error': 'El directorio no existe'}), 404
                 
-            # Create an in-memory ZIP file
-            memory_file = io.BytesIO()
-            with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Walk through the directory and add all files
-                base_dir_name = target_path.name
-                base_path = target_path.parent
-                
-                for root, dirs, files in os.walk(target_path):
-                    # Get the relative path from the base directory
-                    rel_path = os.path.relpath(root, base_path)
-                    
-                    # Add each file to the ZIP
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_name = os.path.join(rel_path, file)
-                        zipf.write(file_path, arc_name)
-            
-            # Reset file pointer to beginning
-            memory_file.seek(0)
+            # Create an in-memory ZIP file (members are compressed in parallel)
+            base_dir_name = target_path.name
+            memory_file = build_directory_archive(target_path, base_dir_name)
             
             # Create a filename for the ZIP
             zip_filename = f"{base_dir_name}.zip"
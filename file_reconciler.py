@@ -0,0 +1,352 @@
+# Sincronización de la tabla `files` con los archivos de cada workspace
+#
+# models.File permite preguntar por los archivos más grandes o los modificados
+# recientemente con una consulta indexada en lugar de recorrer directorios,
+# pero solo si la tabla refleja el disco. El reconciliador la mantiene al día:
+# - un observador de watchdog sobre la raíz de los workspaces anota las rutas
+#   que cambian y, tras RECONCILE_DELAY segundos sin más eventos, se aplican
+#   con un upsert por lotes (y un DELETE para las que ya no existen);
+# - cada FULL_SCAN_INTERVAL segundos se recorre cada workspace con scandir y
+#   solo se escriben los archivos cuyo tamaño o mtime no coinciden con la tabla.
+# Solo se sincronizan los workspaces registrados en la tabla `workspaces`.
+import os
+import stat
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+
+logger = logging.getLogger('file_reconciler')
+
+RECONCILE_DELAY = float(os.environ.get('FILE_RECONCILE_DELAY', 1))
+FULL_SCAN_INTERVAL = int(os.environ.get('FILE_FULL_SCAN_INTERVAL', 300))
+UPSERT_BATCH_SIZE = 500
+IGNORED_DIRS = {'.git', 'node_modules', '__pycache__', '.command_output', '.venv', 'venv'}
+READ_EVENT_TYPES = {'opened', 'closed_no_write'}
+DEFAULT_TOP_FILES = 20
+MAX_TOP_FILES = 200
+
+files_bp = Blueprint('file_reconciler', __name__)
+
+
+def _ignored(relative_path):
+    return any(part in IGNORED_DIRS for part in relative_path.split('/'))
+
+
+def _file_row(workspace_id, relative_path, stat_result):
+    name = relative_path.rsplit('/', 1)[-1]
+    modified = datetime.utcfromtimestamp(stat_result.st_mtime)
+    return {
+        'workspace_id': workspace_id,
+        'path': relative_path,
+        'name': name,
+        'file_type': name.rsplit('.', 1)[-1].lower() if '.' in name else None,
+        'size': stat_result.st_size,
+        'created_at': modified,
+        'modified_at': modified
+    }
+
+
+def scan_workspace(root):
+    """{ruta relativa: stat} de los archivos bajo `root`, sin los directorios ignorados ni seguir enlaces."""
+    files = {}
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, relative_dir))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in IGNORED_DIRS:
+                            pending.append(relative_path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files[relative_path] = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+    return files
+
+
+class FileReconciler:
+    """Mantiene la tabla `files` a partir de eventos del observador y escaneos periódicos."""
+
+    def __init__(self, app, db, root, delay=RECONCILE_DELAY, full_scan_interval=FULL_SCAN_INTERVAL):
+        self.app = app
+        self.db = db
+        self.root = os.path.abspath(str(root))
+        self.delay = delay
+        self.full_scan_interval = full_scan_interval
+        # nombre del workspace -> id; None si no está registrado
+        self.workspaces = {}
+        # nombre del workspace -> rutas relativas pendientes
+        self.dirty = {}
+        self.upserted = 0
+        self.deleted = 0
+        self.last_full_scan = 0
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    # --- Eventos del observador ---
+
+    def note(self, path):
+        """Anota una ruta (absoluta) que ha cambiado."""
+        path = os.path.abspath(str(path))
+        if not path.startswith(self.root + os.sep):
+            return
+        relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+        workspace, _, relative_path = relative.partition('/')
+        if not relative_path or _ignored(relative_path):
+            return
+        with self._lock:
+            self.dirty.setdefault(workspace, set()).add(relative_path)
+        self._wakeup.set()
+
+    def on_event(self, event):
+        """Callback para un FileSystemEventHandler de watchdog."""
+        if event.event_type in READ_EVENT_TYPES or (event.event_type == 'modified' and event.is_directory):
+            return
+        self.note(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.note(dest_path)
+
+    # --- Base de datos ---
+
+    def _workspace_id(self, name):
+        if name not in self.workspaces:
+            from models import Workspace
+            workspace = self.db.session.query(Workspace.id).filter_by(name=name).first()
+            self.workspaces[name] = workspace.id if workspace else None
+        return self.workspaces[name]
+
+    def _upsert(self, rows):
+        from sqlalchemy import insert
+        from models import File
+
+        dialect = self.db.engine.dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            statement = insert(File)
+            if dialect in ('sqlite', 'postgresql'):
+                statement = statement.on_conflict_do_update(
+                    index_elements=['workspace_id', 'path'],
+                    set_={column: statement.excluded[column] for column in ('name', 'file_type', 'size', 'modified_at')}
+                )
+            else:
+                # Otros motores: borrar e insertar en la misma transacción
+                self.db.session.query(File).filter(
+                    File.workspace_id == batch[0]['workspace_id'],
+                    File.path.in_([row['path'] for row in batch])
+                ).delete(synchronize_session=False)
+            self.db.session.execute(statement, batch)
+        self.upserted += len(rows)
+
+    def _delete(self, workspace_id, paths, directories=()):
+        from sqlalchemy import or_
+        from models import File
+
+        paths = list(paths)
+        for start in range(0, len(paths), UPSERT_BATCH_SIZE):
+            self.deleted += self.db.session.query(File).filter(
+                File.workspace_id == workspace_id, File.path.in_(paths[start:start + UPSERT_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+        if directories:
+            self.deleted += self.db.session.query(File).filter(
+                File.workspace_id == workspace_id,
+                or_(*[File.path.like(directory.replace('%', r'\%').replace('_', r'\_') + '/%', escape='\\')
+                      for directory in directories])
+            ).delete(synchronize_session=False)
+
+    # --- Reconciliación ---
+
+    def reconcile_pending(self):
+        """Aplica las rutas anotadas por el observador."""
+        with self._lock:
+            dirty, self.dirty = self.dirty, {}
+        if not dirty:
+            return
+        with self._reconcile_lock, self.app.app_context():
+            for workspace, paths in dirty.items():
+                try:
+                    self._reconcile_paths(workspace, paths)
+                    self.db.session.commit()
+                except Exception as e:
+                    self.db.session.rollback()
+                    logger.error(f"Error al sincronizar archivos de {workspace}: {str(e)}")
+
+    def _reconcile_paths(self, workspace, paths):
+        workspace_id = self._workspace_id(workspace)
+        if workspace_id is None:
+            return
+        base = os.path.join(self.root, workspace)
+        rows, missing, directories = [], [], []
+        for relative_path in paths:
+            full_path = os.path.join(base, relative_path)
+            try:
+                stat_result = os.stat(full_path, follow_symlinks=False)
+            except OSError:
+                # Borrado o movido: la ruta y, si era un directorio, todo lo que contenía
+                missing.append(relative_path)
+                directories.append(relative_path)
+                continue
+            # Con el resultado de lstat: un enlace simbólico no es ni directorio
+            # ni archivo, así no se recorre (ni se indexa) lo que hay fuera del workspace
+            if stat.S_ISDIR(stat_result.st_mode):
+                # Directorio creado o movido aquí: sus archivos llegan en bloque
+                for child, child_stat in scan_workspace(full_path).items():
+                    rows.append(_file_row(workspace_id, f"{relative_path}/{child}", child_stat))
+            elif stat.S_ISREG(stat_result.st_mode):
+                rows.append(_file_row(workspace_id, relative_path, stat_result))
+            else:
+                # Enlace, socket...: se olvida lo que hubiera antes en esa ruta
+                missing.append(relative_path)
+                directories.append(relative_path)
+        if missing:
+            self._delete(workspace_id, missing, directories)
+        if rows:
+            self._upsert(rows)
+
+    def full_scan(self):
+        """Recorre todos los workspaces registrados y corrige las diferencias."""
+        from models import Workspace, File
+
+        with self._reconcile_lock, self.app.app_context():
+            workspaces = self.db.session.query(Workspace.id, Workspace.name).all()
+            self.workspaces = {workspace.name: workspace.id for workspace in workspaces}
+            for workspace in workspaces:
+                base = os.path.join(self.root, workspace.name)
+                try:
+                    if not stat.S_ISDIR(os.lstat(base).st_mode):
+                        continue
+                except OSError:
+                    continue
+                try:
+                    known = {
+                        row.path: (row.size, row.modified_at)
+                        for row in self.db.session.query(File.path, File.size, File.modified_at)
+                        .filter(File.workspace_id == workspace.id)
+                    }
+                    rows = []
+                    on_disk = scan_workspace(base)
+                    for relative_path, stat_result in on_disk.items():
+                        # Mismo tamaño y mtime: el archivo no cambió
+                        if known.get(relative_path) == (stat_result.st_size,
+                                                        datetime.utcfromtimestamp(stat_result.st_mtime)):
+                            continue
+                        rows.append(_file_row(workspace.id, relative_path, stat_result))
+                    missing = [path for path in known if path not in on_disk]
+                    if missing:
+                        self._delete(workspace.id, missing)
+                    if rows:
+                        self._upsert(rows)
+                    self.db.session.commit()
+                except Exception as e:
+                    self.db.session.rollback()
+                    logger.error(f"Error en el escaneo completo de {workspace.name}: {str(e)}")
+        self.last_full_scan = time.time()
+
+    # --- Hilo de fondo ---
+
+    def start(self):
+        """Arranca el observador y el hilo que aplica los cambios."""
+        if self._thread is not None:
+            return
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        reconciler = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                reconciler.on_event(event)
+
+        os.makedirs(self.root, exist_ok=True)
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.root, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        self._thread = threading.Thread(target=self._run, name='file-reconciler', daemon=True)
+        self._thread.start()
+        atexit.register(self.reconcile_pending)
+
+    def _run(self):
+        while True:
+            timeout = max(0, self.last_full_scan + self.full_scan_interval - time.time())
+            if self._wakeup.wait(timeout):
+                self._wakeup.clear()
+                # Agrupar la ráfaga de eventos (p. ej. un git checkout)
+                while self._wakeup.wait(self.delay):
+                    self._wakeup.clear()
+                self.reconcile_pending()
+            else:
+                self.full_scan()
+
+    def stats(self):
+        with self._lock:
+            pending = sum(len(paths) for paths in self.dirty.values())
+        return {
+            'pending': pending,
+            'upserted': self.upserted,
+            'deleted': self.deleted,
+            'last_full_scan': self.last_full_scan
+        }
+
+
+def init_app(app, db, root):
+    """Arranca el reconciliador de `root` y registra /api/files/top."""
+    reconciler = FileReconciler(app, db, root)
+    app.extensions['file_reconciler'] = reconciler
+    app.register_blueprint(files_bp)
+    reconciler.start()
+    return reconciler
+
+
+@files_bp.route('/api/files/top', methods=['GET'])
+def top_files_api():
+    """Archivos más grandes (`by=size`) o modificados recientemente (`by=modified`) de un workspace."""
+    from flask import current_app
+    from models import Workspace, File
+
+    reconciler = current_app.extensions.get('file_reconciler')
+    if reconciler is None:
+        return jsonify({'success': False, 'error': 'Índice de archivos no disponible'}), 503
+    db = reconciler.db
+
+    user_id = request.args.get('user_id', 'default')
+    order = {'size': File.size.desc(), 'modified': File.modified_at.desc()}.get(request.args.get('by', 'size'))
+    if order is None:
+        return jsonify({'success': False, 'error': "by debe ser 'size' o 'modified'"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_TOP_FILES)), 1), MAX_TOP_FILES)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit debe ser un número'}), 400
+
+    workspace = db.session.query(Workspace.id).filter_by(name=user_id).first()
+    if workspace is None:
+        return jsonify({'success': True, 'files': []})
+    rows = db.session.query(File).filter(File.workspace_id == workspace.id).order_by(order).limit(limit).all()
+    return jsonify({
+        'success': True,
+        'files': [{
+            'path': row.path,
+            'name': row.name,
+            'type': row.file_type,
+            'size': row.size,
+            'modified': row.modified_at.isoformat() if row.modified_at else None
+        } for row in rows],
+        'last_full_scan': reconciler.last_full_scan
+    })
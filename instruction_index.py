@@ -0,0 +1,247 @@
+# Índice de similitud entre instrucciones ya traducidas
+#
+# Una misma instrucción se escribe de muchas formas ("comprime la carpeta src
+# en zip", "comprimir carpeta web en un zip"). La caché de traducciones solo
+# acierta con la instrucción exacta; este índice encuentra la más parecida con
+# vectores TF-IDF de n-gramas de caracteres y similitud coseno, sin modelos de
+# embeddings. Los argumentos (nombres que aparecen tal cual en el comando) se
+# separan de la instrucción al indexarla, de modo que la traducción guardada
+# se reutiliza como plantilla con los argumentos de la nueva instrucción.
+import os
+import re
+import math
+import shlex
+import logging
+
+import numpy as np
+
+from nl_translator import normalize, STOPWORDS
+
+logger = logging.getLogger('instruction_index')
+
+NGRAM_SIZE = 3
+# Candidatos que se comprueban tras la búsqueda por coseno
+TOP_K = 5
+# Similitud mínima entre la instrucción sin argumentos y la indexada
+MIN_SIMILARITY = 0.75
+# Similitud mínima para aceptar una palabra distinta ("crear" por "crea"); además
+# deben compartir el comienzo: "reinstala" o "desinstala" no valen por "instala"
+MIN_WORD_SIMILARITY = 0.6
+MIN_SHARED_PREFIX = 3
+
+# Palabras que no cambian el significado de la instrucción
+FILLERS = STOPWORDS | {
+    'llamado', 'llamada', 'nombre', 'con', 'de', 'del', 'al', 'a', 'en', 'que', 'se', 'llame',
+    'por', 'favor', 'me', 'mi', 'mis', 'y', 'the', 'an', 'of', 'to', 'in', 'named', 'called', 'please'
+}
+
+_KEY_PUNCTUATION = ',;:!?¡¿)("\'`'
+_ARGUMENT_PUNCTUATION = '.,;:!?'
+
+
+def content_words(text):
+    """[(clave normalizada, palabra original)] sin artículos ni palabras de relleno.
+
+    La clave (para comparar) va sin comillas ni paréntesis; la palabra original
+    (el argumento que se pasa al comando) solo pierde la puntuación final, así
+    "$(whoami)" llega entero a shlex.quote.
+    """
+    words = []
+    for raw in (text or '').split():
+        # Un punto final es puntuación salvo en nombres como "index.html"
+        key = normalize(raw.strip(_KEY_PUNCTUATION).rstrip('.'))
+        value = raw.rstrip(_ARGUMENT_PUNCTUATION)
+        if key and key not in FILLERS and value:
+            words.append((key, value))
+    return words
+
+
+def ngrams(words):
+    """N-gramas de caracteres de cada palabra, con los bordes marcados."""
+    grams = []
+    for word in words:
+        padded = f" {word} "
+        if len(padded) <= NGRAM_SIZE:
+            grams.append(padded)
+        else:
+            grams.extend(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+    return grams
+
+
+def _count(grams):
+    counts = {}
+    for gram in grams:
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def word_similarity(a, b):
+    """Coseno entre los n-gramas de dos palabras."""
+    ca, cb = _count(ngrams([a])), _count(ngrams([b]))
+    dot = sum(count * cb.get(gram, 0) for gram, count in ca.items())
+    if not dot:
+        return 0.0
+    return dot / math.sqrt(sum(c * c for c in ca.values()) * sum(c * c for c in cb.values()))
+
+
+def is_word_variant(key, word):
+    """True si key es otra forma de word ("crear" de "crea"), no otra palabra ("reinstala")."""
+    shared = len(os.path.commonprefix([key, word]))
+    if shared < min(MIN_SHARED_PREFIX, len(key), len(word)):
+        return False
+    return word_similarity(key, word) >= MIN_WORD_SIMILARITY
+
+
+def _command_words(command):
+    try:
+        return shlex.split(command)
+    except ValueError:
+        return command.split()
+
+
+class _Entry:
+    __slots__ = ('instruction', 'command', 'fixed', 'args')
+
+    def __init__(self, instruction, command, fixed, args):
+        self.instruction = instruction
+        self.command = command
+        self.fixed = fixed      # palabras de la instrucción que no son argumentos
+        self.args = args        # valores de los argumentos tal como aparecen en el comando
+
+
+def make_entry(instruction, command):
+    """Separa los argumentos de una instrucción traducida.
+
+    Un argumento es una palabra de la instrucción que aparece como palabra del
+    comando (no el programa ni una opción): en "comprime carpeta src en zip" ->
+    "zip -r src.zip src", `src` es argumento y `zip` no.
+    """
+    words = [key for key, _ in content_words(instruction)]
+    operands = {}
+    for word in _command_words(command)[1:]:
+        if word and not word.startswith('-'):
+            operands.setdefault(normalize(word), word)
+    fixed, args = [], []
+    for key in words:
+        if key in operands and operands[key] not in args:
+            args.append(operands[key])
+        else:
+            fixed.append(key)
+    return _Entry(instruction, command, fixed, args)
+
+
+def fill_template(entry, values):
+    """Comando de la entrada con sus argumentos sustituidos por `values`."""
+    if not entry.args:
+        return entry.command
+    replacements = dict(zip(entry.args, (shlex.quote(value) for value in values)))
+    pattern = re.compile(
+        r'(?<![\w./\-])(' + '|'.join(re.escape(arg) for arg in sorted(entry.args, key=len, reverse=True)) + r')(?![\w/\-])'
+    )
+    return pattern.sub(lambda match: replacements[match.group(1)], entry.command)
+
+
+class InstructionIndex:
+    """TF-IDF de n-gramas de caracteres con índice invertido en arrays de NumPy."""
+
+    def __init__(self, translations=()):
+        self.entries = []
+        self.postings = {}
+        self.idf = {}
+        self.build(translations)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build(self, translations):
+        """Indexa pares (instrucción, comando)."""
+        self.entries = [make_entry(instruction, command) for instruction, command in translations]
+        documents = [_count(ngrams(entry.fixed)) for entry in self.entries]
+        total = len(documents)
+        frequencies = {}
+        for counts in documents:
+            for gram in counts:
+                frequencies[gram] = frequencies.get(gram, 0) + 1
+        self.idf = {gram: math.log((1 + total) / (1 + frequency)) + 1 for gram, frequency in frequencies.items()}
+
+        rows, weights = {}, {}
+        for row, counts in enumerate(documents):
+            vector = {gram: count * self.idf[gram] for gram, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            for gram, weight in vector.items():
+                rows.setdefault(gram, []).append(row)
+                weights.setdefault(gram, []).append(weight / norm)
+        self.postings = {
+            gram: (np.array(rows[gram], dtype=np.int32), np.array(weights[gram], dtype=np.float32))
+            for gram in rows
+        }
+
+    def _vector(self, words):
+        counts = _count(ngrams(words))
+        vector = {gram: count * self.idf[gram] for gram, count in counts.items() if gram in self.idf}
+        # Los n-gramas desconocidos también cuentan en la norma: una instrucción
+        # con muchas palabras nuevas no debe parecerse a ninguna
+        unknown = sum(count * count for gram, count in counts.items() if gram not in self.idf)
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()) + unknown) or 1.0
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    def _scores(self, words):
+        scores = np.zeros(len(self.entries), dtype=np.float32)
+        for gram, weight in self._vector(words).items():
+            rows, values = self.postings[gram]
+            scores[rows] += weight * values
+        return scores
+
+    def _similarity(self, words, entry_index):
+        vector = self._vector(words)
+        similarity = 0.0
+        for gram, weight in vector.items():
+            # Las filas de cada n-grama están ordenadas
+            rows, values = self.postings[gram]
+            position = np.searchsorted(rows, entry_index)
+            if position < len(rows) and rows[position] == entry_index:
+                similarity += weight * float(values[position])
+        return similarity
+
+    def search(self, text, k=TOP_K):
+        """[(similitud, posición de la entrada)] de las k instrucciones más parecidas."""
+        words = [key for key, _ in content_words(text)]
+        if not self.entries or not words:
+            return []
+        scores = self._scores(words)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), int(i)) for i in best if scores[i] > 0]
+
+    def match(self, text, min_similarity=MIN_SIMILARITY):
+        """Comando adaptado de la instrucción indexada más parecida, o None.
+
+        Las palabras de la instrucción que no están en la indexada se toman,
+        empezando por el final, como sus argumentos; las que sobren deben
+        parecerse a alguna palabra de la indexada ("crear" y "crea"). Así
+        "comprime carpeta web en tar" no reutiliza "... en zip".
+        """
+        words = content_words(text)
+        for _, index in self.search(text):
+            entry = self.entries[index]
+            fixed = set(entry.fixed)
+            unmatched = [(key, raw) for key, raw in words if key not in fixed]
+            count = len(entry.args)
+            if len(unmatched) < count:
+                continue
+            args = unmatched[len(unmatched) - count:]
+            extra = unmatched[:len(unmatched) - count]
+            if not all(any(is_word_variant(key, word) for word in fixed) for key, _ in extra):
+                continue
+            arg_keys = {key for key, _ in args}
+            remaining = [key for key, _ in words if key not in arg_keys]
+            similarity = self._similarity(remaining, index)
+            if similarity < min_similarity:
+                continue
+            return {
+                'command': fill_template(entry, [raw for _, raw in args]),
+                'instruction': entry.instruction,
+                'similarity': round(similarity, 3)
+            }
+        return None
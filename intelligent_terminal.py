@@ -3,7 +3,6 @@ import re
 import json
 import logging
 import traceback
-import subprocess
 import time
 from pathlib import Path
 from flask import Flask, request
@@ -11,6 +10,11 @@ from flask_socketio import SocketIO, emit
 import openai
 import anthropic
 from dotenv import load_dotenv
+from command_policy import is_command_allowed
+from command_executor import command_executor
+from nl_translator import nl_to_command
+from translation_cache import translation_cache
+from workspace_tree import tree_index
 
 # Cargar variables de entorno
 load_dotenv(override=True)
@@ -61,9 +65,9 @@ def init_app(app, socketio):
                 'type': 'info'
             })
             
-            # Ejecutar el comando
-            command_result = execute_command(result['command'], workspace_path)
-            emit('command_result', command_result)
+            # Ejecutar el comando (el resultado se emite al terminar, sin bloquear el manejador)
+            execute_command(result['command'], workspace_path, emit_command_result(socketio, request.sid),
+                            user_id=user_id, instruction=natural_text, model=result.get('model', model))
         elif result.get('success') and result.get('command'):
             # Si el comando existe pero no se ejecuta automáticamente, sugerir al usuario que lo ejecute
             emit('process_message', {
@@ -83,9 +87,9 @@ def init_app(app, socketio):
         workspace_path = get_user_workspace(user_id)
 
         # Validar y ejecutar el comando
-        if validate_command(bash_command):
-            result = execute_command(bash_command, workspace_path)
-            emit('command_result', result)
+        if is_command_allowed(bash_command):
+            execute_command(bash_command, workspace_path, emit_command_result(socketio, request.sid),
+                            user_id=user_id)
         else:
             emit('command_result', {
                 'success': False,
@@ -126,15 +130,12 @@ def init_app(app, socketio):
                 return
 
             # Obtener contenido
-            contents = []
-            for item in os.listdir(full_path):
-                item_path = os.path.join(full_path, item)
-                contents.append({
-                    'name': item,
-                    'is_directory': os.path.isdir(item_path),
-                    'size': os.path.getsize(item_path) if os.path.isfile(item_path) else 0,
-                    'modified': os.path.getmtime(item_path)
-                })
+            contents = [{
+                'name': entry['name'],
+                'is_directory': entry['is_directory'],
+                'size': entry['size'],
+                'modified': entry['modified']
+            } for entry in tree_index.list_directory(full_path)]
 
             emit('directory_contents', {
                 'success': True,
@@ -155,74 +156,49 @@ def get_user_workspace(user_id='default'):
     os.makedirs(workspace_dir, exist_ok=True)
     return workspace_dir
 
-def validate_command(command):
-    """Valida que el comando sea seguro para ejecutar"""
-    # Lista de comandos prohibidos o patrones peligrosos
-    dangerous_patterns = [
-        r'rm\s+-rf\s+/',  # Borrado recursivo desde la raíz
-        r'>`',            # Redireccionamiento destructivo
-        r'>\s*/dev/sd',   # Escritura directa a dispositivos
-        r'mkfs',          # Formateo de sistemas de archivos
-        r'dd\s+if=',      # Operaciones dd potencialmente peligrosas
-        r'wget.+\s+\|\s+bash', # Descarga y ejecución directa
-        r'curl.+\s+\|\s+bash', # Descarga y ejecución directa
-    ]
-
-    # Verificar patrones peligrosos
-    for pattern in dangerous_patterns:
-        if re.search(pattern, command):
-            return False
-
-    return True
-
-def execute_command(command, workspace_path):
-    """Ejecuta un comando en el workspace del usuario"""
-    try:
-        # Ejecutar comando con timeout para evitar bloqueos
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            cwd=workspace_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        # Establecer un timeout razonable (30 segundos)
-        stdout, stderr = process.communicate(timeout=30)
-
-        # Emitir eventos de sistema de archivos si el comando los modifica
-        if re.match(r'(mkdir|touch|rm|cp|mv|git|echo)', command):
-            # Enviar evento para alertar que hubo modificaciones en el sistema de archivos
+def emit_command_result(socketio, sid):
+    """Callback para execute_command que emite el resultado al cliente `sid`."""
+    def on_done(result):
+        workspace_path = result.pop('workspace_path', None)
+        if result.pop('file_system_changed', False):
             # El cliente recargará el explorador de archivos
-            emit('file_system_changed', {
-                'command': command,
+            socketio.emit('file_system_changed', {
+                'command': result['command'],
                 'workspace_path': workspace_path,
                 'timestamp': time.time()
-            })
+            }, room=sid)
+        socketio.emit('command_result', result, room=sid)
+    return on_done
 
-        return {
-            'success': process.returncode == 0,
-            'command': command,
-            'output': stdout + (f"\nError: {stderr}" if stderr else ""),
-            'status': process.returncode
-        }
-    except subprocess.TimeoutExpired:
-        process.kill()
-        return {
-            'success': False,
-            'command': command,
-            'output': 'Timeout: El comando tardó demasiado en completarse',
-            'status': -1
-        }
-    except Exception as e:
-        logging.error(f"Error ejecutando comando: {str(e)}")
-        return {
-            'success': False,
+def execute_command(command, workspace_path, on_done, user_id='default', instruction=None, model=None):
+    """Ejecuta un comando en el workspace del usuario a través del ejecutor central.
+
+    No bloquea: `on_done(result)` recibe el resultado cuando el comando termina.
+    `instruction` y `model` se guardan en el historial si el comando viene de
+    una instrucción en lenguaje natural.
+    """
+    def finish(execution):
+        if execution.get('timed_out'):
+            output, status = 'Timeout: El comando tardó demasiado en completarse', -1
+        elif execution.get('busy'):
+            output, status = f"Error: {execution['stderr']}", -1
+        else:
+            output = execution['stdout'] + (f"\nError: {execution['stderr']}" if execution['stderr'] else "")
+            status = execution['returncode']
+        on_done({
+            'success': execution['success'],
             'command': command,
-            'output': f"Error: {str(e)}",
-            'status': -1
-        }
+            'output': output,
+            'status': status,
+            'job_id': execution.get('job_id'),
+            # Comandos que pueden modificar el sistema de archivos
+            'file_system_changed': bool(re.match(r'(mkdir|touch|rm|cp|mv|git|echo)', command)),
+            'workspace_path': workspace_path
+        })
+
+    # Timeout razonable (30 segundos) para evitar bloqueos
+    command_executor.submit(command, workspace_path, finish, user_id=user_id, timeout=30,
+                            instruction=instruction, model=model)
 
 def process_natural_language(text, model, workspace_path):
     """
@@ -240,26 +216,54 @@ def process_natural_language(text, model, workspace_path):
         # Primero intentar con reglas simples para comandos comunes
         command = simple_nl_to_command(text)
         if command:
+            # Se ejecuta sin confirmación: pasa por la misma política que los comandos escritos
+            if not is_command_allowed(command):
+                return {
+                    'success': False,
+                    'error': f"El comando sugerido '{command}' no es válido o seguro para ejecutar."
+                }
             return {
                 'success': True,
                 'command': command,
                 'explanation': f"He interpretado tu instrucción como el comando: {command}",
-                'auto_execute': True
+                'auto_execute': True,
+                'model': 'rules'
+            }
+
+        # Después, las traducciones que algún modelo ya resolvió
+        cached = translation_cache.get(text)
+        if cached:
+            if not is_command_allowed(cached['command']):
+                return {
+                    'success': False,
+                    'error': f"El comando sugerido '{cached['command']}' no es válido o seguro para ejecutar."
+                }
+            return {
+                'success': True,
+                'command': cached['command'],
+                'explanation': cached['explanation'] or f"He interpretado tu instrucción como el comando: {cached['command']}",
+                'auto_execute': cached['auto_execute'],
+                'model': cached['provider']
             }
 
         # Si no coincide con reglas simples, usar el modelo de IA seleccionado
         if model == 'openai' and os.environ.get('OPENAI_API_KEY'):
-            return process_with_openai(text, workspace_path)
+            result = process_with_openai(text, workspace_path)
         elif model == 'anthropic' and os.environ.get('ANTHROPIC_API_KEY'):
-            return process_with_anthropic(text, workspace_path)
+            result = process_with_anthropic(text, workspace_path)
         elif model == 'gemini' and os.environ.get('GEMINI_API_KEY'):
-            return process_with_gemini(text, workspace_path)
+            result = process_with_gemini(text, workspace_path)
         else:
             return {
                 'success': False,
                 'error': f"Modelo {model} no disponible o API key no configurada."
             }
 
+        if result.get('success'):
+            translation_cache.put(text, result['command'], result.get('explanation'),
+                                  provider=model, auto_execute=result.get('auto_execute'))
+        return result
+
     except Exception as e:
         logging.error(f"Error procesando lenguaje natural: {str(e)}")
         logging.error(traceback.format_exc())
@@ -270,76 +274,10 @@ def process_natural_language(text, model, workspace_path):
 
 def simple_nl_to_command(text):
     """
-    Convierte instrucciones simples en comandos bash utilizando reglas predefinidas.
+    Convierte instrucciones simples en comandos bash con el traductor compartido.
+    Devuelve None si no se reconoce (y entonces se consulta al modelo de IA).
     """
-    text = text.lower()
-
-    # Reglas para crear archivos y directorios
-    if re.search(r'crea(?:r)?\s+(?:un\s+)?(?:archivo|fichero)\s+(?:llamado\s+)?["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        file_name = re.search(r'crea(?:r)?\s+(?:un\s+)?(?:archivo|fichero)\s+(?:llamado\s+)?["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"touch {file_name}"
-
-    if re.search(r'crea(?:r)?\s+(?:una\s+)?(?:carpeta|directorio)\s+(?:llamad[oa]\s+)?["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        dir_name = re.search(r'crea(?:r)?\s+(?:una\s+)?(?:carpeta|directorio)\s+(?:llamad[oa]\s+)?["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"mkdir -p {dir_name}"
-
-    # Reglas para listar archivos
-    if re.search(r'(?:lista|muestra|ver|visualiza)(?:r)?\s+(?:archivos|ficheros|contenido|contenidos|directorio)', text):
-        if 'detalle' in text or 'detallada' in text:
-            return "ls -la"
-        elif 'oculto' in text or 'ocultos' in text:
-            return "ls -a"
-        else:
-            return "ls -l"
-
-    # Reglas para eliminar archivos o directorios
-    if re.search(r'(?:elimina|borra|remueve)(?:r)?\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        file_name = re.search(r'(?:elimina|borra|remueve)(?:r)?\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"rm {file_name}"
-
-    if re.search(r'(?:elimina|borra|remueve)(?:r)?\s+(?:la\s+)?(?:carpeta|directorio)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        dir_name = re.search(r'(?:elimina|borra|remueve)(?:r)?\s+(?:la\s+)?(?:carpeta|directorio)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"rm -r {dir_name}"
-
-    # Reglas para mostrar contenido de archivos
-    if re.search(r'(?:muestra|ver|visualiza|cat)(?:r)?\s+(?:el\s+)?contenido\s+(?:del\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        file_name = re.search(r'(?:muestra|ver|visualiza|cat)(?:r)?\s+(?:el\s+)?contenido\s+(?:del\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"cat {file_name}"
-    
-    # Búsqueda
-    if re.search(r'(?:busca|encuentra|localiza)(?:r)?\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        file_name = re.search(r'(?:busca|encuentra|localiza)(?:r)?\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"find . -name \"{file_name}\" -type f"
-    
-    if re.search(r'busca(?:r)?\s+texto\s+["\'`]?([^"\'`]+)["\'`]?', text):
-        search_text = re.search(r'busca(?:r)?\s+texto\s+["\'`]?([^"\'`]+)["\'`]?', text).group(1)
-        return f"grep -r \"{search_text}\" ."
-    
-    # Cambiar de directorio
-    if re.search(r'(?:cambia|ve|ir|navega)(?:r)?\s+(?:a|al)\s+(?:directorio|carpeta)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        dir_name = re.search(r'(?:cambia|ve|ir|navega)(?:r)?\s+(?:a|al)\s+(?:directorio|carpeta)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text).group(1)
-        return f"cd {dir_name}"
-    
-    # Copiar archivos
-    if re.search(r'copia(?:r)?\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?\s+a\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        match = re.search(r'copia(?:r)?\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?\s+a\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text)
-        source = match.group(1)
-        dest = match.group(2)
-        return f"cp {source} {dest}"
-    
-    # Mover archivos
-    if re.search(r'(?:mueve|mover)\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?\s+a\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text):
-        match = re.search(r'(?:mueve|mover)\s+(?:el\s+)?(?:archivo|fichero)\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?\s+a\s+["\'`]?([a-zA-Z0-9_\-\.\/]+)["\'`]?', text)
-        source = match.group(1)
-        dest = match.group(2)
-        return f"mv {source} {dest}"
-    
-    # Mostrar directorio actual
-    if re.search(r'(?:muestra|ver|dime|cual\s+es)\s+(?:el\s+)?directorio\s+actual', text):
-        return "pwd"
-    
-    # Si no coincide con ninguna regla simple, retornar None
-    return None
+    return nl_to_command(text)
 
 def process_with_openai(text, workspace_path):
     """Procesa instrucción con OpenAI"""
@@ -388,7 +326,7 @@ Debes responder en formato JSON con los siguientes campos:
 
         # Sanitizar y validar el comando resultante
         command = result.get('command', '').strip()
-        if not command or not validate_command(command):
+        if not command or not is_command_allowed(command):
             return {
                 'success': False,
                 'error': f"El comando sugerido '{command}' no es válido o seguro para ejecutar."
@@ -471,7 +409,7 @@ Debes responder en formato JSON con los siguientes campos:
 
         # Sanitizar y validar el comando resultante
         command = result.get('command', '').strip()
-        if not command or not validate_command(command):
+        if not command or not is_command_allowed(command):
             return {
                 'success': False,
                 'error': f"El comando sugerido '{command}' no es válido o seguro para ejecutar."
@@ -556,7 +494,7 @@ def process_with_gemini(text, workspace_path):
 
         # Sanitizar y validar el comando resultante
         command = result.get('command', '').strip()
-        if not command or not validate_command(command):
+        if not command or not is_command_allowed(command):
             return {
                 'success': False,
                 'error': f"El comando sugerido '{command}' no es válido o seguro para ejecutar."
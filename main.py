@@ -11,14 +11,23 @@ import threading
 import logging
 import openai
 import google.generativeai as genai
-import subprocess
 import shutil
 from pathlib import Path
 import traceback
 import re
 import threading
-from constructor_routes import constructor_bp
+from constructor_routes import constructor_bp, project_manifests
 from xterm_terminal import xterm_bp, init_xterm_blueprint
+from command_executor import command_executor, ExecutorBusy, new_job_id, OUTPUT_PAGE_SIZE
+from command_cache import command_cache
+from workspace_tree import tree_index, walk_tree, DEFAULT_IGNORED
+from nl_translator import translate
+from command_policy import check_command
+from translation_cache import translation_cache
+import command_history
+import database
+from workspace_registry import WorkspaceRegistry
+import file_reconciler
 
 # Configurar logging
 logging.basicConfig(level=logging.DEBUG,
@@ -36,6 +45,43 @@ from flask_socketio import SocketIO, emit
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading',
                     ping_timeout=60, ping_interval=25, logger=True, engineio_logger=True)
 
+# Backend de ejecución de comandos ('thread' o 'asyncio'), según el modo del servidor
+app.config['COMMAND_BACKEND'] = os.getenv('COMMAND_BACKEND', 'thread')
+command_executor.set_backend(app.config['COMMAND_BACKEND'], socketio.async_mode)
+
+# Base de datos (DATABASE_URL, por defecto SQLite): historial de comandos del
+# ejecutor y /api/history. Sin ella la aplicación funciona igual, sin historial.
+db = None
+if os.getenv('USE_DATABASE', '1') != '0':
+    try:
+        db = database.init_app(app)
+        command_history.init_app(app, db)
+        logging.info("Base de datos e historial de comandos inicializados")
+    except Exception as e:
+        db = None
+        logging.error(f"Base de datos no disponible, sin historial de comandos: {str(e)}")
+
+# Workspaces registrados en la base de datos, en memoria (last_accessed se vuelca por lotes)
+workspace_registry = WorkspaceRegistry(app, db) if db is not None else None
+
+# Tabla files sincronizada con el disco (eventos del observador y escaneo periódico)
+if db is not None and os.getenv('FILE_RECONCILER', '1') != '0':
+    try:
+        file_reconciler.init_app(app, db, Path("./user_workspaces"))
+    except Exception as e:
+        logging.error(f"No se pudo iniciar la sincronización de la tabla files: {str(e)}")
+
+def track_workspace(user_id, workspace_path):
+    """Anota el acceso al workspace en la base de datos, si la hay."""
+    if workspace_registry is None:
+        return
+    try:
+        workspace_registry.touch(user_id, workspace_path)
+    except Exception as e:
+        with app.app_context():
+            db.session.rollback()
+        logging.error(f"Error registrando el workspace en la base de datos: {str(e)}")
+
 # Register constructor blueprint
 try:
     app.register_blueprint(constructor_bp)
@@ -188,40 +234,46 @@ class FileSystemManager:
         """Obtener o crear un directorio de trabajo para el usuario."""
         workspace_path = Path("./user_workspaces") / user_id
         workspace_path.mkdir(parents=True, exist_ok=True)
+        track_workspace(user_id, workspace_path)
         return workspace_path
 
     def notify_terminals(self, user_id, data, exclude_terminal=None):
         """Notificar a todas las terminales de un usuario sobre la ejecución de comandos."""
         self.socketio.emit('command_result', data, room=user_id)
 
-    def execute_command(self, command, user_id='default', notify=True, terminal_id=None):
-        """Ejecuta un comando en el workspace del usuario."""
+    def execute_command(self, command, user_id='default', notify=True, terminal_id=None, job_id=None):
+        """Ejecuta un comando en el workspace del usuario.
+
+        `job_id` identifica el comando para poder cancelarlo mientras se ejecuta.
+        """
         try:
             workspace_dir = self.get_user_workspace(user_id)
-            current_dir = os.getcwd()
-            os.chdir(workspace_dir)
 
             logging.info(f"Ejecutando comando: '{command}' en workspace: {workspace_dir}")
 
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            def on_queued(position):
+                if terminal_id:
+                    self.socketio.emit('command_queued', {
+                        'command': command,
+                        'position': position,
+                        'terminal_id': terminal_id
+                    }, room=terminal_id)
 
-            os.chdir(current_dir)
+            # El ejecutor central limita los procesos simultáneos (global y por
+            # usuario) y pasa el workspace como cwd del subproceso
+            result = command_executor.run(command, workspace_dir, user_id=user_id,
+                                          on_queued=on_queued, job_id=job_id)
 
-            output = result.stdout if result.returncode == 0 else result.stderr
-            success = result.returncode == 0
+            output = result['stdout'] if result['success'] else result['stderr']
+            success = result['success']
 
             if notify and terminal_id:
                 self.notify_terminals(user_id, {
                     'output': output,
                     'success': success,
                     'command': command,
-                    'terminal_id': terminal_id
+                    'terminal_id': terminal_id,
+                    'job_id': result['job_id']
                 })
 
             file_modifying_commands = ['mkdir', 'touch', 'rm', 'cp', 'mv']
@@ -235,15 +287,19 @@ class FileSystemManager:
             return {
                 'output': output,
                 'success': success,
-                'command': command
+                'command': command,
+                'job_id': result['job_id'],
+                'cancelled': result.get('cancelled', False),
+                'truncated': result.get('truncated', False)
             }
 
-        except subprocess.TimeoutExpired:
-            logging.error(f"Timeout al ejecutar comando: {command}")
+        except ExecutorBusy as e:
+            logging.warning(f"Comando rechazado por el ejecutor: {command}")
             return {
-                'output': 'Error: El comando tardó demasiado tiempo en ejecutarse',
+                'output': f'Error: {str(e)}',
                 'success': False,
-                'command': command
+                'command': command,
+                'job_id': job_id
             }
         except Exception as e:
             logging.error(f"Error al ejecutar comando: {str(e)}")
@@ -254,51 +310,22 @@ class FileSystemManager:
             }
 
 def process_natural_language_to_command(text):
-    """Convierte lenguaje natural a comandos de terminal."""
-    command_map = {
-        "listar": "ls -la",
-        "mostrar archivos": "ls -la",
-        "mostrar directorio": "ls -la",
-        "ver archivos": "ls -la",
-        "fecha": "date",
-        "hora": "date +%H:%M:%S",
-        "calendario": "cal",
-        "quien soy": "whoami",
-        "donde estoy": "pwd",
-        "limpiar": "clear",
-        "sistema": "uname -a",
-        "memoria": "free -h",
-        "espacio": "df -h",
-        "procesos": "ps aux"
-    }
-
-    text_lower = text.lower()
-
-    for key, cmd in command_map.items():
-        if key in text_lower:
-            return cmd
-
-    if "crear" in text_lower and "carpeta" in text_lower:
-        folder_name = text_lower.split("carpeta")[-1].strip()
-        if folder_name:
-            return f"mkdir -p {folder_name}"
-
-    elif "crear" in text_lower and "archivo" in text_lower:
-        file_name = text_lower.split("archivo")[-1].strip()
-        if file_name:
-            return f"touch {file_name}"
-
-    elif "eliminar" in text_lower or "borrar" in text_lower:
-        target = text_lower.replace("eliminar", "").replace("borrar", "").strip()
-        if target:
-            return f"rm -rf {target}"
-
-    return text
+    """Convierte lenguaje natural a comandos de terminal (traductor compartido).
+
+    Devuelve (comando, qué falta). Si la instrucción no se reconoce se
+    devuelve tal cual, como un comando; si solo se entiende en parte, el
+    comando es None y `missing` dice qué falta.
+    """
+    translation = translate(text)
+    if translation is None:
+        return text, None
+    return translation['command'], translation['missing']
 
 def get_user_workspace(user_id='default'):
     """Obtener o crear un directorio de trabajo para el usuario."""
     workspace_path = Path("./user_workspaces") / user_id
     workspace_path.mkdir(parents=True, exist_ok=True)
+    track_workspace(user_id, workspace_path)
     return workspace_path
 
 @app.route('/api/file/content', methods=['GET'])
@@ -427,6 +454,21 @@ def watch_workspace_files():
         class WorkspaceHandler(FileSystemEventHandler):
             def on_any_event(self, event):
                 try:
+                    # Cualquier cambio (incluidos .git y archivos ocultos) invalida
+                    # los resultados en caché de los comandos de solo lectura
+                    command_cache.invalidate_path(event.src_path, event.event_type, event.is_directory)
+                    if getattr(event, 'dest_path', None):
+                        command_cache.invalidate_path(event.dest_path, event.event_type, event.is_directory)
+                    # y actualiza el índice en memoria de los listados de directorios
+                    tree_index.apply_event(event.src_path, event.event_type, event.is_directory,
+                                           getattr(event, 'dest_path', None))
+                    # y los manifiestos de los proyectos del constructor, que
+                    # también incluyen .gitignore, .env y demás archivos ocultos
+                    project_manifests.handle_event(
+                        event.event_type, event.src_path,
+                        getattr(event, 'dest_path', None), event.is_directory
+                    )
+
                     if event.src_path.endswith('~') or '/.' in event.src_path:
                         return
 
@@ -469,14 +511,19 @@ def watch_workspace_files():
         observer = Observer()
         observer.schedule(event_handler, workspace_dir, recursive=True)
         observer.start()
+        command_cache.watch(workspace_dir)
+        tree_index.watch(workspace_dir)
 
         logging.info(f"Observador de archivos iniciado para: {workspace_dir}")
 
         try:
-            while True:
+            while observer.is_alive():
                 time.sleep(1)
         except KeyboardInterrupt:
             observer.stop()
+        finally:
+            command_cache.unwatch(workspace_dir)
+            tree_index.unwatch(workspace_dir)
         observer.join()
 
     except ImportError:
@@ -1040,7 +1087,14 @@ def process_natural_command():
                 'error': 'No se proporcionó texto'
             }), 400
 
-        command = process_natural_language_to_command(text)
+        command, missing = process_natural_language_to_command(text)
+
+        if missing:
+            return jsonify({
+                'success': False,
+                'error': missing,
+                'needs_more_info': True
+            }), 400
 
         if not command:
             return jsonify({
@@ -1048,27 +1102,29 @@ def process_natural_command():
                 'error': 'No se pudo generar un comando para esa instrucción'
             }), 400
 
+        # Se ejecuta sin confirmación: la misma política que los comandos escritos
+        allowed, reason = check_command(command)
+        if not allowed:
+            return jsonify({
+                'success': False,
+                'command': command,
+                'error': f"Comando no permitido: {reason}"
+            }), 403
+
         # Execute command
         file_modifying_commands = ['mkdir', 'touch', 'rm', 'cp', 'mv', 'ls']
         is_file_command = any(cmd in command.split() for cmd in file_modifying_commands)
 
+        job_id = data.get('job_id') or new_job_id()
         try:
             workspace_dir = get_user_workspace(user_id)
-            current_dir = os.getcwd()
-            os.chdir(workspace_dir)
 
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            result = command_executor.run(command, workspace_dir, user_id=user_id, job_id=job_id,
+                                          instruction=text)
 
-            os.chdir(current_dir)
-
-            command_output = result.stdout if result.returncode == 0 else result.stderr
-            command_success = result.returncode == 0
+            command_output = result['stdout'] if result['success'] else result['stderr']
+            command_success = result['success']
+            job_id = result['job_id']
 
         except Exception as cmd_error:
             logging.error(f"Error al ejecutar comando: {str(cmd_error)}")
@@ -1128,7 +1184,8 @@ def process_natural_command():
             'command': command,
             'refresh_explorer': is_file_command,
             'output': command_output,
-            'success': command_success
+            'success': command_success,
+            'job_id': job_id
         })
 
     except Exception as e:
@@ -1153,58 +1210,18 @@ def process_instructions():
 
         command_only = data.get('command_only', False)
 
-        command_map = {
-            "listar": "ls -la",
-            "mostrar archivos": "ls -la",
-            "mostrar directorio": "ls -la",
-            "ver archivos": "ls -la",
-            "archivos": "ls -la",
-            "dir": "ls -la",
-            "fecha": "date",
-            "hora": "date +%H:%M:%S",
-            "calendario": "cal",
-            "quien soy": "whoami",
-            "donde estoy": "pwd",
-            "limpiar": "clear",
-            "sistema": "uname -a",
-            "memoria": "free -h",
-            "espacio": "df -h",
-            "procesos": "ps aux"
-        }
-
-        instruction_lower = instruction.lower()
+        translation = translate(instruction)
         terminal_command = None
         missing_info = None
 
-        for key, cmd in command_map.items():
-            if key in instruction_lower:
-                terminal_command = cmd
-                break
-
-        if not terminal_command:
-            if "crear" in instruction_lower and "carpeta" in instruction_lower:
-                folder_name = instruction_lower.split("carpeta")[-1].strip()
-                if not folder_name:
-                    missing_info = "Falta especificar el nombre de la carpeta"
-                else:
-                    terminal_command = f"mkdir -p {folder_name}"
-
-            elif "crear" in instruction_lower and "archivo" in instruction_lower:
-                file_name = instruction_lower.split("archivo")[-1].strip()
-                if not file_name:
-                    missing_info = "Falta especificar el nombre del archivo"
-                else:
-                    terminal_command = f"touch {file_name}"
-
-            elif "eliminar" in instruction_lower or "borrar" in instruction_lower:
-                target = instruction_lower.replace("eliminar", "").replace("borrar", "").strip()
-                if not target:
-                    missing_info = "Falta especificar qué elemento eliminar"
-                else:
-                    terminal_command = f"rm -rf {target}"
-
-            else:
-                terminal_command = "echo 'Comando no reconocido'"
+        if translation and translation['missing']:
+            missing_info = translation['missing']
+        elif translation and translation['command']:
+            terminal_command = translation['command']
+        else:
+            # Traducciones que los modelos de IA ya resolvieron en alguna terminal
+            cached = translation_cache.get(instruction)
+            terminal_command = cached['command'] if cached else "echo 'Comando no reconocido'"
 
         if terminal_command:
             logging.info(f"Instrucción: '{instruction}' → Comando: '{terminal_command}'")
@@ -1306,30 +1323,28 @@ def list_files_api():
 
         files = []
         try:
-            for item in os.listdir(full_directory):
-                item_path = os.path.join(full_directory, item)
+            # Listado desde el índice en memoria (se mantiene con el observador de archivos)
+            for entry in tree_index.list_directory(full_directory):
+                item = entry['name']
                 relative_path = os.path.join(relative_dir, item) if relative_dir != '.' else item
 
-                extension = os.path.splitext(item)[1].lower()[1:] if os.path.isfile(item_path) and '.' in item else ''
-
-                if os.path.isdir(item_path):
+                if entry['is_directory']:
                     files.append({
                         'name': item,
                         'path': relative_path,
                         'type': 'directory',
                         'size': 0,
-                        'modified': os.path.getmtime(item_path),
+                        'modified': entry['modified'],
                         'extension': ''
                     })
                 else:
-                    file_size = os.path.getsize(item_path)
                     files.append({
                         'name': item,
                         'path': relative_path,
                         'type': 'file',
-                        'size': file_size,
-                        'modified': os.path.getmtime(item_path),
-                        'extension': extension
+                        'size': entry['size'],
+                        'modified': entry['modified'],
+                        'extension': os.path.splitext(item)[1].lower()[1:] if '.' in item else ''
                     })
         except Exception as e:
             logging.error(f"Error al listar archivos: {str(e)}")
@@ -1350,6 +1365,99 @@ def list_files_api():
             'error': str(e)
         }), 500
 
+MAX_TREE_DEPTH = 20
+DEFAULT_TREE_LIMIT = 500
+MAX_TREE_LIMIT = 5000
+
+
+def _split_patterns(value):
+    return [pattern.strip() for pattern in value.split(',') if pattern.strip()]
+
+
+@app.route('/api/files/tree', methods=['GET'])
+def list_files_tree_api():
+    """API para listar recursivamente el workspace del usuario, por páginas.
+
+    Parámetros: directory, depth (1 = solo el directorio), glob (patrones
+    separados por comas), ignore (por defecto node_modules, .git y __pycache__;
+    vacío para no ignorar nada), limit y cursor (next_cursor de la respuesta
+    anterior).
+    """
+    try:
+        directory = request.args.get('directory', '.')
+        user_id = request.args.get('user_id', 'default')
+        try:
+            depth = min(max(int(request.args.get('depth', 3)), 1), MAX_TREE_DEPTH)
+            limit = min(max(int(request.args.get('limit', DEFAULT_TREE_LIMIT)), 1), MAX_TREE_LIMIT)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'depth y limit deben ser números enteros'
+            }), 400
+        include = _split_patterns(request.args.get('glob', ''))
+        ignore = request.args.get('ignore')
+        ignore = DEFAULT_IGNORED if ignore is None else _split_patterns(ignore)
+        cursor = request.args.get('cursor') or None
+
+        user_workspace = get_user_workspace(user_id)
+
+        if directory == '.':
+            full_directory = user_workspace
+            relative_dir = '.'
+        else:
+            directory = directory.replace('..', '').strip('/')
+            full_directory = os.path.join(user_workspace, directory)
+            relative_dir = directory
+
+        if not os.path.isdir(full_directory):
+            return jsonify({
+                'success': False,
+                'error': 'Directorio no encontrado'
+            }), 404
+
+        files = []
+        has_more = False
+        last_path = None
+        try:
+            for path, level, entry in walk_tree(full_directory, depth, include, ignore, cursor):
+                if len(files) == limit:
+                    has_more = True
+                    break
+                item = entry['name']
+                is_directory = entry['is_directory']
+                files.append({
+                    'name': item,
+                    'path': os.path.join(relative_dir, path) if relative_dir != '.' else path,
+                    'type': 'directory' if is_directory else 'file',
+                    'size': 0 if is_directory else entry['size'],
+                    'modified': entry['modified'],
+                    'extension': '' if is_directory or '.' not in item else os.path.splitext(item)[1].lower()[1:],
+                    'depth': level
+                })
+                last_path = path
+        except OSError as e:
+            logging.error(f"Error al listar el árbol de archivos: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f'Error al listar archivos: {str(e)}'
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'files': files,
+            'directory': relative_dir,
+            'depth': depth,
+            # Ruta (relativa a directory) de la última entrada devuelta
+            'next_cursor': last_path if has_more else None,
+            'has_more': has_more
+        })
+    except Exception as e:
+        logging.error(f"Error en endpoint de árbol de archivos: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/files/read', methods=['GET'])
 def read_file():
     """API para leer el contenido de un archivo en el workspace del usuario."""
@@ -1655,6 +1763,73 @@ def api_status():
         }), 500
 
 
+@app.route('/api/commands', methods=['GET'])
+def list_running_commands():
+    """Lista los comandos en cola o en ejecución de un usuario."""
+    user_id = request.args.get('user_id', 'default')
+    return jsonify({
+        'success': True,
+        'jobs': command_executor.list_jobs(user_id),
+        'executor': command_executor.stats()
+    })
+
+
+@app.route('/api/commands/<job_id>/cancel', methods=['POST'])
+def cancel_command(job_id):
+    """Cancela un comando en cola o en ejecución (mata su grupo de procesos)."""
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id', request.args.get('user_id', 'default'))
+
+    if not command_executor.cancel(job_id, user_id=user_id):
+        return jsonify({
+            'success': False,
+            'error': 'No hay ningún comando activo con ese identificador'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id
+    })
+
+
+def parse_output_page_args(args):
+    """(offset, limit, error) de una petición de página de salida."""
+    try:
+        offset = int(args.get('offset', 0))
+        limit = int(args.get('limit', OUTPUT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return None, None, 'offset y limit deben ser números enteros'
+    if limit <= 0:
+        return None, None, 'limit debe ser mayor que 0'
+    return offset, limit, None
+
+
+@app.route('/api/commands/<job_id>/output', methods=['GET'])
+def command_output_page(job_id):
+    """Devuelve una página de la salida completa de un comando truncado."""
+    user_id = request.args.get('user_id', 'default')
+    offset, limit, error = parse_output_page_args(request.args)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    page = command_executor.output_page(
+        job_id,
+        stream=request.args.get('stream', 'stdout'),
+        offset=offset,
+        limit=limit,
+        user_id=user_id
+    )
+    if page is None:
+        return jsonify({
+            'success': False,
+            'error': 'No hay salida guardada para ese comando'
+        }), 404
+
+    return jsonify(dict(page, success=True))
+
+
 @socketio.on('connect')
 def handle_connect():
     """Manejar conexión de cliente Socket.IO."""
@@ -1676,19 +1851,31 @@ def handle_execute_command(data):
         }, room=terminal_id)
         return
 
+    # El job_id se envía antes de ejecutar para que el cliente pueda cancelar el comando
+    job_id = data.get('job_id') or new_job_id()
+    emit('command_started', {
+        'command': command,
+        'job_id': job_id,
+        'terminal_id': terminal_id
+    }, room=terminal_id)
+
     file_system_manager = FileSystemManager(socketio)
     result = file_system_manager.execute_command(
         command=command,
         user_id=user_id,
         notify=True,
-        terminal_id=terminal_id
+        terminal_id=terminal_id,
+        job_id=job_id
     )
 
     emit('command_result', {
         'output': result.get('output', ''),
         'success': result.get('success', False),
         'command': command,
-        'terminal_id': terminal_id
+        'terminal_id': terminal_id,
+        'job_id': result.get('job_id'),
+        'cancelled': result.get('cancelled', False),
+        'truncated': result.get('truncated', False)
     }, room=terminal_id)
 
     socketio.emit('file_sync', {
@@ -1698,6 +1885,54 @@ def handle_execute_command(data):
     }, room=user_id)
 
 
+@socketio.on('cancel_command')
+def handle_cancel_command(data):
+    """Cancela un comando en cola o en ejecución a partir de su job_id."""
+    job_id = data.get('job_id', '')
+    user_id = data.get('user_id', 'default')
+    terminal_id = data.get('terminal_id', request.sid)
+
+    cancelled = command_executor.cancel(job_id, user_id=user_id)
+    emit('command_cancelled', {
+        'job_id': job_id,
+        'success': cancelled,
+        'terminal_id': terminal_id,
+        'error': None if cancelled else 'No hay ningún comando activo con ese identificador'
+    }, room=request.sid)
+
+
+@socketio.on('command_output_page')
+def handle_command_output_page(data):
+    """Envía una página de la salida completa de un comando truncado."""
+    job_id = data.get('job_id', '')
+    offset, limit, error = parse_output_page_args(data)
+    if error:
+        emit('command_output_page', {
+            'job_id': job_id,
+            'success': False,
+            'error': error,
+            'terminal_id': data.get('terminal_id', request.sid)
+        }, room=request.sid)
+        return
+    page = command_executor.output_page(
+        job_id,
+        stream=data.get('stream', 'stdout'),
+        offset=offset,
+        limit=limit,
+        user_id=data.get('user_id', 'default')
+    )
+    if page is None:
+        page = {
+            'job_id': job_id,
+            'success': False,
+            'error': 'No hay salida guardada para ese comando'
+        }
+    else:
+        page['success'] = True
+    page['terminal_id'] = data.get('terminal_id', request.sid)
+    emit('command_output_page', page, room=request.sid)
+
+
 @socketio.on('user_message')
 def handle_user_message(data):
     """Manejar mensajes del usuario a través de Socket.IO."""
@@ -2,7 +2,6 @@ import os
 import json
 import logging
 import traceback
-import subprocess
 import threading
 import re  # Añadir esta importación
 from datetime import datetime
@@ -14,6 +13,7 @@ from dotenv import load_dotenv
 import eventlet
 eventlet.monkey_patch()
 import uuid
+from command_executor import command_executor, ExecutorBusy, DEFAULT_TIMEOUT
 
 # Configuración de claves API (para desarrollo, en producción usar variables de entorno)
 # Descomenta y configura las líneas que necesites
@@ -536,22 +536,21 @@ def execute_command_api():
     try:
         workspace = get_user_workspace(user_id)
 
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=workspace
-        )
+        # Ejecutor central: mismo límite de tiempo y de concurrencia que las terminales
+        execution = command_executor.run(command, workspace, user_id=user_id)
+        stdout, stderr, status = execution['stdout'], execution['stderr'], execution['returncode']
 
-        stdout, stderr = process.communicate(timeout=30)
-        status = process.returncode
+        if execution.get('timed_out'):
+            return jsonify({
+                'success': False,
+                'error': f'Tiempo de ejecución agotado ({DEFAULT_TIMEOUT}s)'
+            }), 504
 
         result = {
             'success': True,
             'command': command,
-            'stdout': stdout.decode('utf-8', errors='replace'),
-            'stderr': stderr.decode('utf-8', errors='replace'),
+            'stdout': stdout,
+            'stderr': stderr,
             'status': status
         }
 
@@ -559,11 +558,11 @@ def execute_command_api():
         socketio.emit('command_executed', result, room=user_id)
 
         return jsonify(result)
-    except subprocess.TimeoutExpired:
+    except ExecutorBusy as e:
         return jsonify({
             'success': False,
-            'error': 'Tiempo de ejecución agotado (30s)'
-        }), 504
+            'error': str(e)
+        }), 503
     except Exception as e:
         logger.error(f"Error al ejecutar comando: {str(e)}")
         return jsonify({
@@ -624,25 +623,18 @@ def chat_api():
             # Ejecutar el comando
             workspace = get_user_workspace(user_id)
 
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=workspace
-            )
-
-            stdout, stderr = process.communicate(timeout=30)
-            status = process.returncode
+            # Ejecutor central: mismo límite de tiempo y de concurrencia que las terminales
+            execution = command_executor.run(command, workspace, user_id=user_id)
+            stdout, stderr, status = execution['stdout'], execution['stderr'], execution['returncode']
 
             # Formatear respuesta
             response = f"Ejecuté el comando: `{command}`\n\n"
 
             if stdout:
-                response += f"**Salida:**\n```\n{stdout.decode('utf-8', errors='replace')}\n```\n\n"
+                response += f"**Salida:**\n```\n{stdout}\n```\n\n"
 
             if stderr:
-                response += f"**Errores:**\n```\n{stderr.decode('utf-8', errors='replace')}\n```\n\n"
+                response += f"**Errores:**\n```\n{stderr}\n```\n\n"
 
             response += f"Comando finalizado con código de estado: {status}"
 
@@ -937,23 +929,16 @@ def process_instruction_api():
             # Ejecutar el comando
             workspace = get_user_workspace(user_id)
 
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=workspace
-            )
-
-            stdout, stderr = process.communicate(timeout=30)
-            status = process.returncode
+            # Ejecutor central: mismo límite de tiempo y de concurrencia que las terminales
+            execution = command_executor.run(command, workspace, user_id=user_id)
+            stdout, stderr, status = execution['stdout'], execution['stderr'], execution['returncode']
 
             return jsonify({
                 'success': True,
                 'action': 'execute_command',
                 'command': command,
-                'stdout': stdout.decode('utf-8', errors='replace'),
-                'stderr': stderr.decode('utf-8', errors='replace'),
+                'stdout': stdout,
+                'stderr': stderr,
                 'status': status
             })
 
@@ -1010,23 +995,16 @@ def handle_bash_command(data):
         # Ejecutar el comando
         workspace = get_user_workspace(user_id)
 
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=workspace
-        )
-
-        stdout, stderr = process.communicate(timeout=30)
-        status = process.returncode
+        # Ejecutor central: mismo límite de tiempo y de concurrencia que las terminales
+        execution = command_executor.run(command, workspace, user_id=user_id)
+        stdout, stderr, status = execution['stdout'], execution['stderr'], execution['returncode']
 
         # Enviar resultado
         emit('command_result', {
             'success': status == 0,
             'command': command,
-            'output': stdout.decode('utf-8', errors='replace'),
-            'stderr': stderr.decode('utf-8', errors='replace'),
+            'output': stdout,
+            'stderr': stderr,
             'status': status
         })
 
@@ -1146,22 +1124,15 @@ def handle_natural_language(data):
             # Ejecutar el comando
             workspace = get_user_workspace(user_id)
 
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=workspace
-            )
-
-            stdout, stderr = process.communicate(timeout=30)
-            status = process.returncode
+            # Ejecutor central: mismo límite de tiempo y de concurrencia que las terminales
+            execution = command_executor.run(command, workspace, user_id=user_id)
+            stdout, stderr, status = execution['stdout'], execution['stderr'], execution['returncode']
 
             # Notificar a clientes conectados
             socketio.emit('command_executed', {
                 'command': command,
-                'output': stdout.decode('utf-8', errors='replace'),
-                'error': stderr.decode('utf-8', errors='replace'),
+                'output': stdout,
+                'error': stderr,
                 'status': status
             }, room=user_id)
 
@@ -1174,8 +1145,8 @@ def handle_natural_language(data):
                     'command': command,
                     'status': status
                 },
-                'output': stdout.decode('utf-8', errors='replace'),
-                'error': stderr.decode('utf-8', errors='replace'),
+                'output': stdout,
+                'error': stderr,
                 'explanation': f'He ejecutado el comando: {command}'
             })
 
@@ -1312,22 +1283,15 @@ def process_natural_api():
             # Ejecutar el comando
             workspace = get_user_workspace(user_id)
 
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=workspace
-            )
-
-            stdout, stderr = process.communicate(timeout=30)
-            status = process.returncode
+            # Ejecutor central: mismo límite de tiempo y de concurrencia que las terminales
+            execution = command_executor.run(command, workspace, user_id=user_id)
+            stdout, stderr, status = execution['stdout'], execution['stderr'], execution['returncode']
 
             # Notificar a clientes conectados
             socketio.emit('command_executed', {
                 'command': command,
-                'output': stdout.decode('utf-8', errors='replace'),
-                'error': stderr.decode('utf-8', errors='replace'),
+                'output': stdout,
+                'error': stderr,
                 'status': status
             }, room=user_id)
 
@@ -1340,8 +1304,8 @@ def process_natural_api():
                     'command': command,
                     'status': status
                 },
-                'output': stdout.decode('utf-8', errors='replace'),
-                'error': stderr.decode('utf-8', errors='replace'),
+                'output': stdout,
+                'error': stderr,
                 'explanation': f'He ejecutado el comando: {command}'
             })
 
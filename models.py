@@ -1,4 +1,4 @@
-from app import db
+from database import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
@@ -36,6 +36,10 @@ class User(db.Model):
 class Workspace(db.Model):
     """Workspace model for managing user's file workspaces."""
     __tablename__ = 'workspaces'
+    __table_args__ = (
+        # get_user_workspace looks workspaces up by owner and name
+        db.Index('ix_workspaces_user_id_name', 'user_id', 'name'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), nullable=False)
@@ -58,6 +62,13 @@ class Workspace(db.Model):
 class File(db.Model):
     """File model for tracking files created in workspaces."""
     __tablename__ = 'files'
+    __table_args__ = (
+        # One row per path in a workspace
+        db.Index('ix_files_workspace_id_path', 'workspace_id', 'path', unique=True),
+        # Largest and most recently modified files of a workspace
+        db.Index('ix_files_workspace_id_size', 'workspace_id', 'size'),
+        db.Index('ix_files_workspace_id_modified_at', 'workspace_id', 'modified_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
@@ -80,6 +91,11 @@ class File(db.Model):
 class Command(db.Model):
     """Command model for tracking and saving command history."""
     __tablename__ = 'commands'
+    __table_args__ = (
+        db.Index('ix_commands_user_id_executed_at', 'user_id', 'executed_at'),
+        # /api/history pages a workspace's commands newest first
+        db.Index('ix_commands_workspace_executed_at', 'workspace', 'executed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     instruction = db.Column(db.Text, nullable=False)
@@ -88,6 +104,8 @@ class Command(db.Model):
     status = db.Column(db.Integer)  # Exit code
     executed_at = db.Column(db.DateTime, default=datetime.utcnow)
     model_used = db.Column(db.String(64))  # Which AI model was used
+    duration = db.Column(db.Float)  # Seconds
+    workspace = db.Column(db.String(128))  # Workspace (terminal user_id) that ran it
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -0,0 +1,297 @@
+# Traductor compartido de lenguaje natural a comandos de terminal
+#
+# Todas las terminales usan la misma tabla de frases. Las frases se compilan en
+# un trie de palabras y el texto se recorre una sola vez buscando la frase más
+# larga (así "borrar carpeta x" gana a "borrar"); después se extraen los
+# argumentos (nombres de archivo, origen y destino...) de las palabras que
+# siguen a la frase. Solo cuando no hay coincidencia cada llamador recurre a
+# su modelo de IA.
+import re
+import shlex
+import string
+import logging
+import unicodedata
+
+logger = logging.getLogger('nl_translator')
+
+# (frases, plantilla, qué falta si no hay argumento). {0} y {1} son nombres
+# extraídos del texto y {rest} el resto de la instrucción
+COMMAND_RULES = [
+    (('listar', 'lista', 'listar archivos', 'lista archivos', 'mostrar archivos', 'muestra archivos',
+      'ver archivos', 'mostrar directorio', 'archivos', 'dir'), 'ls -la', None),
+    (('archivos ocultos', 'listar ocultos'), 'ls -a', None),
+    (('directorio actual', 'donde estoy'), 'pwd', None),
+    (('fecha', 'fecha actual'), 'date', None),
+    (('hora', 'hora actual'), 'date +%H:%M:%S', None),
+    (('calendario',), 'cal', None),
+    (('quien soy',), 'whoami', None),
+    (('limpiar', 'limpiar pantalla'), 'clear', None),
+    (('sistema', 'informacion del sistema'), 'uname -a', None),
+    (('memoria',), 'free -h', None),
+    (('espacio', 'espacio en disco'), 'df -h', None),
+    (('procesos',), 'ps aux', None),
+    (('crear carpeta', 'crea carpeta', 'crear directorio', 'crea directorio', 'nueva carpeta',
+      'nuevo directorio', 'crear proyecto', 'crea proyecto'), 'mkdir -p {0}', 'el nombre de la carpeta'),
+    (('crear archivo', 'crea archivo', 'crear fichero', 'crea fichero', 'nuevo archivo'),
+     'touch {0}', 'el nombre del archivo'),
+    (('eliminar archivo', 'elimina archivo', 'borrar archivo', 'borra archivo', 'remover archivo',
+      'remueve archivo'), 'rm {0}', 'qué archivo eliminar'),
+    (('eliminar carpeta', 'elimina carpeta', 'borrar carpeta', 'borra carpeta', 'eliminar directorio',
+      'elimina directorio', 'borrar directorio', 'borra directorio', 'eliminar', 'elimina', 'borrar',
+      'borra'), 'rm -r {0}', 'qué elemento eliminar'),
+    (('mostrar contenido', 'muestra contenido', 'ver contenido', 'leer archivo', 'lee archivo',
+      'ver archivo'), 'cat {0}', 'qué archivo mostrar'),
+    (('copiar', 'copia', 'copiar archivo', 'copia archivo'), 'cp {0} {1}', 'el origen y el destino'),
+    (('copiar carpeta', 'copia carpeta', 'copiar directorio', 'copia directorio'),
+     'cp -r {0} {1}', 'el origen y el destino'),
+    (('mover', 'mueve', 'renombrar', 'renombra'), 'mv {0} {1}', 'el origen y el destino'),
+    (('buscar archivo', 'busca archivo', 'encontrar archivo', 'encuentra archivo', 'localizar archivo'),
+     'find . -name {0} -type f', 'qué archivo buscar'),
+    (('buscar texto', 'busca texto'), 'grep -r {rest} .', 'qué texto buscar'),
+]
+
+# Mensajes que no son comandos
+RESPONSE_RULES = [
+    (('hola',), "¡Hola! ¿En qué puedo ayudarte hoy? Puedo ayudarte a ejecutar comandos o a resolver dudas."),
+    (('ayuda',), """Puedo ejecutar comandos como:
+- listar archivos
+- crear directorio [nombre]
+- crear archivo [nombre]
+- mostrar contenido [archivo]
+- eliminar [archivo/directorio]
+- mover [origen] [destino]
+- copiar [origen] [destino]
+- fecha actual
+- procesos
+- memoria
+- espacio en disco"""),
+    (('gracias',), "¡De nada! Estoy aquí para ayudarte."),
+    (('adios',), "¡Hasta luego! Vuelve cuando necesites ayuda."),
+]
+
+# Artículos que no cuentan para reconocer frases ("crea una carpeta" = "crea carpeta")
+STOPWORDS = {'un', 'una', 'unos', 'unas', 'el', 'la', 'los', 'las', 'lo'}
+
+# Palabras que pueden ir entre la frase y sus argumentos
+ARG_FILLERS = STOPWORDS | {
+    'llamado', 'llamada', 'llamados', 'llamadas', 'nombre', 'con', 'de', 'del', 'al', 'a', 'en',
+    'que', 'se', 'llame', 'archivo', 'fichero', 'carpeta', 'directorio', 'hacia', 'como', 'para', 'por',
+    'favor'
+}
+
+# "crear archivo x con contenido ..." escribe el contenido en lugar de crear el archivo vacío
+CONTENT_MARKERS = (('con', 'contenido'), ('con', 'el', 'contenido'), ('con', 'texto'), ('con', 'el', 'texto'))
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|\'([^\']*)\'|`([^`]*)`|(\S+)')
+_NAME_RE = re.compile(r'^[\w\-./]+$')
+_TRAILING_PUNCTUATION = ',;:!?¡¿)('
+
+
+def normalize(word):
+    """Minúsculas y sin tildes: 'Quién' -> 'quien'."""
+    word = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(c for c in word if not unicodedata.combining(c))
+
+
+class _Token:
+    __slots__ = ('key', 'value', 'quoted', 'start')
+
+    def __init__(self, key, value, quoted, start):
+        self.key = key
+        self.value = value
+        self.quoted = quoted
+        self.start = start
+
+
+def _tokenize(text):
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        quoted = match.group(4) is None
+        if quoted:
+            value = next(group for group in match.groups()[:3] if group is not None)
+            tokens.append(_Token(None, value, True, match.start()))
+            continue
+        value = match.group(4).strip(_TRAILING_PUNCTUATION)
+        # Un punto final es puntuación salvo en nombres como "index.html"
+        key = normalize(value).rstrip('.')
+        if value:
+            tokens.append(_Token(key, value, False, match.start()))
+    return tokens
+
+
+class _Rule:
+    __slots__ = ('phrase', 'template', 'fields', 'missing', 'response')
+
+    def __init__(self, phrase, template=None, missing=None, response=None):
+        self.phrase = phrase
+        self.template = template
+        self.fields = [field for _, field, _, _ in string.Formatter().parse(template or '') if field is not None]
+        self.missing = missing
+        self.response = response
+
+
+class NLTranslator:
+    """Traductor de instrucciones a comandos basado en un trie de frases."""
+
+    def __init__(self, command_rules=COMMAND_RULES, response_rules=RESPONSE_RULES):
+        self.trie = {}
+        self.phrases = 0
+        for phrases, template, missing in command_rules:
+            for phrase in phrases:
+                self._add(phrase, _Rule(phrase, template=template, missing=missing))
+        for phrases, response in response_rules:
+            for phrase in phrases:
+                self._add(phrase, _Rule(phrase, response=response))
+
+    def _add(self, phrase, rule):
+        node = self.trie
+        for word in normalize(phrase).split():
+            if word in STOPWORDS:
+                continue
+            node = node.setdefault(word, {})
+        if None in node:
+            raise ValueError(f"Frase duplicada: '{phrase}'")
+        node[None] = rule
+        self.phrases += 1
+
+    def _longest_match(self, tokens):
+        """(regla, índice del token siguiente a la frase) de la frase más larga."""
+        # Índices de las palabras que cuentan para las frases
+        words = [i for i, token in enumerate(tokens) if token.key and token.key not in STOPWORDS]
+        best = None
+        best_length = 0
+        for start in range(len(words)):
+            node = self.trie
+            for offset in range(start, len(words)):
+                node = node.get(tokens[words[offset]].key)
+                if node is None:
+                    break
+                length = offset - start + 1
+                if None in node and length > best_length:
+                    best = (node[None], words[offset] + 1)
+                    best_length = length
+        return best
+
+    @staticmethod
+    def _arguments(tokens, position, count):
+        """Argumentos tras la frase y posición del token siguiente al último.
+
+        Las palabras de relleno se saltan; las de una sola letra ("a") solo si
+        después quedan suficientes nombres, así "copiar a b" copia "a" en "b"
+        y "mover x a y" mueve "x" a "y".
+        """
+        args = []
+        while position < len(tokens) and len(args) < count:
+            token = tokens[position]
+            position += 1
+            if token.quoted:
+                args.append(token.value)
+            elif token.key in ARG_FILLERS:
+                if len(token.key) == 1 and _NAME_RE.match(token.value):
+                    names = sum(1 for later in tokens[position:]
+                                if later.quoted or (later.key not in ARG_FILLERS and _NAME_RE.match(later.value)))
+                    if names < count - len(args):
+                        args.append(token.value)
+                continue
+            elif _NAME_RE.match(token.value):
+                args.append(token.value)
+            else:
+                break
+        return args, position
+
+    @staticmethod
+    def _inside_workspace(arg):
+        """False para '.', '..', rutas absolutas y rutas con '..': "elimina ." no debe ser `rm -r .`."""
+        parts = arg.split('/')
+        return not arg.startswith('/') and '..' not in parts and any(part not in ('', '.') for part in parts)
+
+    @staticmethod
+    def _has_extra_words(tokens, position, end):
+        """True si entre position y end queda algo que no es relleno."""
+        return any(token.quoted or token.key not in ARG_FILLERS for token in tokens[position:end])
+
+    def translate(self, text):
+        """Traduce una instrucción.
+
+        Devuelve un dict con `command` (o None), `response` para mensajes que
+        no son comandos, `missing` si falta un argumento, y la `phrase` y los
+        `args` reconocidos; o None si nada coincide, que es cuando cada
+        llamador recurre a su modelo de IA.
+        """
+        tokens = _tokenize(text or '')
+        match = self._longest_match(tokens)
+        if match is None:
+            return None
+
+        rule, position = match
+        result = {'command': None, 'response': rule.response, 'missing': None,
+                  'phrase': rule.phrase, 'args': []}
+        if rule.response is not None:
+            return result
+
+        if 'rest' in rule.fields:
+            while position < len(tokens) and not tokens[position].quoted and tokens[position].key in ARG_FILLERS:
+                position += 1
+            rest = text[tokens[position].start:].strip() if position < len(tokens) else ''
+            rest = rest.strip('"\'`')
+            if not rest:
+                result['missing'] = f"Falta especificar {rule.missing}"
+                return result
+            result['args'] = [rest]
+            result['command'] = rule.template.format(rest=shlex.quote(rest))
+            return result
+
+        args, after = self._arguments(tokens, position, len(rule.fields))
+        values = [shlex.quote(arg) for arg in args]
+        if len(args) < len(rule.fields):
+            result['missing'] = f"Falta especificar {rule.missing}"
+            result['args'] = args
+            return result
+
+        result['args'] = args
+        if not all(self._inside_workspace(arg) for arg in args):
+            result['missing'] = f"Indica {rule.missing} con una ruta dentro del workspace"
+            return result
+        content = None
+        if rule.template.startswith('touch '):
+            content = self._content(tokens, after)
+        # "crear carpeta mi proyecto": sin comillas no se sabe dónde acaba el
+        # nombre; mejor pedirlo que crear "mi" en silencio
+        extra_end = content[0] if content else len(tokens)
+        if rule.fields and self._has_extra_words(tokens, after, extra_end):
+            result['missing'] = (f"Hay más palabras de las esperadas en {rule.missing}; "
+                                 f"escribe entre comillas los nombres con espacios")
+            return result
+
+        result['command'] = rule.template.format(*values)
+        if content:
+            body = text[tokens[content[1]].start:].strip()
+            if len(body) > 1 and body[0] == body[-1] and body[0] in '"\'`':
+                body = body[1:-1]
+            result['command'] = f"echo {shlex.quote(body)} > {values[0]}"
+        return result
+
+    @staticmethod
+    def _content(tokens, position):
+        """(índice del marcador, índice del contenido) de "con contenido ...", o None."""
+        keys = [token.key for token in tokens]
+        for i in range(position, len(tokens)):
+            for marker in CONTENT_MARKERS:
+                end = i + len(marker)
+                if tuple(keys[i:end]) == marker and end < len(tokens):
+                    return i, end
+        return None
+
+
+translator = NLTranslator()
+
+
+def translate(text):
+    """Traduce una instrucción con el traductor compartido (ver NLTranslator.translate)."""
+    return translator.translate(text)
+
+
+def nl_to_command(text):
+    """Comando para la instrucción, o None si no se reconoce o falta un argumento."""
+    result = translator.translate(text)
+    return result['command'] if result else None
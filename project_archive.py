@@ -0,0 +1,327 @@
+# Caché de archivos ZIP para proyectos generados
+import io
+import os
+import time
+import zlib
+import struct
+import hashlib
+import logging
+import zipfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Estructuras del formato ZIP (mismos layouts que usa zipfile)
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_MAX_ENTRIES = 0xFFFF
+_CHUNK_SIZE = 1024 * 1024
+_UTF8_FLAG = 0x800
+
+# Por debajo de estos umbrales la compresión en serie es más rápida que repartirla
+PARALLEL_MIN_FILES = int(os.environ.get('ARCHIVE_PARALLEL_MIN_FILES', 64))
+PARALLEL_MIN_BYTES = int(os.environ.get('ARCHIVE_PARALLEL_MIN_BYTES', 8 * 1024 * 1024))
+ARCHIVE_WORKERS = int(os.environ.get('ARCHIVE_WORKERS', os.cpu_count() or 1))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ZipLimitExceeded(Exception):
+    """El archivo necesita extensiones ZIP64."""
+
+
+def _dos_datetime(mtime):
+    """Convierte un mtime a la pareja (hora, fecha) en formato DOS."""
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def scan_project(project_dir, arc_prefix=''):
+    """Devuelve {arcname: (ruta, mtime_ns, tamaño, modo)} para los archivos del proyecto."""
+    entries = {}
+    for root, dirs, files in os.walk(project_dir):
+        dirs.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            arcname = os.path.relpath(file_path, project_dir).replace(os.sep, '/')
+            if arc_prefix:
+                arcname = f"{arc_prefix}/{arcname}"
+            entries[arcname] = (file_path, st.st_mtime_ns, st.st_size, st.st_mode)
+    return entries
+
+
+def fingerprint(entries):
+    """Huella del contenido del proyecto a partir de nombres, mtimes y tamaños."""
+    digest = hashlib.sha1()
+    for arcname, (_, mtime_ns, size, _) in sorted(entries.items()):
+        digest.update(f"{arcname}\0{mtime_ns}\0{size}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def compress_file(file_path):
+    """Comprime un archivo con deflate crudo y devuelve (crc, tamaño, bytes comprimidos)."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    crc = 0
+    size = 0
+    chunks = []
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            chunks.append(compressor.compress(chunk))
+    chunks.append(compressor.flush())
+    return crc, size, b''.join(chunks)
+
+
+def _get_executor():
+    """Pool de procesos compartido para comprimir miembros en paralelo."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=ARCHIVE_WORKERS)
+        return _executor
+
+
+def compress_members(members, max_workers=None):
+    """Comprime [(arcname, ruta, tamaño)] y devuelve {arcname: (crc, tamaño, datos)}.
+
+    Los lotes grandes se reparten en el pool de procesos; los pequeños se
+    comprimen en el proceso actual para no pagar el coste de IPC.
+    """
+    workers = ARCHIVE_WORKERS if max_workers is None else max_workers
+    total_bytes = sum(size for _, _, size in members)
+    parallel = workers > 1 and (len(members) >= PARALLEL_MIN_FILES or total_bytes >= PARALLEL_MIN_BYTES)
+
+    if not parallel:
+        return {arcname: compress_file(file_path) for arcname, file_path, _ in members}
+
+    if max_workers is None:
+        executor = _get_executor()
+        own_executor = False
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        own_executor = True
+
+    try:
+        paths = [file_path for _, file_path, _ in members]
+        chunksize = max(1, len(paths) // (workers * 4))
+        results = executor.map(compress_file, paths, chunksize=chunksize)
+        return {arcname: result for (arcname, _, _), result in zip(members, results)}
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def write_zip(out, entries, compressed, previous=None, old_zip=None):
+    """Escribe un ZIP en `out` y devuelve el índice de sus miembros.
+
+    Los miembros presentes en `compressed` se escriben con esos datos; el resto
+    se copia ya comprimido de `old_zip` usando las posiciones de `previous`. El
+    directorio central se ensambla al final, una vez conocidos todos los offsets.
+    """
+    members = {}
+    central = []
+    base_offset = out.tell()
+
+    for arcname, (file_path, mtime_ns, size, mode) in entries.items():
+        if arcname in compressed:
+            crc, file_size, data = compressed[arcname]
+            dos_time, dos_date = _dos_datetime(mtime_ns / 1e9)
+        else:
+            member = previous[arcname]
+            crc, file_size = member['crc'], member['size']
+            dos_time, dos_date = member['dos_time'], member['dos_date']
+            old_zip.seek(member['data_offset'])
+            data = old_zip.read(member['compress_size'])
+
+        header_offset = out.tell() - base_offset
+        if file_size >= _ZIP32_LIMIT or header_offset + len(data) >= _ZIP32_LIMIT:
+            raise ZipLimitExceeded(arcname)
+
+        name = arcname.encode('utf-8')
+        flags = 0 if arcname.isascii() else _UTF8_FLAG
+        out.write(_LOCAL_HEADER.pack(
+            b'PK\003\004', 20, 0, flags, zipfile.ZIP_DEFLATED,
+            dos_time, dos_date, crc, len(data), file_size, len(name), 0
+        ))
+        out.write(name)
+        data_offset = out.tell() - base_offset
+        out.write(data)
+
+        central.append(_CENTRAL_HEADER.pack(
+            b'PK\001\002', 20, 3, 20, 0, flags, zipfile.ZIP_DEFLATED,
+            dos_time, dos_date, crc, len(data), file_size, len(name),
+            0, 0, 0, 0, (mode & 0xFFFF) << 16, header_offset
+        ) + name)
+
+        members[arcname] = {
+            'mtime_ns': mtime_ns,
+            'size': file_size,
+            'crc': crc,
+            'compress_size': len(data),
+            'dos_time': dos_time,
+            'dos_date': dos_date,
+            'data_offset': data_offset
+        }
+
+    central_offset = out.tell() - base_offset
+    central_data = b''.join(central)
+    out.write(central_data)
+    out.write(_END_RECORD.pack(
+        b'PK\005\006', 0, 0, len(central), len(central),
+        len(central_data), central_offset, 0
+    ))
+    return members
+
+
+def _needs_zip64(entries):
+    total_size = sum(entry[2] for entry in entries.values())
+    return total_size >= _ZIP32_LIMIT or len(entries) >= _ZIP32_MAX_ENTRIES
+
+
+def _write_zip64(out, entries):
+    """Construcción completa con zipfile para archivos que superan los límites de ZIP32."""
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
+        for arcname, entry in entries.items():
+            zipf.write(entry[0], arcname)
+
+
+class ProjectArchiveCache:
+    """Mantiene los ZIP de los proyectos sincronizados con su contenido.
+
+    Cada archivo se identifica por (mtime, tamaño). Si la huella del proyecto no
+    cambió se reutiliza el ZIP existente; si cambió, solo se recomprimen los
+    miembros modificados y el resto se copia ya comprimido del ZIP anterior.
+    """
+
+    def __init__(self):
+        self.archives = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _get_lock(self, zip_path):
+        with self._locks_guard:
+            if zip_path not in self._locks:
+                self._locks[zip_path] = threading.Lock()
+            return self._locks[zip_path]
+
+    def invalidate(self, zip_path):
+        """Olvida el índice de un ZIP (la próxima construcción será completa)."""
+        self.archives.pop(os.path.abspath(zip_path), None)
+
+    def build(self, project_dir, zip_path):
+        """Crea o actualiza el ZIP del proyecto y devuelve su ruta."""
+        zip_path = os.path.abspath(zip_path)
+        with self._get_lock(zip_path):
+            entries = scan_project(project_dir)
+            project_hash = fingerprint(entries)
+
+            cached = self.archives.get(zip_path)
+            if cached and cached['fingerprint'] == project_hash and self._is_current(cached, zip_path):
+                logging.debug(f"ZIP reutilizado sin cambios: {zip_path}")
+                return zip_path
+
+            previous = cached['members'] if cached and self._is_current(cached, zip_path) else {}
+            members = self._write_archive(entries, zip_path, previous)
+
+            if members is None:
+                self.archives.pop(zip_path, None)
+            else:
+                self.archives[zip_path] = {
+                    'fingerprint': project_hash,
+                    'members': members,
+                    'zip_mtime_ns': os.stat(zip_path).st_mtime_ns
+                }
+            return zip_path
+
+    def _is_current(self, cached, zip_path):
+        try:
+            return os.stat(zip_path).st_mtime_ns == cached['zip_mtime_ns']
+        except OSError:
+            return False
+
+    def _write_archive(self, entries, zip_path, previous):
+        """Escribe el ZIP reutilizando los miembros sin cambios de `previous`."""
+        tmp_path = f"{zip_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if _needs_zip64(entries):
+                with open(tmp_path, 'wb') as out:
+                    _write_zip64(out, entries)
+                os.replace(tmp_path, zip_path)
+                return None
+
+            changed = [
+                (arcname, entry[0], entry[2]) for arcname, entry in entries.items()
+                if not _is_unchanged(previous.get(arcname), entry)
+            ]
+            compressed = compress_members(changed)
+
+            reused = len(entries) - len(changed)
+            logging.info(f"Actualizando ZIP {os.path.basename(zip_path)}: "
+                         f"{len(changed)} miembros comprimidos, {reused} reutilizados")
+
+            old_zip = open(zip_path, 'rb') if reused else None
+            try:
+                with open(tmp_path, 'wb') as out:
+                    members = write_zip(out, entries, compressed, previous, old_zip)
+            except ZipLimitExceeded:
+                with open(tmp_path, 'wb') as out:
+                    _write_zip64(out, entries)
+                members = None
+            finally:
+                if old_zip:
+                    old_zip.close()
+
+            os.replace(tmp_path, zip_path)
+            return members
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _is_unchanged(member, entry):
+    return member is not None and member['mtime_ns'] == entry[1] and member['size'] == entry[2]
+
+
+# Instancia global de la caché de archivos
+archive_cache = ProjectArchiveCache()
+
+
+def build_project_archive(project_dir, zip_path):
+    """Crea o actualiza el ZIP de un proyecto usando la caché global."""
+    return archive_cache.build(project_dir, zip_path)
+
+
+def build_directory_archive(directory, arc_prefix='', max_workers=None):
+    """Comprime un directorio completo en memoria y devuelve un BytesIO listo para enviar."""
+    entries = scan_project(directory, arc_prefix)
+    memory_file = io.BytesIO()
+
+    if _needs_zip64(entries):
+        _write_zip64(memory_file, entries)
+    else:
+        members = [(arcname, entry[0], entry[2]) for arcname, entry in entries.items()]
+        compressed = compress_members(members, max_workers)
+        try:
+            write_zip(memory_file, entries, compressed)
+        except ZipLimitExceeded:
+            memory_file = io.BytesIO()
+            _write_zip64(memory_file, entries)
+
+    memory_file.seek(0)
+    return memory_file
@@ -0,0 +1,143 @@
+# Manifiestos en memoria de los proyectos generados por el constructor
+import os
+import hashlib
+import logging
+import threading
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path):
+    """SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_entry(file_path, previous=None):
+    """Metadatos de un archivo; reutiliza el hash si mtime y tamaño no cambiaron."""
+    st = os.stat(file_path)
+    if previous and previous['mtime_ns'] == st.st_mtime_ns and previous['size'] == st.st_size:
+        return previous
+    return {
+        'size': st.st_size,
+        'modified': st.st_mtime,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': hash_file(file_path)
+    }
+
+
+class ProjectManifestCache:
+    """Manifiesto por proyecto: {ruta relativa: tamaño, fecha y hash}.
+
+    Se construye una vez recorriendo el proyecto y después se mantiene con las
+    escrituras de la generación y los eventos del observador de archivos, de
+    modo que la vista previa no necesita tocar el disco.
+    """
+
+    def __init__(self, projects_dir):
+        self.projects_dir = os.path.abspath(projects_dir)
+        self.manifests = {}
+        self._lock = threading.RLock()
+
+    def _project_dir(self, project_id):
+        return os.path.join(self.projects_dir, project_id)
+
+    def rebuild(self, project_id):
+        """Recorre el proyecto y actualiza su manifiesto (solo rehashea lo que cambió)."""
+        project_dir = self._project_dir(project_id)
+        with self._lock:
+            previous = self.manifests.get(project_id, {})
+        manifest = {}
+        for root, dirs, files in os.walk(project_dir):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                rel_path = os.path.relpath(file_path, project_dir).replace(os.sep, '/')
+                try:
+                    manifest[rel_path] = _file_entry(file_path, previous.get(rel_path))
+                except OSError as e:
+                    logging.debug(f"No se pudo leer {file_path} para el manifiesto: {str(e)}")
+        with self._lock:
+            self.manifests[project_id] = manifest
+        return manifest
+
+    def get(self, project_id, refresh=False):
+        """Manifiesto del proyecto (lo construye la primera vez)."""
+        with self._lock:
+            manifest = self.manifests.get(project_id)
+        if manifest is None or refresh:
+            manifest = self.rebuild(project_id)
+        return manifest
+
+    def update_file(self, project_id, rel_path):
+        """Actualiza la entrada de un archivo tras escribirlo."""
+        rel_path = rel_path.replace(os.sep, '/')
+        file_path = os.path.join(self._project_dir(project_id), rel_path)
+        with self._lock:
+            manifest = self.manifests.get(project_id)
+            if manifest is None:
+                return
+            previous = manifest.get(rel_path)
+        try:
+            entry = _file_entry(file_path, previous)
+        except OSError:
+            self.remove_file(project_id, rel_path)
+            return
+        with self._lock:
+            manifest = self.manifests.get(project_id)
+            if manifest is not None:
+                manifest[rel_path] = entry
+
+    def remove_file(self, project_id, rel_path):
+        """Elimina un archivo (o todo lo que cuelga de un directorio) del manifiesto."""
+        rel_path = rel_path.replace(os.sep, '/')
+        prefix = rel_path.rstrip('/') + '/'
+        with self._lock:
+            manifest = self.manifests.get(project_id)
+            if manifest is None:
+                return
+            for path in [p for p in manifest if p == rel_path or p.startswith(prefix)]:
+                del manifest[path]
+
+    def invalidate(self, project_id):
+        """Descarta el manifiesto; se reconstruirá en el próximo acceso."""
+        with self._lock:
+            self.manifests.pop(project_id, None)
+
+    def _locate(self, path):
+        """Convierte una ruta absoluta en (project_id, ruta relativa) o None."""
+        path = os.path.abspath(path)
+        if not path.startswith(self.projects_dir + os.sep):
+            return None
+        parts = os.path.relpath(path, self.projects_dir).split(os.sep)
+        if len(parts) < 2:
+            return None
+        return parts[0], '/'.join(parts[1:])
+
+    def handle_event(self, event_type, src_path, dest_path=None, is_directory=False):
+        """Aplica un evento del observador (watchdog) a los manifiestos en caché."""
+        source = self._locate(src_path)
+        if source:
+            project_id, rel_path = source
+            if event_type in ('deleted', 'moved'):
+                self.remove_file(project_id, rel_path)
+            elif is_directory:
+                # Un directorio nuevo puede llegar ya con contenido (p. ej. un mv)
+                if event_type == 'created':
+                    self.invalidate(project_id)
+            else:
+                self.update_file(project_id, rel_path)
+
+        if event_type == 'moved' and dest_path:
+            destination = self._locate(dest_path)
+            if destination:
+                if is_directory:
+                    self.invalidate(destination[0])
+                else:
+                    self.update_file(*destination)
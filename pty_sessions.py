@@ -0,0 +1,250 @@
+# Sesiones de shell persistentes respaldadas por un PTY, una por terminal
+#
+# Un PTY es un shell interactivo: las teclas llegan sin pasar por
+# command_policy, que valida líneas completas. Por eso están desactivadas salvo
+# que se activen explícitamente con PTY_ENABLED=1, y el shell arranca con un
+# entorno mínimo (sin claves de API ni DATABASE_URL del servidor).
+import os
+import pty
+import time
+import fcntl
+import errno
+import struct
+import signal
+import select
+import logging
+import termios
+import threading
+import subprocess
+from collections import OrderedDict
+
+logger = logging.getLogger('pty_sessions')
+
+PTY_ENABLED = os.environ.get('PTY_ENABLED', '0') == '1'
+PTY_SHELL = os.environ.get('PTY_SHELL', '/bin/bash' if os.path.exists('/bin/bash') else '/bin/sh')
+PTY_MAX_SESSIONS = int(os.environ.get('PTY_MAX_SESSIONS', 32))
+PTY_IDLE_TIMEOUT = int(os.environ.get('PTY_IDLE_TIMEOUT', 15 * 60))
+PTY_REAP_INTERVAL = 30
+
+_READ_SIZE = 64 * 1024
+_DEFAULT_PATH = '/usr/local/bin:/usr/bin:/bin'
+
+
+def session_env(cwd):
+    """Entorno mínimo del shell: nada del entorno del servidor salvo PATH y LANG."""
+    return {
+        'PATH': os.environ.get('PATH', _DEFAULT_PATH),
+        'HOME': str(cwd),
+        'TERM': 'xterm-256color',
+        'LANG': os.environ.get('LANG', 'C.UTF-8'),
+    }
+
+
+class PtySession:
+    """Un shell interactivo de larga duración conectado a un pseudo-terminal."""
+
+    def __init__(self, terminal_id, user_id, cwd, on_output=None, on_exit=None, rows=24, cols=80):
+        self.terminal_id = terminal_id
+        self.user_id = user_id
+        self.cwd = str(cwd)
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.last_activity = time.monotonic()
+        self.closed = False
+
+        master_fd, slave_fd = pty.openpty()
+        self._set_size(slave_fd, rows, cols)
+
+        try:
+            self.process = subprocess.Popen(
+                [PTY_SHELL, '-i'],
+                stdin=slave_fd,
+                stdout=slave_fd,
+                stderr=slave_fd,
+                cwd=self.cwd,
+                env=session_env(self.cwd),
+                start_new_session=True,
+                close_fds=True
+            )
+        finally:
+            os.close(slave_fd)
+
+        self.master_fd = master_fd
+        self._reader = threading.Thread(target=self._read_loop, daemon=True,
+                                        name=f"pty-{terminal_id}")
+        self._reader.start()
+
+    @staticmethod
+    def _set_size(fd, rows, cols):
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+
+    def _read_loop(self):
+        while not self.closed:
+            try:
+                ready, _, _ = select.select([self.master_fd], [], [], 1.0)
+                if not ready:
+                    if self.process.poll() is not None:
+                        break
+                    continue
+                data = os.read(self.master_fd, _READ_SIZE)
+            except OSError as e:
+                # EIO indica que el shell cerró el extremo esclavo
+                if e.errno not in (errno.EIO, errno.EBADF):
+                    logger.warning(f"Error leyendo PTY {self.terminal_id}: {str(e)}")
+                break
+            if not data:
+                break
+            self.last_activity = time.monotonic()
+            if self.on_output:
+                try:
+                    self.on_output(self, data.decode('utf-8', errors='replace'))
+                except Exception as e:
+                    logger.warning(f"Error enviando salida del PTY {self.terminal_id}: {str(e)}")
+
+        if not self.closed and self.on_exit:
+            try:
+                self.on_exit(self, self.process.poll())
+            except Exception as e:
+                logger.warning(f"Error notificando cierre del PTY {self.terminal_id}: {str(e)}")
+
+    def is_alive(self):
+        return not self.closed and self.process.poll() is None
+
+    def write(self, data):
+        """Envía entrada (teclas o texto) al shell."""
+        self.last_activity = time.monotonic()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        while data:
+            written = os.write(self.master_fd, data)
+            data = data[written:]
+
+    def resize(self, rows, cols):
+        self._set_size(self.master_fd, rows, cols)
+        try:
+            os.killpg(self.process.pid, signal.SIGWINCH)
+        except OSError:
+            pass
+
+    def close(self):
+        """Termina el shell (y sus procesos hijos) y libera el PTY."""
+        if self.closed:
+            return
+        self.closed = True
+        for sig in (signal.SIGHUP, signal.SIGKILL):
+            try:
+                os.killpg(self.process.pid, sig)
+            except OSError:
+                break
+            try:
+                self.process.wait(timeout=1)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+
+
+class PtySessionManager:
+    """Mantiene un shell por terminal_id con límite global (LRU) y expiración por inactividad."""
+
+    def __init__(self, max_sessions=PTY_MAX_SESSIONS, idle_timeout=PTY_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def get(self, terminal_id):
+        with self._lock:
+            session = self.sessions.get(terminal_id)
+            if session is not None:
+                self.sessions.move_to_end(terminal_id)
+            return session
+
+    def open(self, terminal_id, user_id, cwd, on_output=None, on_exit=None, rows=24, cols=80):
+        """Devuelve la sesión del terminal, creándola si no existe o si su shell terminó.
+
+        Devuelve (sesión, creada). Si se alcanza el límite de sesiones se cierra
+        la menos usada recientemente.
+        """
+        evicted = []
+        with self._lock:
+            session = self.sessions.get(terminal_id)
+            if session is not None and session.is_alive():
+                session.on_output = on_output or session.on_output
+                session.on_exit = on_exit or session.on_exit
+                self.sessions.move_to_end(terminal_id)
+                return session, False
+
+            if session is not None:
+                evicted.append(self.sessions.pop(terminal_id))
+
+            while len(self.sessions) >= self.max_sessions:
+                _, oldest = self.sessions.popitem(last=False)
+                logger.info(f"Límite de sesiones PTY alcanzado, cerrando {oldest.terminal_id}")
+                evicted.append(oldest)
+
+            session = PtySession(terminal_id, user_id, cwd, on_output, on_exit, rows, cols)
+            self.sessions[terminal_id] = session
+
+        for old in evicted:
+            old.close()
+        self._ensure_reaper()
+        return session, True
+
+    def close(self, terminal_id, session=None):
+        """Cierra la sesión del terminal.
+
+        Con session, solo se quita del registro si sigue siendo la sesión del
+        terminal: el aviso de salida tardío de un shell antiguo no debe cerrar
+        el que lo reemplazó.
+        """
+        with self._lock:
+            current = self.sessions.get(terminal_id)
+            if current is not None and (session is None or current is session):
+                del self.sessions[terminal_id]
+                removed = True
+            else:
+                removed = False
+        target = session if session is not None else current
+        if target is not None:
+            target.close()
+        return removed
+
+    def reap_idle(self):
+        """Cierra las sesiones inactivas o cuyo shell ya terminó."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                terminal_id for terminal_id, session in self.sessions.items()
+                if not session.is_alive() or now - session.last_activity > self.idle_timeout
+            ]
+            sessions = [self.sessions.pop(terminal_id) for terminal_id in expired]
+        for session in sessions:
+            logger.info(f"Cerrando sesión PTY inactiva: {session.terminal_id}")
+            session.close()
+        return len(sessions)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True, name='pty-reaper')
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(PTY_REAP_INTERVAL)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"Error al limpiar sesiones PTY: {str(e)}")
+            with self._lock:
+                if not self.sessions:
+                    self._reaper = None
+                    return
+
+
+# Instancia global del gestor de sesiones
+pty_manager = PtySessionManager()
@@ -3,8 +3,9 @@ import os
 import json
 import logging
 from flask import request, jsonify
-import subprocess
 from pathlib import Path
+from command_executor import command_executor, ExecutorBusy
+from workspace_tree import tree_index
 
 # Configurar logging
 logging.basicConfig(
@@ -43,31 +44,31 @@ def register_terminal_routes(app):
             # Obtener el workspace del usuario
             workspace_path = get_user_workspace(user_id)
             
-            # Ejecutar el comando
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                cwd=str(workspace_path),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            stdout, stderr = process.communicate()
+            # Ejecutar el comando (con límite de tiempo y de concurrencia)
+            result = command_executor.run(command, workspace_path, user_id=user_id,
+                                          job_id=data.get('job_id'))
             
             # Preparar la respuesta
             response = {
-                'success': process.returncode == 0,
-                'stdout': stdout,
-                'stderr': stderr,
-                'exitCode': process.returncode,
+                'success': result['success'],
+                'stdout': result['stdout'],
+                'stderr': result['stderr'],
+                'exitCode': result['returncode'],
+                'job_id': result['job_id'],
+                'cancelled': result.get('cancelled', False),
+                'truncated': result.get('truncated', False),
                 'workspace': str(workspace_path.relative_to(Path.cwd())),
                 'currentDir': os.path.basename(workspace_path)
             }
             
-            logging.debug(f"Comando ejecutado: '{command}', código: {process.returncode}")
+            logging.debug(f"Comando ejecutado: '{command}', código: {result['returncode']}")
             return jsonify(response)
             
+        except ExecutorBusy as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 503
         except Exception as e:
             logging.error(f"Error al ejecutar comando: {str(e)}")
             return jsonify({
@@ -104,25 +105,26 @@ def register_terminal_routes(app):
                 
             # Listar contenido
             items = []
-            for item in os.listdir(target_dir):
-                item_path = target_dir / item
+            for entry in tree_index.list_directory(target_dir):
+                item = entry['name']
                 
-                if item_path.is_dir():
+                if entry['is_directory']:
                     items.append({
                         'name': item,
                         'path': str(Path(relative_dir) / item),
                         'type': 'directory',
                         'size': 0,
-                        'modified': os.path.getmtime(item_path)
+                        'modified': entry['modified']
                     })
                 else:
+                    suffix = Path(item).suffix
                     items.append({
                         'name': item,
                         'path': str(Path(relative_dir) / item),
                         'type': 'file',
-                        'size': os.path.getsize(item_path),
-                        'modified': os.path.getmtime(item_path),
-                        'extension': item_path.suffix[1:] if item_path.suffix else ''
+                        'size': entry['size'],
+                        'modified': entry['modified'],
+                        'extension': suffix[1:] if suffix else ''
                     })
                     
             return jsonify({
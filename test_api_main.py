@@ -78,12 +78,38 @@ def test_list_files():
         print("Respuesta no es JSON:", response.text[:200])
         return False
 
+def test_list_tree():
+    """Prueba el listado recursivo por páginas: las páginas juntas deben dar el árbol completo"""
+
+    full = requests.get(f"{BASE_URL}/api/files/tree", params={"depth": 5, "limit": 5000})
+
+    print("\n=== Test de árbol de archivos ===")
+    print(f"Código de respuesta: {full.status_code}")
+    try:
+        expected = [item["path"] for item in full.json()["files"]]
+        paths, cursor = [], None
+        while True:
+            params = {"depth": 5, "limit": 10}
+            if cursor:
+                params["cursor"] = cursor
+            page = requests.get(f"{BASE_URL}/api/files/tree", params=params).json()
+            paths.extend(item["path"] for item in page["files"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+        print(f"Entradas: {len(expected)}, páginas de 10 coinciden: {paths == expected}")
+        return full.status_code == 200 and paths == expected
+    except Exception as e:
+        print("Error en la respuesta:", str(e), full.text[:200])
+        return False
+
 if __name__ == "__main__":
     # Ejecutar las pruebas
     results = []
     results.append(("Ejecución de comandos", test_execute_command()))
     results.append(("Creación de archivos", test_create_file()))
     results.append(("Listado de archivos", test_list_files()))
+    results.append(("Árbol de archivos", test_list_tree()))
     
     # Mostrar resumen
     print("\n=== Resumen de pruebas ===")
@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from main import FileSystemManager
+from command_executor import command_executor, CommandExecutor
+
+WORKSPACE_PREFIX = "concurrency_test_"
+
+
+class EventRecorder:
+    """Sustituto de socketio que solo guarda los eventos emitidos."""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data, room=None):
+        self.events.append((event, room))
+
+
+def run_command(manager, index, workspaces):
+    user_id = f"{WORKSPACE_PREFIX}{index % workspaces}"
+    command = f"pwd && touch marker_{index}.txt"
+    result = manager.execute_command(command, user_id=user_id, notify=False)
+    return index, user_id, result
+
+
+def check_isolation(results, workspaces):
+    """Cada comando debe ejecutarse en su workspace y solo dejar ahí su marcador."""
+    errors = []
+    for index, user_id, result in results:
+        expected_dir = os.path.realpath(os.path.join("user_workspaces", user_id))
+        if not result['success']:
+            errors.append(f"#{index}: falló ({result['output'].strip()})")
+        elif result['output'].strip() != expected_dir:
+            errors.append(f"#{index}: se ejecutó en {result['output'].strip()} en lugar de {expected_dir}")
+
+    for workspace in range(workspaces):
+        user_id = f"{WORKSPACE_PREFIX}{workspace}"
+        try:
+            markers = {f for f in os.listdir(os.path.join("user_workspaces", user_id)) if f.startswith("marker_")}
+        except FileNotFoundError:
+            errors.append(f"{user_id}: el workspace no existe (¿se creó en otro directorio?)")
+            continue
+        expected = {f"marker_{index}.txt" for index, uid, _ in results if uid == user_id}
+        if markers != expected:
+            errors.append(f"{user_id}: marcadores inesperados {sorted(markers ^ expected)[:5]}")
+    return errors
+
+
+class LimitSampler:
+    """Muestrea cuántos comandos ejecuta el ejecutor a la vez (en total y por usuario)."""
+
+    def __init__(self, executor, interval=0.001):
+        self.executor = executor
+        self.interval = interval
+        self.peak = 0
+        self.peak_per_user = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.executor._cond:
+                self.peak = max(self.peak, self.executor.running)
+                self.peak_per_user = max([self.peak_per_user, *self.executor.running_per_user.values()])
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def errors(self):
+        errors = []
+        if self.peak > self.executor.max_concurrent:
+            errors.append(f"{self.peak} comandos a la vez (máximo {self.executor.max_concurrent})")
+        if self.peak_per_user > self.executor.per_user:
+            errors.append(f"{self.peak_per_user} comandos de un usuario a la vez (máximo {self.executor.per_user})")
+        return errors
+
+
+def run_batch(commands, workspaces, workers):
+    manager = FileSystemManager(EventRecorder())
+    start = time.perf_counter()
+    if workers == 1:
+        results = [run_command(manager, i, workspaces) for i in range(commands)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda i: run_command(manager, i, workspaces), range(commands)))
+    return results, time.perf_counter() - start
+
+
+def cleanup(workspaces):
+    for workspace in range(workspaces):
+        shutil.rmtree(os.path.join("user_workspaces", f"{WORKSPACE_PREFIX}{workspace}"), ignore_errors=True)
+
+
+def concurrency_errors(commands=400, workspaces=40, workers=32):
+    """Ejecuta cientos de comandos en paralelo sobre muchos workspaces; devuelve los errores."""
+    print("\n=== Test de ejecución concurrente de comandos ===")
+    original_cwd = os.getcwd()
+    all_errors = []
+    try:
+        for label, pool_size in (("secuencial", 1), (f"{workers} hilos", workers)):
+            cleanup(workspaces)
+            with LimitSampler(command_executor) as sampler:
+                results, elapsed = run_batch(commands, workspaces, pool_size)
+            errors = check_isolation(results, workspaces) + sampler.errors()
+            print(f"{label:<12} {commands} comandos en {elapsed:.2f}s ({commands / elapsed:.0f} comandos/s), "
+                  f"máximo simultáneos: {sampler.peak}, errores: {len(errors)}")
+            for error in errors[:10]:
+                print(f"  - {error}")
+            all_errors.extend(errors)
+
+        if os.getcwd() != original_cwd:
+            all_errors.append(f"El directorio del proceso cambió: {os.getcwd()}")
+    finally:
+        cleanup(workspaces)
+    return all_errors
+
+
+def fifo_errors(waiting=8):
+    """Con un solo hueco, los comandos en cola deben arrancar en orden de llegada."""
+    print("\n=== Test de orden FIFO de la cola ===")
+    executor = CommandExecutor(max_concurrent=1, per_user=1, timeout=30)
+    workdir = tempfile.mkdtemp(prefix="fifo_test_")
+    positions = {}
+    threads = []
+    try:
+        blocker = threading.Thread(target=executor.run, args=("sleep 0.5", workdir), kwargs={'user_id': 'fifo'})
+        blocker.start()
+        while executor.running < 1:
+            time.sleep(0.001)
+        for index in range(waiting):
+            def on_queued(position, index=index):
+                positions.setdefault(index, position)
+            thread = threading.Thread(target=executor.run, args=(f"echo {index} >> order.txt", workdir),
+                                      kwargs={'user_id': f"fifo_{index}", 'on_queued': on_queued})
+            thread.start()
+            threads.append(thread)
+            # El siguiente solo se encola cuando este ya está en la cola
+            while len(executor.queue) < index + 1:
+                time.sleep(0.001)
+        blocker.join()
+        for thread in threads:
+            thread.join()
+
+        with open(os.path.join(workdir, "order.txt")) as f:
+            order = [int(line) for line in f.read().split()]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    errors = []
+    if order != list(range(waiting)):
+        errors.append(f"orden de ejecución {order}")
+    if positions != {index: index + 1 for index in range(waiting)}:
+        errors.append(f"posiciones en cola notificadas {positions}")
+    print(f"{waiting} comandos en cola, orden de ejecución: {order}, errores: {len(errors)}")
+    for error in errors:
+        print(f"  - {error}")
+    return errors
+
+
+def test_concurrent_commands():
+    errors = concurrency_errors()
+    assert not errors, errors
+
+
+def test_fifo_order():
+    errors = fifo_errors()
+    assert not errors, errors
+
+
+if __name__ == "__main__":
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    errors = concurrency_errors(commands) + fifo_errors()
+    print("Resultado:", "OK" if not errors else "FALLO")
+    sys.exit(0 if not errors else 1)
@@ -0,0 +1,92 @@
+"""
+Comprueba con EXPLAIN que las consultas frecuentes usan los índices de models.py.
+
+Uso: python test_query_plans.py   (usa DATABASE_URL, igual que main.py; por
+defecto una base de datos SQLite temporal)
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import select, tuple_
+
+import database
+from database import db
+from models import Workspace, File, Command
+
+
+def hot_queries():
+    """(descripción, consulta, índice que debe usar)"""
+    return [
+        ("get_user_workspace",
+         select(Workspace).filter_by(user_id=1, name='default'),
+         'ix_workspaces_user_id_name'),
+        ("archivo de un workspace",
+         select(File).filter_by(workspace_id=1, path='src/app.py'),
+         'ix_files_workspace_id_path'),
+        ("archivos más grandes",
+         select(File).where(File.workspace_id == 1).order_by(File.size.desc()).limit(20),
+         'ix_files_workspace_id_size'),
+        ("archivos modificados recientemente",
+         select(File).where(File.workspace_id == 1).order_by(File.modified_at.desc()).limit(20),
+         'ix_files_workspace_id_modified_at'),
+        ("/api/history (primera página)",
+         select(Command).where(Command.workspace == 'default')
+         .order_by(Command.executed_at.desc(), Command.id.desc()).limit(51),
+         'ix_commands_workspace_executed_at'),
+        ("/api/history (con cursor)",
+         select(Command).where(Command.workspace == 'default',
+                               tuple_(Command.executed_at, Command.id) < (datetime.utcnow(), 100))
+         .order_by(Command.executed_at.desc(), Command.id.desc()).limit(51),
+         'ix_commands_workspace_executed_at'),
+    ]
+
+
+def query_plan(conn, statement):
+    """Líneas del plan de la consulta según el motor."""
+    compiled = statement.compile(dialect=conn.dialect)
+    if compiled.positiontup:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql(f"EXPLAIN {compiled}", params).fetchall()
+    return [row[0] for row in rows]
+
+
+def check_plans(database_uri):
+    errors = []
+    app = Flask(__name__)
+    database.init_app(app, database_uri)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            if conn.dialect.name == 'postgresql':
+                # Con tablas casi vacías el planificador prefiere recorrerlas enteras
+                conn.exec_driver_sql("SET enable_seqscan = off")
+            for description, statement, index_name in hot_queries():
+                plan = query_plan(conn, statement)
+                text = '\n'.join(plan)
+                print(f"{description}:\n  " + '\n  '.join(plan))
+                if index_name not in text:
+                    errors.append(f"{description}: no usa {index_name}")
+                # El índice ya da el orden: no hace falta ordenar aparte
+                sorts = 'TEMP B-TREE' in text or any(line.strip(' ->').startswith('Sort') for line in plan)
+                if 'ORDER BY' in str(statement) and sorts:
+                    errors.append(f"{description}: ordena los resultados en lugar de usar el índice")
+    return errors
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        url = os.environ.get('DATABASE_URL') or f"sqlite:///{os.path.join(directory, 'plans.db')}"
+        errors = check_plans(url)
+    if errors:
+        print("\nFALLOS:")
+        for error in errors:
+            print(f"  {error}")
+        sys.exit(1)
+    print("\nTodas las consultas usan sus índices")
@@ -0,0 +1,217 @@
+# Caché persistente de traducciones de lenguaje natural a comandos
+#
+# Las instrucciones que no reconoce nl_translator se envían a un modelo de IA.
+# Las traducciones que el modelo resuelve con éxito se guardan aquí, en SQLite
+# (compartido entre workers y persistente entre reinicios), con una clave
+# normalizada: "Crea  un Índice" y "crea un indice" son la misma instrucción.
+# Así una instrucción frecuente solo llega al proveedor una vez, y la aprendida
+# en una terminal sirve también en las demás. Si no hay una instrucción exacta,
+# instruction_index busca la más parecida y adapta su comando.
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from nl_translator import normalize
+from instruction_index import InstructionIndex
+
+logger = logging.getLogger('translation_cache')
+
+TRANSLATION_CACHE_DB_PATH = os.environ.get(
+    'NL_TRANSLATION_CACHE_DB',
+    os.path.join('user_workspaces', '.nl_translations.db')
+)
+CACHE_ENABLED = os.environ.get('NL_TRANSLATION_CACHE', '1') != '0'
+
+# Instrucciones más largas rara vez se repiten tal cual
+MAX_INSTRUCTION_LENGTH = 500
+MAX_COMMAND_LENGTH = 16 * 1024
+# Al superar el límite se descartan las menos usadas
+MAX_TRANSLATIONS = 5000
+# Cada cuánto se comprueba si otros workers añadieron traducciones al índice
+INDEX_REFRESH_INTERVAL = 30
+
+_EDGE_PUNCTUATION = ' .,;:!?¡¿'
+
+
+def normalize_instruction(text):
+    """Clave de la instrucción: minúsculas, sin tildes y con los espacios colapsados."""
+    return ' '.join(normalize(text or '').split()).strip(_EDGE_PUNCTUATION)
+
+
+class TranslationCache:
+    """Traducciones obtenidas de los modelos de IA, con su número de usos."""
+
+    def __init__(self, db_path=TRANSLATION_CACHE_DB_PATH, enabled=CACHE_ENABLED):
+        self.db_path = db_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        self._index = None
+        self._index_version = None
+        self._index_checked_at = 0
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            # WAL: las lecturas de un worker no bloquean las escrituras de otro
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS nl_translations (
+                    instruction TEXT PRIMARY KEY,
+                    command TEXT NOT NULL,
+                    explanation TEXT,
+                    auto_execute INTEGER DEFAULT 0,
+                    provider TEXT,
+                    hits INTEGER DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            # Bases de datos creadas antes de updated_at (la versión del índice)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(nl_translations)")}
+            if 'updated_at' not in columns:
+                conn.execute("ALTER TABLE nl_translations ADD COLUMN updated_at REAL DEFAULT 0")
+                conn.execute("UPDATE nl_translations SET updated_at = created_at")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _key(text):
+        key = normalize_instruction(text)
+        if not key or len(key) > MAX_INSTRUCTION_LENGTH:
+            return None
+        return key
+
+    def _refresh_index(self, conn):
+        """Reconstruye el índice de similitud si cambió la tabla."""
+        now = time.time()
+        if self._index is not None and now - self._index_checked_at < INDEX_REFRESH_INTERVAL:
+            return self._index
+        self._index_checked_at = now
+        version = conn.execute("SELECT COUNT(*), MAX(updated_at) FROM nl_translations").fetchone()
+        if self._index is None or version != self._index_version:
+            rows = conn.execute("SELECT instruction, command FROM nl_translations").fetchall()
+            self._index = InstructionIndex(rows)
+        self._index_version = version
+        return self._index
+
+    def get(self, text, similar=True):
+        """Traducción guardada para la instrucción (y cuenta el uso) o None.
+
+        Si no hay una exacta y `similar` es True, devuelve el comando de la
+        instrucción más parecida adaptado a los argumentos de esta, con
+        `similarity` y la instrucción original en `matched`; en ese caso
+        `auto_execute` es siempre False.
+        """
+        key = self._key(text) if self.enabled else None
+        if key is None:
+            return None
+        match = None
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT command, explanation, auto_execute, provider, hits "
+                    "FROM nl_translations WHERE instruction = ?", (key,)
+                ).fetchone()
+                if row is None and similar:
+                    match = self._refresh_index(conn).match(text)
+                    if match is not None:
+                        row = conn.execute(
+                            "SELECT command, explanation, auto_execute, provider, hits "
+                            "FROM nl_translations WHERE instruction = ?", (match['instruction'],)
+                        ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE nl_translations SET hits = hits + 1, last_used_at = ? WHERE instruction = ?",
+                    (time.time(), match['instruction'] if match else key)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo consultar la caché de traducciones: {str(e)}")
+                return None
+        command, explanation, auto_execute, provider, hits = row
+        if match is not None:
+            return {
+                'command': match['command'],
+                'explanation': None,
+                'auto_execute': False,
+                'provider': provider,
+                'hits': hits + 1,
+                'similarity': match['similarity'],
+                'matched': match['instruction']
+            }
+        return {
+            'command': command,
+            'explanation': explanation,
+            'auto_execute': bool(auto_execute),
+            'provider': provider,
+            'hits': hits + 1
+        }
+
+    def put(self, text, command, explanation=None, provider=None, auto_execute=False):
+        """Guarda una traducción obtenida con éxito de un modelo."""
+        key = self._key(text) if self.enabled else None
+        command = (command or '').strip()
+        if key is None or not command or len(command) > MAX_COMMAND_LENGTH:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT INTO nl_translations "
+                    "(instruction, command, explanation, auto_execute, provider, hits, created_at, updated_at, "
+                    "last_used_at) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?) "
+                    "ON CONFLICT(instruction) DO UPDATE SET command = excluded.command, "
+                    "explanation = excluded.explanation, auto_execute = excluded.auto_execute, "
+                    "provider = excluded.provider, updated_at = excluded.updated_at, "
+                    "last_used_at = excluded.last_used_at",
+                    (key, command, explanation, int(bool(auto_execute)), provider, now, now, now)
+                )
+                conn.execute(
+                    "DELETE FROM nl_translations WHERE instruction IN ("
+                    "SELECT instruction FROM nl_translations ORDER BY hits DESC, last_used_at DESC "
+                    "LIMIT -1 OFFSET ?)", (MAX_TRANSLATIONS,)
+                )
+                conn.commit()
+                self._index = None
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo guardar la traducción de '{key}': {str(e)}")
+
+    def forget(self, text):
+        """Descarta la traducción de una instrucción (p. ej. si resultó incorrecta)."""
+        key = self._key(text)
+        if key is None:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM nl_translations WHERE instruction = ?", (key,))
+                conn.commit()
+                self._index = None
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo descartar la traducción de '{key}': {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            try:
+                entries, hits = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM nl_translations"
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo leer la caché de traducciones: {str(e)}")
+                entries, hits = 0, 0
+        return {'entries': entries, 'hits': hits, 'enabled': self.enabled}
+
+
+translation_cache = TranslationCache()
@@ -0,0 +1,147 @@
+# Registro en memoria de los workspaces de la base de datos
+#
+# get_user_workspace se llama en cada petición de archivos o comandos. Antes
+# consultaba `users` y `workspaces` y confirmaba una escritura de
+# `last_accessed` en cada llamada. Ahora el id de cada workspace se recuerda
+# durante WORKSPACE_CACHE_TTL segundos, y los accesos se anotan en memoria y se
+# vuelcan juntos, con un único UPDATE por lotes, cada ACCESS_FLUSH_INTERVAL
+# segundos. El camino habitual es una consulta a un diccionario.
+import os
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger('workspace_registry')
+
+WORKSPACE_CACHE_TTL = int(os.environ.get('WORKSPACE_CACHE_TTL', 300))
+ACCESS_FLUSH_INTERVAL = int(os.environ.get('WORKSPACE_ACCESS_FLUSH_INTERVAL', 30))
+DEFAULT_USERNAME = 'default_user'
+
+
+class WorkspaceRegistry:
+    """Caché con TTL de los registros Workspace y volcado diferido de last_accessed."""
+
+    def __init__(self, app, db, ttl=WORKSPACE_CACHE_TTL, flush_interval=ACCESS_FLUSH_INTERVAL):
+        self.app = app
+        self.db = db
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        # nombre -> (id del workspace, momento en que se cargó)
+        self.entries = {}
+        # id del workspace -> último acceso aún no guardado
+        self.pending_access = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def touch(self, name, path):
+        """Anota un acceso al workspace `name`, registrándolo si no existe."""
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.pending_access[entry[0]] = datetime.utcnow()
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # touch también se llama desde hilos de Socket.IO y del ejecutor
+        with self.app.app_context():
+            workspace_id = self._load(name, path)
+        with self._lock:
+            self.entries[name] = (workspace_id, now)
+            self.pending_access[workspace_id] = datetime.utcnow()
+        self._start()
+        return workspace_id
+
+    def _load(self, name, path):
+        """id del workspace en la base de datos, creándolo (y el usuario por defecto) si falta."""
+        from models import User, Workspace
+
+        db = self.db
+        default_user = db.session.query(User).filter_by(username=DEFAULT_USERNAME).first()
+        if not default_user:
+            default_user = User(
+                username=DEFAULT_USERNAME,
+                email="default@example.com",
+            )
+            default_user.set_password("default_password")
+            db.session.add(default_user)
+            db.session.commit()
+
+        workspace = db.session.query(Workspace).filter_by(
+            user_id=default_user.id,
+            name=name
+        ).first()
+        if not workspace:
+            workspace = Workspace(
+                name=name,
+                path=str(path),
+                user_id=default_user.id,
+                is_default=True,
+                last_accessed=datetime.utcnow()
+            )
+            db.session.add(workspace)
+            db.session.commit()
+        return workspace.id
+
+    def forget(self, name=None):
+        """Descarta la entrada de un workspace (o todas), p. ej. tras borrarlo."""
+        with self._lock:
+            if name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(name, None)
+
+    def flush(self):
+        """Guarda los accesos pendientes con un solo UPDATE por lotes."""
+        from sqlalchemy import update
+        from models import Workspace
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self.pending_access = self.pending_access, {}
+            if not pending:
+                return 0
+            with self.app.app_context():
+                try:
+                    self.db.session.execute(update(Workspace), [
+                        {'id': workspace_id, 'last_accessed': accessed}
+                        for workspace_id, accessed in pending.items()
+                    ])
+                    self.db.session.commit()
+                except Exception as e:
+                    self.db.session.rollback()
+                    logger.error(f"No se pudo guardar last_accessed de {len(pending)} workspaces: {str(e)}")
+                    with self._lock:
+                        for workspace_id, accessed in pending.items():
+                            self.pending_access.setdefault(workspace_id, accessed)
+                    return 0
+            return len(pending)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is not None:
+                    return
+                self._thread = threading.Thread(target=self._run, name='workspace-access', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'pending_access': len(self.pending_access),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,233 @@
+# Índice en memoria del árbol de archivos de los workspaces
+#
+# El explorador pide el listado de un directorio en cada refresco (file-sync.js
+# lo hace cada 5 segundos por pestaña) y cada listado hacía os.listdir y varias
+# llamadas stat/isdir/getsize/getmtime por entrada. Aquí cada directorio se lee
+# una vez con os.scandir (un stat por entrada) y se mantiene al día con los
+# eventos del observador de archivos. Como en command_cache, solo se sirve desde
+# memoria bajo un directorio vigilado; además, si la mtime del directorio no
+# coincide con la guardada (un evento perdido) se vuelve a leer.
+import os
+import stat
+import fnmatch
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('workspace_tree')
+
+MAX_CACHED_DIRECTORIES = 10000
+READ_EVENT_TYPES = {'opened', 'closed_no_write'}
+REMOVAL_EVENT_TYPES = {'deleted', 'moved'}
+# Directorios que el listado recursivo no recorre salvo que se pida otra lista
+DEFAULT_IGNORED = ('node_modules', '.git', '__pycache__')
+
+
+def _entry(name, stat_result):
+    is_directory = stat.S_ISDIR(stat_result.st_mode)
+    return {
+        'name': name,
+        'is_directory': is_directory,
+        'size': 0 if is_directory else stat_result.st_size,
+        'modified': stat_result.st_mtime,
+        'permissions': stat_result.st_mode & 0o777
+    }
+
+
+def scan_directory(path):
+    """(mtime del directorio en ns, {nombre: entrada}) leyendo el disco.
+
+    Lanza FileNotFoundError o NotADirectoryError como os.listdir.
+    """
+    directory_stat = os.stat(path)
+    if not stat.S_ISDIR(directory_stat.st_mode):
+        raise NotADirectoryError(path)
+    entries = {}
+    with os.scandir(path) as iterator:
+        for item in iterator:
+            try:
+                entries[item.name] = _entry(item.name, item.stat())
+            except OSError:
+                # Enlace roto o archivo borrado durante la lectura
+                continue
+    return directory_stat.st_mtime_ns, entries
+
+
+class _Directory:
+    __slots__ = ('mtime', 'entries')
+
+    def __init__(self, mtime, entries):
+        self.mtime = mtime
+        self.entries = entries
+
+
+class WorkspaceTreeIndex:
+    """Listados de directorios en memoria actualizados por eventos del observador."""
+
+    def __init__(self, max_directories=MAX_CACHED_DIRECTORIES):
+        self.max_directories = max_directories
+        self.directories = OrderedDict()
+        self.watched_roots = set()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def watch(self, root):
+        """Registra un directorio vigilado por un observador de archivos."""
+        with self._lock:
+            self.watched_roots.add(os.path.abspath(str(root)))
+
+    def unwatch(self, root):
+        root = os.path.abspath(str(root))
+        with self._lock:
+            self.watched_roots.discard(root)
+            self._drop(root)
+
+    @staticmethod
+    def _under(path, root):
+        return path == root or path.startswith(root + os.sep)
+
+    def is_watched(self, path):
+        path = os.path.abspath(str(path))
+        return any(self._under(path, root) for root in self.watched_roots)
+
+    def _drop(self, path):
+        """Descarta un directorio y sus subdirectorios (con el lock tomado)."""
+        for key in [key for key in self.directories if self._under(key, path)]:
+            del self.directories[key]
+
+    def list_directory(self, path):
+        """Entradas del directorio (copias): name, is_directory, size, modified, permissions."""
+        path = os.path.abspath(str(path))
+        if not self.is_watched(path):
+            return [dict(entry) for entry in scan_directory(path)[1].values()]
+
+        with self._lock:
+            directory = self.directories.get(path)
+        if directory is not None:
+            try:
+                current_mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                current_mtime = None
+            if current_mtime == directory.mtime:
+                with self._lock:
+                    if path in self.directories:
+                        self.directories.move_to_end(path)
+                    self.hits += 1
+                    return [dict(entry) for entry in directory.entries.values()]
+
+        mtime, entries = scan_directory(path)
+        with self._lock:
+            self.misses += 1
+            self.directories[path] = _Directory(mtime, entries)
+            self.directories.move_to_end(path)
+            while len(self.directories) > self.max_directories:
+                self.directories.popitem(last=False)
+            return [dict(entry) for entry in entries.values()]
+
+    def _update(self, path, removed):
+        parent, name = os.path.split(path)
+        if removed:
+            with self._lock:
+                self._drop(path)
+                directory = self.directories.get(parent)
+                if directory is not None:
+                    directory.entries.pop(name, None)
+        else:
+            with self._lock:
+                if parent not in self.directories:
+                    return
+            try:
+                entry = _entry(name, os.stat(path))
+            except OSError:
+                entry = None
+            with self._lock:
+                directory = self.directories.get(parent)
+                if directory is None:
+                    return
+                if entry is None:
+                    directory.entries.pop(name, None)
+                    self._drop(path)
+                else:
+                    directory.entries[name] = entry
+        # Añadir o quitar entradas cambia la mtime del padre: no forzar una relectura
+        try:
+            parent_mtime = os.stat(parent).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._drop(parent)
+            return
+        with self._lock:
+            directory = self.directories.get(parent)
+            if directory is not None:
+                directory.mtime = parent_mtime
+
+    def apply_event(self, src_path, event_type, is_directory=False, dest_path=None):
+        """Aplica un evento del observador de archivos."""
+        if event_type in READ_EVENT_TYPES:
+            return
+        src_path = os.path.abspath(str(src_path))
+        if event_type == 'modified' and is_directory:
+            # Sus entradas llegan como eventos propios; solo cambia su propia entrada
+            self._update(src_path, False)
+            return
+        self._update(src_path, event_type in REMOVAL_EVENT_TYPES)
+        if dest_path:
+            self._update(os.path.abspath(str(dest_path)), False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directories': len(self.directories),
+                'hits': self.hits,
+                'misses': self.misses,
+                'watched_roots': sorted(self.watched_roots)
+            }
+
+
+def _matches(name, relative_path, patterns):
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern)
+               for pattern in patterns)
+
+
+def walk_tree(root, max_depth=1, include=None, ignore=DEFAULT_IGNORED, after=None, index=None):
+    """Recorre root en preorden con las entradas ordenadas por nombre.
+
+    Devuelve (ruta relativa, profundidad, entrada). Los directorios cuyo nombre
+    o ruta coincide con ignore no se devuelven ni se recorren; include filtra
+    las entradas devueltas, pero los directorios se recorren igualmente. El
+    preorden por nombre es el orden de las rutas como tuplas de componentes,
+    así que con after (la última ruta de la página anterior) se saltan sin
+    leerlos los subárboles ya devueltos.
+    """
+    index = index or tree_index
+    cursor = tuple(part for part in after.split('/') if part) if after else None
+
+    def walk(directory, prefix, depth):
+        entries = sorted(index.list_directory(directory), key=lambda entry: entry['name'])
+        for entry in entries:
+            name = entry['name']
+            parts = prefix + (name,)
+            relative_path = '/'.join(parts)
+            if ignore and _matches(name, relative_path, ignore):
+                continue
+            # Ya devuelto en una página anterior: el cursor está en este
+            # subárbol (seguir bajando) o detrás de él (saltarlo entero)
+            resume = cursor is not None and parts <= cursor
+            if resume and cursor[:len(parts)] != parts:
+                continue
+            if not resume and (not include or _matches(name, relative_path, include)):
+                yield relative_path, depth, entry
+            full_path = os.path.join(directory, name)
+            # Sin seguir enlaces simbólicos para no entrar en ciclos
+            if entry['is_directory'] and depth < max_depth and not os.path.islink(full_path):
+                try:
+                    yield from walk(full_path, parts, depth + 1)
+                except OSError:
+                    # Borrado o sin permisos durante el recorrido
+                    continue
+
+    return walk(os.path.abspath(str(root)), (), 1)
+
+
+tree_index = WorkspaceTreeIndex()
@@ -2,14 +2,18 @@ import os
 import json
 import uuid
 import logging
-import subprocess
 import shutil
 from pathlib import Path
-from functools import lru_cache
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_socketio import emit, join_room, leave_room
 import traceback
 from werkzeug.utils import secure_filename
+from command_executor import command_executor, ExecutorBusy, new_job_id
+from command_policy import check_command, is_command_allowed
+from nl_translator import translate
+from translation_cache import translation_cache
+from workspace_tree import tree_index
+from pty_sessions import pty_manager, PTY_ENABLED
 
 # Configuración de logging
 logging.basicConfig(
@@ -83,12 +87,6 @@ class WorkspaceManager:
 # Instancia global del gestor de workspaces
 workspace_manager = WorkspaceManager()
 
-# Caché para comandos frecuentes
-@lru_cache(maxsize=100)
-def get_command_suggestion(text_key):
-    """Obtiene sugerencias de comandos para texto frecuente."""
-    return process_natural_language(text_key, 'cached')
-
 @xterm_bp.route('/xterm_terminal')
 def xterm_terminal():
     """Render the XTerm terminal page."""
@@ -121,20 +119,24 @@ def execute_xterm_command():
         workspace_path = workspace_manager.get_workspace_path(user_id)
 
         # Validar comando por seguridad
-        if not is_command_safe(command):
+        allowed, reason = check_command(command)
+        if not allowed:
             return jsonify({
                 'success': False,
-                'error': 'Comando no permitido por razones de seguridad'
+                'error': f'Comando no permitido por razones de seguridad: {reason}'
             }), 403
 
         # Ejecutar comando
-        result = execute_command(command, workspace_path)
+        result = execute_command(command, workspace_path, user_id=user_id, job_id=data.get('job_id'))
 
         return jsonify({
             'success': result['success'],
             'stdout': result.get('stdout', ''),
             'stderr': result.get('stderr', ''),
-            'exitCode': result.get('returncode', 1)
+            'exitCode': result.get('returncode', 1),
+            'job_id': result['job_id'],
+            'cancelled': result.get('cancelled', False),
+            'truncated': result.get('truncated', False)
         })
 
     except ValueError as e:
@@ -143,6 +145,11 @@ def execute_xterm_command():
             'success': False,
             'error': str(e)
         }), 400
+    except ExecutorBusy as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
     except Exception as e:
         logger.error(f"Error ejecutando comando XTerm: {str(e)}")
         logger.error(traceback.format_exc())
@@ -248,82 +255,26 @@ def delete_file():
             'error': str(e)
         }), 500
 
-def is_command_safe(command):
-    """Verifica si un comando es seguro para ejecutar."""
-    # Lista de comandos prohibidos por seguridad
-    dangerous_commands = [
-        'rm -rf /', 'rm -rf *', 'rm -rf ~', 'rm -rf .', 
-        'wget', 'curl', 'sudo', 'su', 'chmod 777', 
-        '>', '|', ';', '&&', '||', '`', '$(',
-    ]
-
-    # Verificar si el comando contiene alguno de los patrones peligrosos
-    command_lower = command.lower()
-    for dangerous in dangerous_commands:
-        if dangerous in command_lower:
-            # Permitir algunos casos específicos
-            if dangerous in ['>', '|'] and is_redirection_safe(command):
-                continue
-            return False
-
-    return True
-
-def is_redirection_safe(command):
-    """Verifica si una redirección es segura."""
-    # Permitir redirecciones simples a archivos dentro del directorio actual
-    if '>' in command:
-        parts = command.split('>')
-        if len(parts) == 2 and not any(c in parts[1] for c in ['/', '..']):
-            return True
-
-    # Permitir pipes simples entre comandos básicos
-    if '|' in command:
-        parts = command.split('|')
-        if all(is_basic_command(part.strip()) for part in parts):
-            return True
-
-    return False
-
-def is_basic_command(cmd):
-    """Verifica si es un comando básico."""
-    basic_commands = ['ls', 'cat', 'grep', 'sed', 'awk', 'head', 'tail', 'wc', 'sort', 'uniq']
-    return any(cmd.startswith(bc) for bc in basic_commands)
-
-def execute_command(command, cwd):
-    """Ejecuta un comando y devuelve su resultado."""
-    try:
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            cwd=str(cwd),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        stdout, stderr = process.communicate(timeout=10)  # Timeout de 10 segundos
-
-        return {
-            'success': process.returncode == 0,
-            'stdout': stdout,
-            'stderr': stderr,
-            'returncode': process.returncode
-        }
-    except subprocess.TimeoutExpired:
-        process.kill()
-        return {
-            'success': False,
-            'stdout': '',
-            'stderr': 'Comando cancelado: tiempo de ejecución excedido (10s)',
-            'returncode': 124
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'stdout': '',
-            'stderr': f'Error al ejecutar comando: {str(e)}',
-            'returncode': 1
-        }
+def execute_command(command, cwd, on_output=None, user_id=DEFAULT_WORKSPACE, on_queued=None, job_id=None):
+    """Ejecuta un comando a través del ejecutor central y devuelve su resultado.
+
+    Si se indica `on_output(stream, text)`, la salida se entrega en fragmentos
+    mientras el comando se ejecuta; `on_queued(position)` avisa si el comando
+    tiene que esperar turno. El resultado incluye el `job_id` con el que se
+    puede cancelar o, si la salida se truncó, pedir el resto por páginas.
+    """
+    return command_executor.run(command, cwd, user_id=user_id, on_output=on_output,
+                                on_queued=on_queued, job_id=job_id,
+                                spill_dir=workspace_manager.get_workspace_path(user_id))
+
+def submit_command(command, cwd, on_done, on_output=None, user_id=DEFAULT_WORKSPACE, on_queued=None, job_id=None):
+    """Como execute_command, pero sin bloquear: `on_done(result)` recibe el resultado.
+
+    Con el backend asyncio los callbacks se llaman desde el bucle de comandos.
+    """
+    command_executor.submit(command, cwd, on_done, user_id=user_id, on_output=on_output,
+                            on_queued=on_queued, job_id=job_id,
+                            spill_dir=workspace_manager.get_workspace_path(user_id))
 
 def init_xterm_blueprint(app, socketio):
     """Registra el blueprint en la aplicación Flask."""
@@ -367,6 +318,8 @@ def init_xterm_blueprint(app, socketio):
         user_id = data.get('user_id', DEFAULT_WORKSPACE)
         terminal_id = data.get('terminal_id', 'default')
         directory = data.get('directory', '.')
+        stream = bool(data.get('stream', False))
+        sid = request.sid
 
         logger.info(f"Comando recibido: '{command}' de usuario: {user_id}, terminal: {terminal_id}")
 
@@ -382,12 +335,14 @@ def init_xterm_blueprint(app, socketio):
 
         try:
             # Validar el comando por seguridad
-            if not is_command_safe(command):
+            allowed, reason = check_command(command)
+            if not allowed:
+                message = f'Comando no permitido por razones de seguridad: {reason}'
                 emit('command_result', {
                     'success': False,
                     'command': command,
-                    'stderr': 'Comando no permitido por razones de seguridad',
-                    'output': 'Comando no permitido por razones de seguridad',
+                    'stderr': message,
+                    'output': message,
                     'terminal_id': terminal_id
                 }, room=request.sid)
                 return
@@ -407,29 +362,76 @@ def init_xterm_blueprint(app, socketio):
 
             # Ejecutar comando en esa ruta
             logger.debug(f"Ejecutando comando: '{command}' en directorio: {current_dir}")
-            result = execute_command(command, current_dir)
 
-            # Emitir resultado
-            response = {
-                'success': result['success'],
+            # Con stream=True la salida se envía en fragmentos (command_output) mientras se ejecuta
+            on_output = None
+            if stream:
+                chunk_seq = [0]
+
+                def on_output(stream_name, text):
+                    socketio.emit('command_output', {
+                        'terminal_id': terminal_id,
+                        'command': command,
+                        'stream': stream_name,
+                        'data': text,
+                        'seq': chunk_seq[0]
+                    }, room=sid)
+                    chunk_seq[0] += 1
+
+            def on_queued(position):
+                socketio.emit('command_queued', {
+                    'terminal_id': terminal_id,
+                    'command': command,
+                    'position': position
+                }, room=sid)
+
+            # El job_id se envía antes de ejecutar para que el cliente pueda cancelarlo
+            job_id = data.get('job_id') or new_job_id()
+            emit('command_started', {
+                'terminal_id': terminal_id,
                 'command': command,
-                'stdout': result.get('stdout', ''),
-                'stderr': result.get('stderr', ''),
-                'output': result.get('stdout', '') if result['success'] else result.get('stderr', ''),
-                'terminal_id': terminal_id
-            }
-            logger.debug(f"Resultado del comando: {result['success']}")
-            emit('command_result', response, room=request.sid)
-
-            # Detectar cambios en archivos para notificar a todos los clientes
-            if result['success'] and any(cmd in command for cmd in FILE_MODIFYING_COMMANDS):
-                room_id = f"workspace_{user_id}"
-                emit('file_change', {
-                    'type': 'command',
-                    'message': f'Comando ejecutado: {command}',
+                'job_id': job_id
+            }, room=sid)
+
+            def on_done(result):
+                if stream:
+                    socketio.emit('command_exit', {
+                        'terminal_id': terminal_id,
+                        'command': command,
+                        'job_id': result['job_id'],
+                        'success': result['success'],
+                        'exit_code': result.get('returncode', 1)
+                    }, room=sid)
+
+                # Emitir resultado
+                response = {
+                    'success': result['success'],
                     'command': command,
-                    'user_id': user_id
-                }, room=room_id)
+                    'stdout': result.get('stdout', ''),
+                    'stderr': result.get('stderr', ''),
+                    'output': result.get('stdout', '') if result['success'] else result.get('stderr', ''),
+                    'terminal_id': terminal_id,
+                    'streamed': stream,
+                    'job_id': result['job_id'],
+                    'cancelled': result.get('cancelled', False),
+                    'truncated': result.get('truncated', False)
+                }
+                logger.debug(f"Resultado del comando: {result['success']}")
+                socketio.emit('command_result', response, room=sid)
+
+                # Detectar cambios en archivos para notificar a todos los clientes
+                if result['success'] and any(cmd in command for cmd in FILE_MODIFYING_COMMANDS):
+                    room_id = f"workspace_{user_id}"
+                    socketio.emit('file_change', {
+                        'type': 'command',
+                        'message': f'Comando ejecutado: {command}',
+                        'command': command,
+                        'user_id': user_id
+                    }, room=room_id)
+
+            # El manejador no espera al comando: el resultado se emite desde on_done
+            submit_command(command, current_dir, on_done, on_output=on_output,
+                           user_id=user_id, on_queued=on_queued, job_id=job_id)
 
         except Exception as e:
             logger.error(f"Error al ejecutar comando: {str(e)}")
@@ -461,17 +463,12 @@ def init_xterm_blueprint(app, socketio):
             return
 
         try:
-            # Usar caché para consultas frecuentes
-            if len(text) < 50:  # Solo cachear consultas cortas
-                command, response = get_command_suggestion(text.lower())
-            else:
-                # Procesar el texto usando el modelo seleccionado
-                command, response = process_natural_language(text, model)
+            command, response = process_natural_language(text, model)
 
             # Si tenemos un comando, devolverlo
             if command:
                 # Validar el comando por seguridad
-                if not is_command_safe(command):
+                if not is_command_allowed(command):
                     emit('instruction_result', {
                         'success': False,
                         'command': command,
@@ -543,20 +540,8 @@ def init_xterm_blueprint(app, socketio):
                 return
 
             # Listar archivos y directorios
-            contents = []
-            for item in os.listdir(target_dir):
-                item_path = target_dir / item
-                try:
-                    stat_info = item_path.stat()
-                    contents.append({
-                        'name': item,
-                        'is_directory': item_path.is_dir(),
-                        'size': stat_info.st_size if item_path.is_file() else 0,
-                        'modified': stat_info.st_mtime,
-                        'permissions': stat_info.st_mode & 0o777
-                    })
-                except Exception as e:
-                    logger.warning(f"Error al obtener información de {item_path}: {str(e)}")
+            # Las entradas ilegibles (enlaces rotos) se omiten en el índice
+            contents = tree_index.list_directory(target_dir)
 
             emit('directory_contents', {
                 'success': True,
@@ -727,99 +712,113 @@ def init_xterm_blueprint(app, socketio):
         }, room=request.sid)
         logger.info(f"Cliente {request.sid} unido al workspace {user_id}")
 
+    # Sesiones de shell persistentes (PTY): un shell por terminal que conserva
+    # directorio, variables de entorno e historial entre comandos
+    def pty_room(user_id, terminal_id):
+        return f"pty_{user_id}_{terminal_id}"
+
+    @socketio.on('pty_start')
+    def handle_pty_start(data):
+        """Abre (o reanuda) el shell persistente de una terminal."""
+        user_id = data.get('user_id', DEFAULT_WORKSPACE)
+        terminal_id = data.get('terminal_id', 'default')
+        room = pty_room(user_id, terminal_id)
+
+        if not PTY_ENABLED:
+            # La entrada de un PTY no pasa por command_policy: solo con activación explícita
+            emit('pty_started', {
+                'success': False,
+                'terminal_id': terminal_id,
+                'error': 'Las sesiones de shell interactivo están desactivadas (PTY_ENABLED=1)'
+            }, room=request.sid)
+            return
+
+        def on_output(session, text):
+            socketio.emit('pty_output', {'terminal_id': terminal_id, 'data': text}, room=room)
+
+        def on_exit(session, exit_code):
+            if not pty_manager.close(room, session):
+                # Un shell anterior de esta terminal: ya fue reemplazado
+                return
+            socketio.emit('pty_exit', {'terminal_id': terminal_id, 'exit_code': exit_code}, room=room)
+
+        try:
+            cwd = workspace_manager.get_workspace_path(user_id)
+            session, created = pty_manager.open(
+                room, user_id, cwd, on_output=on_output, on_exit=on_exit,
+                rows=int(data.get('rows', 24)), cols=int(data.get('cols', 80))
+            )
+            join_room(room)
+            emit('pty_started', {
+                'success': True,
+                'terminal_id': terminal_id,
+                'resumed': not created
+            }, room=request.sid)
+            logger.info(f"Sesión PTY {'creada' if created else 'reanudada'}: {room}")
+        except Exception as e:
+            logger.error(f"Error al iniciar sesión PTY: {str(e)}")
+            emit('pty_started', {
+                'success': False,
+                'terminal_id': terminal_id,
+                'error': str(e)
+            }, room=request.sid)
+
+    @socketio.on('pty_input')
+    def handle_pty_input(data):
+        """Envía la entrada del cliente al shell de la terminal."""
+        user_id = data.get('user_id', DEFAULT_WORKSPACE)
+        terminal_id = data.get('terminal_id', 'default')
+        session = pty_manager.get(pty_room(user_id, terminal_id))
+        if session is None or not session.is_alive():
+            emit('pty_exit', {'terminal_id': terminal_id, 'exit_code': None}, room=request.sid)
+            return
+        try:
+            session.write(data.get('data', ''))
+        except OSError as e:
+            logger.error(f"Error al escribir en PTY {terminal_id}: {str(e)}")
+
+    @socketio.on('pty_resize')
+    def handle_pty_resize(data):
+        """Ajusta el tamaño de la terminal del shell."""
+        user_id = data.get('user_id', DEFAULT_WORKSPACE)
+        terminal_id = data.get('terminal_id', 'default')
+        session = pty_manager.get(pty_room(user_id, terminal_id))
+        if session is not None:
+            try:
+                session.resize(int(data.get('rows', 24)), int(data.get('cols', 80)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"No se pudo redimensionar PTY {terminal_id}: {str(e)}")
+
+    @socketio.on('pty_close')
+    def handle_pty_close(data):
+        """Cierra el shell persistente de una terminal."""
+        user_id = data.get('user_id', DEFAULT_WORKSPACE)
+        terminal_id = data.get('terminal_id', 'default')
+        room = pty_room(user_id, terminal_id)
+        closed = pty_manager.close(room)
+        leave_room(room)
+        emit('pty_closed', {'success': closed, 'terminal_id': terminal_id}, room=request.sid)
+
     logger.info("Terminal xterm.js y colaboración en tiempo real inicializados")
 
 
 def process_natural_language(text, model):
-    """Procesa instrucciones en lenguaje natural y devuelve el comando correspondiente o una respuesta."""
-    # Normalizar texto
-    text = text.strip().lower()
-
-    # Mapa de comandos comunes
-    command_map = {
-        "listar": "ls -la",
-        "mostrar archivos": "ls -la",
-        "directorio actual": "pwd",
-        "donde estoy": "pwd",
-        "crear directorio": "mkdir ",
-        "crear carpeta": "mkdir ",
-        "nueva carpeta": "mkdir ",
-        "crear archivo": "touch ",
-        "nuevo archivo": "touch ",
-        "eliminar archivo": "rm ",
-        "borrar archivo": "rm ",
-        "eliminar carpeta": "rm -r ",
-        "borrar carpeta": "rm -r ",
-        "eliminar directorio": "rm -r ",
-        "borrar directorio": "rm -r ",
-        "mover": "mv ",
-        "copiar": "cp ",
-        "mostrar contenido": "cat ",
-        "leer archivo": "cat ",
-        "ver archivo": "cat ",
-        "fecha actual": "date",
-        "hora actual": "date",
-        "crea un proyecto": "mkdir proyecto && echo '# Mi Proyecto' > proyecto/README.md",
-        "procesos": "ps aux",
-        "memoria": "free -h",
-        "espacio en disco": "df -h",
-    }
-
-    # Respuestas para mensajes que no son comandos
-    response_map = {
-        "hola": "¡Hola! ¿En qué puedo ayudarte hoy? Puedo ayudarte a ejecutar comandos o a resolver dudas.",
-        "ayuda": """Puedo ejecutar comandos como:
-- listar archivos
-- crear directorio [nombre]
-- crear archivo [nombre]
-- mostrar contenido [archivo]
-- eliminar [archivo/directorio]
-- mover [origen] [destino]
-- copiar [origen] [destino]
-- fecha actual
-- procesos
-- memoria
-- espacio en disco""",
-        "gracias": "¡De nada! Estoy aquí para ayudarte.",
-        "adios": "¡Hasta luego! Vuelve cuando necesites ayuda.",
-    }
-
-    # Verificar primero si es un saludo o ayuda
-    for key, response in response_map.items():
-        if key in text:
-            return None, response
-
-    # Buscar coincidencias exactas primero
-    if text in command_map:
-        return command_map[text], None
-
-    # Buscar coincidencias parciales
-    for key, cmd in command_map.items():
-        if key in text and cmd is not None:
-            # Si el comando necesita un argumento
-            if cmd.endswith(' '):
-                # Extraer nombre después de palabras clave
-                name_keywords = ["llamado", "llamada", "nombre", "llamados", "llamadas"]
-                for keyword in name_keywords:
-                    if keyword in text:
-                        parts = text.split(keyword)
-                        if len(parts) > 1:
-                            # Obtener el primer argumento después de la palabra clave
-                            arg = parts[1].strip().split()[0].strip('"\'')
-                            return cmd + arg, None
-
-                # Si no hay palabra clave, buscar la última palabra
-                words = text.split()
-                if len(words) > 1:
-                    last_word = words[-1].strip('"\'')
-                    # Verificar que la última palabra no sea parte del comando
-                    if last_word not in key:
-                        return cmd + last_word, None
-            else:
-                return cmd, None
+    """Procesa instrucciones en lenguaje natural y devuelve (comando, respuesta)."""
+    translation = translate(text)
+    if translation:
+        if translation['missing']:
+            return None, translation['missing']
+        return translation['command'], translation['response']
+
+    # Traducciones que los modelos de IA ya resolvieron (en cualquier terminal)
+    cached = translation_cache.get(text)
+    if cached:
+        return cached['command'], None
 
     # Si es una pregunta, intentar dar una respuesta
+    text = text.strip().lower()
     if any(q in text for q in ["qué", "cómo", "por qué", "cuál", "explica"]):
         return None, "Lo siento, no puedo responder a esa pregunta específica. Intenta preguntar sobre comandos o archivos."
 
-    # Si no se reconoció ningún comando, devolver un mensaje
+    # No se reconoció ningún comando
+    return None, None